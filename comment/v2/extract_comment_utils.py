@@ -1,9 +1,15 @@
 # ========= Full-field extractors (NON-BREAKING: only adds new helpers) =========
 import datetime
-import json
 import re
+import sys
+from pathlib import Path
 from get_comment_fb_utils import find_pageinfo_any
 
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+from util.json_backend import loads as json_loads
+
 _HASHTAG_RE = re.compile(r"(?:#|＃)([A-Za-z0-9_]+)", re.UNICODE)
 
 
@@ -632,7 +638,7 @@ def _iter_comment_nodes(root):
 
 def extract_full_posts_from_resptext(resp_text: str):
     try:
-        obj = json.loads(resp_text)
+        obj = json_loads(resp_text)
     except Exception:
         return [], None, None, None
 
@@ -709,7 +715,7 @@ def extract_replies_from_depth_resp(resp_text, parent_comment_id=None):
     Giờ sẽ cố build luôn thành row giống comment cha (nếu payload đủ).
     """
     try:
-        obj = json.loads(resp_text)
+        obj = json_loads(resp_text)
     except Exception:
         return [], None
 
@@ -23,6 +23,7 @@ PROJECT_ROOT = Path(__file__).resolve().parents[2]
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 from logs.loging_config import logger
+from util.json_backend import loads as json_loads
 
 
 def install_early_hook(driver):
@@ -246,7 +247,7 @@ def extract_comment_texts(obj, out):
 def extract_comments_from_resptext(resp_text):
     texts = []
     try:
-        obj = json.loads(resp_text)
+        obj = json_loads(resp_text)
     except:
         return texts, None, None, None
     extract_comment_texts(obj, texts)
@@ -532,7 +533,7 @@ def crawl_replies_for_parent_expansion(
 
         # --- Parse JSON & build reply_token_map cho depth tiếp theo ---
         try:
-            json_resp = json.loads(resp_text)
+            json_resp = json_loads(resp_text)
             cleaned = resp_text
         except Exception:
             raw = resp_text
@@ -540,9 +541,9 @@ def crawl_replies_for_parent_expansion(
             parts = _split_top_level_json_objects(stripped)
             if len(parts) > 1:
                 cleaned = clean_fn(raw)
-                json_resp = json.loads(cleaned)
+                json_resp = json_loads(cleaned)
             else:
-                json_resp = json.loads(stripped)
+                json_resp = json_loads(stripped)
                 cleaned = stripped
 
         reply_token_map = {}
@@ -720,7 +721,7 @@ def crawl_comments(driver, raw_dump_path, out_json="comments.ndjson",
         # parse “an toàn”
         reply_token_map = {}
         try:
-            json_resp = json.loads(resp_text)
+            json_resp = json_loads(resp_text)
             cleaned = resp_text
             reply_token_map = {}
             collect_reply_tokens_from_json(json_resp, reply_token_map)
@@ -730,9 +731,9 @@ def crawl_comments(driver, raw_dump_path, out_json="comments.ndjson",
             parts = _split_top_level_json_objects(stripped)
             if len(parts) > 1:
                 cleaned = clean_fb_resp_text(raw)
-                json_resp = json.loads(cleaned)
+                json_resp = json_loads(cleaned)
             else:
-                json_resp = json.loads(stripped)
+                json_resp = json_loads(stripped)
                 cleaned = stripped
             logger.warning(f"[WARN] page {pages} parse fail:")
 
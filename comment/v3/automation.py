@@ -153,12 +153,12 @@ def open_reel_comments_if_present(driver, wait_after=0.6, timeout=1.0):
         # mở thành công khi:
         # 1) nút có aria-expanded=true, hoặc
         # 2) xuất hiện container có aria-label chứa 'Bình luận' / 'Comments', hoặc
-        # 3) buffer GraphQL tăng
+        # 3) buffer GraphQL tăng (theo seq: buffer bị drain mỗi vòng nên không dùng length)
         return True
 
     # baseline GraphQL buffer để theo dõi có phát request không
     try:
-        baseline = driver.execute_script("return (window.__gqlReqs||[]).length") or 0
+        baseline = driver.execute_script("return window.__gqlSeq || (window.__gqlReqs||[]).length") or 0
     except Exception:
         baseline = 0
 
@@ -200,7 +200,7 @@ def open_reel_comments_if_present(driver, wait_after=0.6, timeout=1.0):
 
     # Kiểm tra đã mở/đã bắn request chưa
     try:
-        now = driver.execute_script("return (window.__gqlReqs||[]).length") or 0
+        now = driver.execute_script("return window.__gqlSeq || (window.__gqlReqs||[]).length") or 0
     except Exception:
         now = baseline
     if _is_expanded(cand) or now > baseline:
@@ -212,7 +212,7 @@ def open_reel_comments_if_present(driver, wait_after=0.6, timeout=1.0):
     time.sleep(wait_after)
 
     try:
-        now2 = driver.execute_script("return (window.__gqlReqs||[]).length") or 0
+        now2 = driver.execute_script("return window.__gqlSeq || (window.__gqlReqs||[]).length") or 0
     except Exception:
         now2 = baseline
 
@@ -2,6 +2,7 @@
 
 import time
 import json
+from collections import Counter
 from pathlib import Path
 import sys
 
@@ -11,6 +12,7 @@ if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
 from utils import append_ndjson_texts
+from hook import drain_gql_reqs
 from automation import (
     open_reel_comments_if_present,
     set_sort_to_all_comments_unified,
@@ -22,25 +24,7 @@ from extract import (
     extract_replies_from_depth_resp,
 )
 from logs.loging_config import logger
-
-def _pull_new_gql_reqs(driver, last_len: int):
-    """
-    Lấy list request GraphQL mới từ window.__gqlReqs kể từ last_len.
-    """
-    try:
-        buf = driver.execute_script("return (window.__gqlReqs || []);")
-    except Exception:
-        return [], last_len
-
-    if not isinstance(buf, list):
-        return [], last_len
-
-    if last_len < 0 or last_len > len(buf):
-        last_len = 0
-
-    new_reqs = buf[last_len:]
-    return new_reqs, len(buf)
-
+from util.graphql_filters import format_counts
 
 def _extract_comments_from_requests(reqs, by_id: dict, out_path: str, round_idx: int):
     """
@@ -86,10 +70,12 @@ def crawl_comments_for_post(
     max_rounds: int = 1000,
     sleep_between_rounds: float = 1.5,
     out_path: str = "comments.ndjson",
+    archive=None,
 ):
     """
     Dùng driver có sẵn để crawl comment. 
     KHÔNG quit driver, KHÔNG close profile.
+    archive: RawArchive (post.v3.storage.archive) -> lưu response thô để replay offline.
     """
     logger.info("[CRAWLER] Start processing link: %s", page_url)
 
@@ -113,9 +99,10 @@ def crawl_comments_for_post(
             logger.warning("[CRAWLER] Cannot set sort to All comments: %s", e)
 
         # Biến trạng thái crawl
-        last_len = 0
+        last_seq = 0
         by_id = {}
         rounds_no_new = 0
+        dropped = Counter()
 
         for r in range(max_rounds):
             logger.info("[CRAWLER] Round %s/%s", r + 1, max_rounds)
@@ -136,8 +123,11 @@ def crawl_comments_for_post(
             time.sleep(sleep_between_rounds)
 
             # Pull GQL
-            new_reqs, last_len = _pull_new_gql_reqs(driver, last_len)
+            new_reqs, last_seq = drain_gql_reqs(driver, last_seq, dropped)
             logger.info("[CRAWLER] New gql reqs: %s", len(new_reqs))
+            if archive is not None:
+                for rec in new_reqs:
+                    archive.add(rec, source=page_url)
 
             # Extract
             added = _extract_comments_from_requests(
@@ -160,6 +150,8 @@ def crawl_comments_for_post(
 
         rows = list(by_id.values())
         logger.info("[CRAWLER] Done link. Total items: %s", len(rows))
+        if dropped:
+            logger.info("[CRAWLER] Dropped by allow-list: %s (%s)", sum(dropped.values()), format_counts(dropped))
         return rows
 
     except Exception as e:
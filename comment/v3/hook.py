@@ -1,9 +1,46 @@
-def install_early_hook(driver):
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+from logs.loging_config import logger
+from util.graphql_filters import hook_filter_js, resolve_allow
+
+DEFAULT_KEEP_LAST = 300
+DEFAULT_BUFFER_MB = 64
+
+
+def comment_allow(mode="comments", extra=None):
+    """
+    Allow-list cho crawler comment. 1 trang bài viết bắn cả query comment lẫn query reply nên
+    gộp list "comments" với "replies". mode "off" -> None (không lọc).
+    """
+    allow = resolve_allow(mode, extra)
+    if allow is None:
+        return None
+    for key, patterns in resolve_allow("replies").items():
+        allow[key] += [p for p in patterns if p not in allow[key]]
+    return allow
+
+
+def install_early_hook(driver, allow=None, keep_last=DEFAULT_KEEP_LAST, max_buffer_mb=DEFAULT_BUFFER_MB):
+    """
+    allow: allow-list friendly name / doc_id, vd. resolve_allow("comments") hoặc
+    resolve_allow("replies"). Request ngoài list bị bỏ trong page, đếm ở window.__gqlDropped.
+
+    Mỗi record có seq tăng dần (window.__gqlSeq). Buffer giữ tối đa keep_last record /
+    max_buffer_mb MB responseText, vượt thì bỏ record cũ nhất; drain_gql_reqs lấy và xoá buffer
+    nên mỗi response chỉ qua bridge WebDriver 1 lần, và nhận ra record bị mất qua lỗ hổng seq.
+    """
     HOOK_SRC = r"""
     (function(){
       if (window.__gqlHooked) return;
       window.__gqlHooked = true;
       window.__gqlReqs = [];
+      window.__gqlSeq = 0;
+      window.__gqlBuf = {bytes: 0};
+      __FILTER_JS__
       function headersToObj(h){
         try{
           if (!h) return {};
@@ -12,7 +49,15 @@ def install_early_hook(driver):
           return (typeof h==='object') ? h : {};
         }catch(e){ return {}; }
       }
-      const pushRec = (rec)=>{ try{ (window.__gqlReqs||[]).push(rec); }catch(e){} };
+      const pushRec = (rec)=>{ try{
+        rec.seq = ++window.__gqlSeq;
+        rec.size = (typeof rec.responseText === 'string') ? rec.responseText.length : 0;
+        const q = window.__gqlReqs, buf = window.__gqlBuf;
+        q.push(rec); buf.bytes += rec.size;
+        while (q.length > 1 && (q.length > __KEEP_LAST__ || buf.bytes > __MAX_BYTES__)){
+          buf.bytes -= q.shift().size;
+        }
+      }catch(e){} };
       const origFetch = window.fetch;
       window.fetch = async function(input, init){
         const url = (typeof input==='string') ? input : (input && input.url) || '';
@@ -20,7 +65,7 @@ def install_early_hook(driver):
         const body = (init && typeof init.body==='string') ? init.body : '';
         const hdrs = headersToObj(init && init.headers);
         let rec = null;
-        if (url.includes('/api/graphql/') && method === 'POST'){
+        if (url.includes('/api/graphql/') && method === 'POST' && __gqlKeep(body)){
           rec = {kind:'fetch', url, method, headers:hdrs, body:String(body)};
         }
         const res = await origFetch(input, init);
@@ -36,8 +81,8 @@ def install_early_hook(driver):
         this.__b = (typeof b==='string') ? b : '';
         this.addEventListener('load', ()=>{
           try{
-            if ((this.__u||'').includes('/api/graphql/') && (this.__m||'')==='POST'){
-              (window.__gqlReqs||[]).push({
+            if ((this.__u||'').includes('/api/graphql/') && (this.__m||'')==='POST' && __gqlKeep(this.__b)){
+              pushRec({
                 kind:'xhr', url:this.__u, method:this.__m, headers:{},
                 body:String(this.__b),
                 responseText:(typeof this.responseText==='string'?this.responseText:null)
@@ -48,9 +93,50 @@ def install_early_hook(driver):
         return XS.apply(this, arguments);
       };
     })();
-    """
+    """.replace("__FILTER_JS__", hook_filter_js(allow)).replace("__KEEP_LAST__", str(int(keep_last))).replace(
+        "__MAX_BYTES__", str(int(max_buffer_mb * 1024 * 1024)))
     driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": HOOK_SRC})
 
+
+def drain_gql_reqs(driver, last_seq: int = 0, dropped=None):
+    """
+    Lấy hết record trong window.__gqlReqs rồi xoá buffer (1 lệnh execute_script nên không lọt
+    record nào giữa lấy và xoá). Trả về (recs, last_seq).
+    dropped: Counter để cộng số request allow-list đã bỏ (window.__gqlDropped, lấy xong thì xoá).
+
+    last_seq: seq lớn nhất đã nhận ở lần trước. Seq của page nhỏ hơn last_seq (reload / sang
+    link khác) thì đếm lại từ 0. Record mất do buffer đầy được log warning.
+    Hook cũ không có seq thì vẫn drain bình thường, chỉ không kiểm được record mất.
+    """
+    try:
+        res = driver.execute_script(
+            """
+            const q = window.__gqlReqs || [];
+            const recs = q.splice(0, q.length);
+            if (window.__gqlBuf) window.__gqlBuf.bytes = 0;
+            const dropped = window.__gqlDropped || {};
+            window.__gqlDropped = {};
+            return {recs: recs, seq: window.__gqlSeq || 0, dropped: dropped};
+            """
+        )
+    except Exception:
+        return [], last_seq
+    if not isinstance(res, dict) or not isinstance(res.get("recs"), list):
+        return [], last_seq
+    if dropped is not None and isinstance(res.get("dropped"), dict):
+        dropped.update(res["dropped"])
+
+    recs = res["recs"]
+    seq = int(res.get("seq") or 0)
+    if not seq:
+        return recs, last_seq
+    if seq < last_seq:
+        last_seq = 0
+    lost = (seq - last_seq) - len(recs)
+    if lost > 0:
+        logger.warning("[HOOK] buffer overflow: mất %d record GraphQL (seq %d -> %d)", lost, last_seq, seq)
+    return recs, seq
+
 def hook_graphql(driver):
     js = r"""
     (function() {
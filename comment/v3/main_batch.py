@@ -22,8 +22,9 @@ except ImportError:
     from driver_morelogin import create_chrome_attach
 
 from crawl_comments import crawl_comments_for_post
+from post.v3.storage.archive import RawArchive
 from logs.loging_config import logger
-from hook import install_early_hook 
+from hook import comment_allow, install_early_hook
 
 def safe_filename_from_url(url: str, max_len: int = 100) -> str:
     try:
@@ -50,6 +51,25 @@ def parse_args():
         action="store_true",
         help="Bật chế độ không giao diện (Headless) của MoreLogin.",
     )
+    parser.add_argument(
+        "--archive",
+        action="store_true",
+        help="Lưu response GraphQL thô (zstd) vào <out>/raw_dump_comments/ để replay (python -m post.v3.replay comments).",
+    )
+    parser.add_argument(
+        "--gql-allow",
+        dest="gql_allow",
+        choices=["comments", "off"],
+        default="comments",
+        help="Allow-list friendly name/doc_id cho hook (comments = query comment + reply, off = giữ mọi /api/graphql/).",
+    )
+    parser.add_argument(
+        "--gql-allow-extra",
+        dest="gql_allow_extra",
+        nargs="*",
+        default=[],
+        help="Regex friendly name / doc_id bổ sung vào allow-list.",
+    )
     
     return parser.parse_args()
 
@@ -83,6 +103,7 @@ if __name__ == "__main__":
     logger.info("[BATCH] Tổng link cần crawl: %s", len(links))
 
     driver = None
+    archive = RawArchive(OUT_DIR / "raw_dump_comments") if args.archive else None
     
     # --- BẮT ĐẦU QUY TRÌNH DRIVER 1 LẦN ---
     try:
@@ -114,8 +135,8 @@ if __name__ == "__main__":
         try:
             driver.execute_cdp_cmd("Network.enable", {})
             driver.execute_cdp_cmd("Network.setCacheDisabled", {"cacheDisabled": True})
-            install_early_hook(driver)
-            logger.info("[INIT] Hooks & Network CDP enabled.")
+            install_early_hook(driver, allow=comment_allow(args.gql_allow, args.gql_allow_extra))
+            logger.info("[INIT] Hooks & Network CDP enabled (gql-allow=%s).", args.gql_allow)
         except Exception as e:
             logger.warning("[INIT] Warning setting up CDP/Hooks: %s", e)
 
@@ -135,6 +156,7 @@ if __name__ == "__main__":
                     max_rounds=200,      
                     sleep_between_rounds=1.5,
                     out_path=str(out_path),
+                    archive=archive,
                 )
 
                 if not rows:
@@ -153,6 +175,8 @@ if __name__ == "__main__":
 
     finally:
         # 6. Dọn dẹp cuối cùng
+        if archive is not None:
+            archive.close()
         if driver:
             logger.info("[CLEANUP] Quitting Selenium driver...")
             try:
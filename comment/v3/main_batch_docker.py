@@ -2,6 +2,7 @@
 
 import time
 import json
+from collections import Counter
 from pathlib import Path
 import sys
 
@@ -14,7 +15,7 @@ if str(PROJECT_ROOT) not in sys.path:
 
 from driver import create_chrome
 from util.startdriverproxy import bootstrap_auth
-from hook import install_early_hook
+from hook import comment_allow, drain_gql_reqs, install_early_hook
 from automation import (
     open_reel_comments_if_present,
     set_sort_to_all_comments_unified,
@@ -26,6 +27,7 @@ from extract import (
     extract_replies_from_depth_resp,
 )
 from logs.loging_config import logger
+from util.graphql_filters import format_counts
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
@@ -42,26 +44,6 @@ def close_fb_login_popup(driver, timeout=5):
     except Exception as e:
         print("⚠️ Close button not found:", e)
 
-def _pull_new_gql_reqs(driver, last_len: int):
-    """
-    Lấy list request GraphQL mới từ window.__gqlReqs kể từ last_len.
-    Trả về (new_reqs, new_len).
-    """
-    try:
-        buf = driver.execute_script("return (window.__gqlReqs || []);")
-    except Exception:
-        return [], last_len
-
-    if not isinstance(buf, list):
-        return [], last_len
-
-    if last_len < 0 or last_len > len(buf):
-        last_len = 0
-
-    new_reqs = buf[last_len:]
-    return new_reqs, len(buf)
-
-
 def _extract_comments_from_requests(reqs, by_id: dict, out_path: str, round_idx: int):
     """
     Đi qua list request, parse comment/reply, gom vào by_id (anti-dup).
@@ -123,10 +105,12 @@ def crawl_comments_for_post(
     sleep_between_rounds: float = 1.5,
     headless: bool = False,
     out_path: str = "comments.ndjson",   # 👈 thêm default path
+    gql_allow: str = "comments",
 ):
     """
     Mở 1 bài viết Facebook, scroll + click “Xem thêm bình luận”, 
     hứng GraphQL trong window.__gqlReqs, parse comment + reply.
+    gql_allow: allow-list của hook ("comments" = query comment + reply, "off" = không lọc).
     Trả về: list[row_dict]
     """
     logger.info("[CRAWLER] Start crawl comments for: %s", page_url)
@@ -150,8 +134,8 @@ def crawl_comments_for_post(
 
         # gắn hook (trước khi load page)
         try:
-            install_early_hook(driver)
-            logger.info("[HOOK] install_early_hook OK")
+            install_early_hook(driver, allow=comment_allow(gql_allow))
+            logger.info("[HOOK] install_early_hook OK (gql-allow=%s)", gql_allow)
         except Exception as e:
             logger.error("[HOOK] install_early_hook FAILED: %s", e)
 
@@ -175,9 +159,10 @@ def crawl_comments_for_post(
             logger.warning("[CRAWLER] Cannot set sort to All comments: %s", e)
 
         # Biến trạng thái crawl
-        last_len = 0       # số lượng req trước đó trong window.__gqlReqs
+        last_seq = 0       # seq lớn nhất đã lấy từ window.__gqlReqs
         by_id = {}         # map comment_id -> row
         rounds_no_new = 0  # số vòng liền không thêm comment mới
+        dropped = Counter()  # request allow-list đã bỏ trong page, theo friendly name
 
         for r in range(max_rounds):
             logger.info("[CRAWLER] Round %s/%s", r + 1, max_rounds)
@@ -203,7 +188,7 @@ def crawl_comments_for_post(
             time.sleep(sleep_between_rounds)
 
             # 4) Lấy request GraphQL mới
-            new_reqs, last_len = _pull_new_gql_reqs(driver, last_len)
+            new_reqs, last_seq = drain_gql_reqs(driver, last_seq, dropped)
             logger.info("[CRAWLER] New gql reqs this round: %s", len(new_reqs))
 
             # 5) Parse comment từ responseText + append NDJSON
@@ -227,6 +212,8 @@ def crawl_comments_for_post(
 
         rows = list(by_id.values())
         logger.info("[CRAWLER] Done. Total unique comments+replies: %s", len(rows))
+        if dropped:
+            logger.info("[CRAWLER] Dropped by allow-list: %s (%s)", sum(dropped.values()), format_counts(dropped))
         return rows
 
     finally:
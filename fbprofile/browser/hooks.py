@@ -1,6 +1,8 @@
 # post/v3/browser/hooks.py
 import time
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+
+from util.graphql_filters import hook_filter_js
 
 CLEANUP_JS = r"""
 (function(keep) {
@@ -34,12 +36,17 @@ CLEANUP_JS = r"""
 """
 
 
-def install_early_hook(driver, keep_last: int = 350):
+def install_early_hook(driver, keep_last: int = 350, allow: Optional[dict] = None):
+    """
+    allow: allow-list friendly name / doc_id (util.graphql_filters.resolve_allow("profile")).
+    Request ngoài list bị bỏ trong page, đếm ở window.__gqlDropped (đọc bằng pop_gql_dropped).
+    """
     hook_src = r"""
     (function(){
       if (window.__gqlHooked) return;
       window.__gqlHooked = true;
       window.__gqlReqs = [];
+      __FILTER_JS__
       function headersToObj(h){try{
         if (!h) return {};
         if (h instanceof Headers){const o={}; h.forEach((v,k)=>o[k]=v); return o;}
@@ -57,7 +64,7 @@ def install_early_hook(driver, keep_last: int = 350):
         const body = (init && typeof init.body==='string') ? init.body : '';
         const hdrs = headersToObj(init && init.headers);
         let rec = null;
-        if (url.includes('/api/graphql/') && method==='POST'){
+        if (url.includes('/api/graphql/') && method==='POST' && __gqlKeep(body)){
           rec = {kind:'fetch', url, method, headers:hdrs, body:String(body)};
         }
         const res = await origFetch(input, init);
@@ -73,7 +80,7 @@ def install_early_hook(driver, keep_last: int = 350):
         this.__b = (typeof b==='string')?b:'';
         this.addEventListener('load', ()=>{
           try{
-            if ((this.__u||'').includes('/api/graphql/') && (this.__m||'')==='POST'){
+            if ((this.__u||'').includes('/api/graphql/') && (this.__m||'')==='POST' && __gqlKeep(this.__b)){
               pushRec({kind:'xhr', url:this.__u, method:this.__m, headers:{}, body:String(this.__b),
                        responseText:(typeof this.responseText==='string'?this.responseText:null)});
             }
@@ -82,7 +89,7 @@ def install_early_hook(driver, keep_last: int = 350):
         return XS.apply(this, arguments);
       };
     })();
-    """.replace("__KEEP_LAST__", str(keep_last))
+    """.replace("__KEEP_LAST__", str(keep_last)).replace("__FILTER_JS__", hook_filter_js(allow))
 
     driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": hook_src})
     driver.execute_script(hook_src)
@@ -102,3 +109,18 @@ def flush_gql_recs(driver) -> List[Dict[str, Any]]:
         return recs
     except Exception:
         return []
+
+
+def pop_gql_dropped(driver) -> Dict[str, int]:
+    """Số request allow-list đã bỏ theo friendly name (window.__gqlDropped), lấy xong thì xoá."""
+    try:
+        res = driver.execute_script(
+            """
+            const d = window.__gqlDropped || {};
+            window.__gqlDropped = {};
+            return d;
+            """
+        )
+        return res if isinstance(res, dict) else {}
+    except Exception:
+        return {}
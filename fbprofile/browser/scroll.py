@@ -4,7 +4,8 @@ from pathlib import Path
 from typing import Set, Dict, Any
 
 from logs.loging_config import logger
-from ..browser.hooks import CLEANUP_JS, flush_gql_recs
+from util.graphql_filters import format_counts
+from ..browser.hooks import CLEANUP_JS, flush_gql_recs, pop_gql_dropped
 from ..graphql.extractors import _best_primary_key
 from ..pipeline import process_single_gql_rec  # sẽ tạo file này bên dưới
 
@@ -120,4 +121,7 @@ def crawl_scroll_loop(
         time.sleep(1)
 
     logger.info("[DONE] Crawl loop finished. Total unique posts seen: %d", len(seen_ids))
+    dropped = pop_gql_dropped(d)
+    if dropped:
+        logger.info("[GQL] dropped by allow-list: %s", format_counts(dropped))
     return stopped_due_to_stall  # NEW
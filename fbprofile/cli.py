@@ -8,6 +8,7 @@ from datetime import datetime, date
 from typing import Set
 
 from logs.loging_config import logger
+from util.graphql_filters import GQL_ALLOW_LISTS, resolve_allow
 from util.startdriverproxy import bootstrap_auth
 
 from .config import PROJECT_ROOT, env
@@ -40,6 +41,11 @@ def add_common_args(ap):
     ap.add_argument("--keep-last", type=int,
                     default=env("KEEP_LAST", 350, int),
                     help="Số bản ghi GQL giữ lại trong window.__gqlReqs")
+    ap.add_argument("--gql-allow", type=str, choices=["off", *GQL_ALLOW_LISTS],
+                    default=env("PROFILE_GQL_ALLOW", "profile"),
+                    help="Allow-list friendly name/doc_id cho hook capture (off = giữ mọi /api/graphql/)")
+    ap.add_argument("--gql-allow-extra", type=str, nargs="*", default=[],
+                    help="Regex friendly name / doc_id bổ sung vào allow-list")
     ap.add_argument("--headless", action="store_true",
                     help="Chạy headless (ẩn Chrome)")
     ap.add_argument("--no-headless", action="store_true",
@@ -94,8 +100,8 @@ def _run_single_session(
     # if login_status == False:
     #     return
     try:
-        install_early_hook(d, keep_last=keep_last)
-        logger.info("[HOOK] install_early_hook OK (keep_last=%s)", keep_last)
+        install_early_hook(d, keep_last=keep_last, allow=resolve_allow(args.gql_allow, args.gql_allow_extra))
+        logger.info("[HOOK] install_early_hook OK (keep_last=%s, gql-allow=%s)", keep_last, args.gql_allow)
     except Exception as e:
         logger.error("[HOOK] install_early_hook FAILED: %s", e)
 
@@ -1,10 +1,16 @@
 # post/v3/graphql/parser.py
 import json
-import re
 from typing import List, Any, Optional
 
 from urllib.parse import urlparse, urlunparse
 
+from util.graphql_json import (
+    choose_best_graphql_obj,
+    iter_json_spans,
+    strip_xssi_prefix as _strip_xssi_prefix,
+)
+from util.json_backend import loads as json_loads
+
 from ..config import PROJECT_ROOT
 
 
@@ -39,59 +45,16 @@ def deep_collect_timestamps(obj) -> List[int]:
     return out
 
 
-def _strip_xssi_prefix(s: str) -> str:
-    if not s:
-        return s
-    s2 = s.lstrip()
-    s2 = re.sub(r'^\s*for\s*\(\s*;\s*;\s*\)\s*;\s*', '', s2)
-    s2 = re.sub(r"^\s*\)\]\}'\s*", '', s2)
-    return s2
-
-
-def iter_json_values(s: str):
-    dec = json.JSONDecoder()
-    i, n = 0, len(s)
-    while i < n:
-        m = re.search(r'\S', s[i:])
-        if not m:
-            break
-        j = i + m.start()
-        try:
-            obj, k = dec.raw_decode(s, j)
-            yield obj
-            i = k
-        except json.JSONDecodeError:
-            chunk = _strip_xssi_prefix(s[j:])
-            if chunk == s[j:]:
-                break
-            try:
-                obj, k_rel = dec.raw_decode(chunk, 0)
-                yield obj
-                i = j + k_rel
-            except json.JSONDecodeError:
-                break
-
-
-def choose_best_graphql_obj(objs):
-    objs = list(objs)
-    if not objs:
-        return None
-    with_data = [o for o in objs if isinstance(o, dict) and "data" in o]
-    pick = with_data or objs
-    return max(pick, key=lambda o: len(json.dumps(o, ensure_ascii=False)))
-
-
 def parse_fb_graphql_payload(text: str):
     if not text:
         return None
 
-    cleaned = _strip_xssi_prefix(text)
-    objs = list(iter_json_values(cleaned))
-    payload = choose_best_graphql_obj(objs) if objs else None
+    # iter_json_spans tự bỏ prefix XSSI tại chỗ, không cần strip/copy cả chuỗi trước
+    payload = choose_best_graphql_obj(iter_json_spans(text))
     if payload is not None:
         return payload
 
     try:
-        return json.loads(cleaned)
+        return json_loads(_strip_xssi_prefix(text))
     except json.JSONDecodeError:
         return None
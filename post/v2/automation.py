@@ -1,6 +1,6 @@
 import time, json, urllib
 from urllib.parse import  urlencode
-from utils import _strip_xssi_prefix, choose_best_graphql_obj, deep_collect_cursors, deep_find_has_next, is_group_feed_req, iter_json_values, merge_vars, parse_form, strip_cursors_from_vars, update_vars_for_next_cursor
+from utils import choose_best_graphql_obj, deep_collect_cursors, deep_find_has_next, is_group_feed_req, iter_json_spans, json_loads, merge_vars, parse_form, strip_cursors_from_vars, update_vars_for_next_cursor
 # =========================
 # Hook /api/graphql/
 # =========================
@@ -136,7 +136,7 @@ def js_fetch_in_page(driver, form_dict, extra_headers=None, timeout_ms=20000):
     driver.set_script_timeout(max(5, int(timeout_ms/1000) + 10))
     raw = driver.execute_async_script(script, form_dict, extra_headers or {}, int(timeout_ms))
     try:
-        obj = json.loads(raw) if isinstance(raw, str) else raw
+        obj = json_loads(raw) if isinstance(raw, str) else raw
     except Exception:
         raise RuntimeError(f"js_fetch_in_page: bad_return {raw!r}")
 
@@ -150,7 +150,7 @@ def js_fetch_in_page(driver, form_dict, extra_headers=None, timeout_ms=20000):
 # =========================
 def soft_refetch_form_and_cursor(driver, form, vars_template):
     try:
-        base = json.loads(form.get("variables", "{}"))
+        base = json_loads(form.get("variables", "{}"))
     except Exception:
         base = {}
     base = merge_vars(base, vars_template)
@@ -163,7 +163,7 @@ def soft_refetch_form_and_cursor(driver, form, vars_template):
         "Cache-Control": "no-cache",
         "Pragma": "no-cache",
     })
-    obj = choose_best_graphql_obj(iter_json_values(_strip_xssi_prefix(txt)))
+    obj = choose_best_graphql_obj(iter_json_spans(txt))
     if not obj:
         return None, None, None, None
 
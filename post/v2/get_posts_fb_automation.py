@@ -12,10 +12,10 @@ from automation import (fast_forward_cursor, fetch_via_wire, js_fetch_in_page,
                         reload_and_refresh_form, soft_refetch_form_and_cursor)
 from checkpoint import append_ndjson, save_checkpoint
 from utils import (
-                   _strip_xssi_prefix, choose_best_graphql_obj, 
+                   choose_best_graphql_obj, 
                     current_cursor_from_form, deep_collect_cursors, 
                     deep_collect_timestamps, deep_find_has_next, 
-                    iter_json_values, merge_vars, short_cursor, 
+                    iter_json_spans, merge_vars, short_cursor, 
                     strip_cursors_from_vars, update_vars_for_next_cursor)
 
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
@@ -274,7 +274,7 @@ def paginate_window(d, form, vars_template, seen_ids: set,
                             pass
                         raise
 
-        obj = choose_best_graphql_obj(iter_json_values(_strip_xssi_prefix(txt)))
+        obj = choose_best_graphql_obj(iter_json_spans(txt))
         with open(os.path.join(str(raw_dump_output_dir), f"slice_{t_from or '-inf'}_{t_to or '+inf'}_p{page}.json"), "w", encoding="utf-8") as f:
             json.dump(obj, f, ensure_ascii=False, indent=2)
 
@@ -468,7 +468,7 @@ def probe_head(driver, base_form, vars_template, k=5):
     txt = js_fetch_in_page(driver, form0, extra_headers={
         "Cache-Control": "no-cache", "Pragma": "no-cache",
     })
-    obj = choose_best_graphql_obj(iter_json_values(_strip_xssi_prefix(txt)))
+    obj = choose_best_graphql_obj(iter_json_spans(txt))
     if not obj: 
         return None, [], None
 
@@ -549,7 +549,7 @@ def run_cursor_only(d, form, vars_template, seen_ids,database_path, page_limit=N
         fresh_head = 0
         try:
             txt = js_fetch_in_page(d, strip_cursors_from_form_on_form(form, vars_template(form)), {}, 15000)  # pseudo
-            obj = choose_best_graphql_obj(iter_json_values(_strip_xssi_prefix(txt)))
+            obj = choose_best_graphql_obj(iter_json_spans(txt))
             buf = []
             collect_post_summaries(obj, buf)
             buf = coalesce_posts(filter_only_feed_posts(buf))
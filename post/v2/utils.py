@@ -1,6 +1,13 @@
-import json, re, urllib
+import json, re, urllib, sys
+from pathlib import Path
 from typing import Optional, List, Dict
 from configs import *
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+from util.graphql_json import choose_best_graphql_obj, iter_json_spans, iter_json_values, strip_xssi_prefix as _strip_xssi_prefix
+from util.json_backend import loads as json_loads
 # =========================
 # Request matching / parsing
 # =========================
@@ -17,7 +24,7 @@ def is_group_feed_req(rec):
             return True
     try:
         v = parse_form(body).get("variables","")
-        vj = json.loads(urllib.parse.unquote_plus(v))
+        vj = json_loads(urllib.parse.unquote_plus(v))
         if any(k in vj for k in ["groupID","groupIDV2","id","actorID","profileID","pageID"]):
             if any(k in vj for k in ["after","cursor","endCursor","afterCursor","feedAfterCursor","beforeTime","afterTime"]):
                 return True
@@ -28,40 +35,9 @@ def is_group_feed_req(rec):
 # =========================
 # JSON helpers
 # =========================
-def _strip_xssi_prefix(s: str) -> str:
-    if not s: return s
-    s2 = s.lstrip()
-    s2 = re.sub(r'^\s*for\s*\(\s*;\s*;\s*\)\s*;\s*', '', s2)
-    s2 = re.sub(r"^\s*\)\]\}'\s*", '', s2)
-    return s2
-
-def iter_json_values(s: str):
-    dec = json.JSONDecoder()
-    i, n = 0, len(s)
-    while i < n:
-        m = re.search(r'\S', s[i:])
-        if not m: break
-        j = i + m.start()
-        try:
-            obj, k = dec.raw_decode(s, j); yield obj; i = k
-        except json.JSONDecodeError:
-            chunk = _strip_xssi_prefix(s[j:])
-            if chunk == s[j:]: break
-            try:
-                obj, k_rel = dec.raw_decode(chunk, 0); yield obj; i = j + k_rel
-            except json.JSONDecodeError:
-                break
-
-def choose_best_graphql_obj(objs):
-    objs = list(objs)
-    if not objs: return None
-    with_data = [o for o in objs if isinstance(o, dict) and 'data' in o]
-    pick = with_data or objs
-    return max(pick, key=lambda o: len(json.dumps(o, ensure_ascii=False)))
-
 def current_cursor_from_form(form):
     try:
-        v = json.loads(form.get("variables", "{}"))
+        v = json_loads(form.get("variables", "{}"))
     except Exception:
         return None
     for k in ["cursor","after","endCursor","afterCursor","feedAfterCursor"]:
@@ -146,7 +122,7 @@ def deep_collect_timestamps(obj) -> List[int]:
 # =========================
 def get_vars_from_form(form_dict):
     try:
-        return json.loads(form_dict.get("variables", "{}")) if form_dict else {}
+        return json_loads(form_dict.get("variables", "{}")) if form_dict else {}
     except:
         return {}
 
@@ -172,7 +148,7 @@ def strip_cursors_from_vars(v: dict) -> dict:
 
 def update_vars_for_next_cursor(form: dict, next_cursor: str, vars_template: dict = None):
     try:
-        base = json.loads(form.get("variables", "{}"))
+        base = json_loads(form.get("variables", "{}"))
     except Exception:
         base = {}
     if vars_template:
@@ -0,0 +1,388 @@
+# post/v3/bench.py
+"""
+Bench offline cho tầng GraphQL của post.v3 (không cần Selenium / MoreLogin).
+
+    python -m post.v3.bench extractors --fixtures path/to/fixtures [--repeat 5]
+    python -m post.v3.bench decoder    --fixtures path/to/fixtures [--mb 4]
+    python -m post.v3.bench json       --fixtures path/to/fixtures
+    python -m post.v3.bench suite      --fixtures path/to/fixtures [--save-baseline] [--max-slowdown 1.3]
+
+Fixture:
+  - *.txt / *.json : mỗi file là 1 responseText thô
+  - *.ndjson       : mỗi dòng là 1 record đã capture (có key "responseText"), hoặc 1 record archive
+  - loại fixture (feed / timeline / reel / comment / reply) lấy theo thư mục con hoặc prefix
+    tên file (vd. comment/abc.txt, reply_01.json); không khớp thì coi là feed.
+
+suite: đo parse_fb_graphql_payload, collect_post_summaries, coalesce_posts (feed/timeline/reel),
+extract_full_posts_from_resptext (comment) và extract_replies_from_depth_resp (reply), in MB/s và
+records/s. Baseline lưu ở <fixtures>/bench_baseline.json (--save-baseline để ghi lại); chạy chậm
+hơn baseline quá --max-slowdown lần thì trả về 3. Baseline phụ thuộc máy, đừng dùng chung.
+
+Fixture + baseline không commit vào repo (capture có tên / nội dung post của người thật). Tạo từ
+archive của crawler (--archive, xem storage/archive.py):
+
+    mkdir -p bench_fx/feed bench_fx/comment
+    zstd -dc database/post/page/<page>/raw_dump_posts/seg-*.zst > bench_fx/feed/capture.ndjson
+    zstd -dc <raw_dump_comments>/seg-*.zst > bench_fx/comment/capture.ndjson
+    python -m post.v3.bench suite --fixtures bench_fx --save-baseline   # 1 lần trên máy chạy bench
+    python -m post.v3.bench suite --fixtures bench_fx                   # sau mỗi thay đổi
+"""
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List
+
+from comment.v3.extract import extract_full_posts_from_resptext, extract_replies_from_depth_resp
+from util import json_backend
+from util.graphql_json import choose_best_graphql_obj, iter_json_spans, iter_json_values, strip_xssi_prefix
+
+from .graphql.parser import parse_fb_graphql_payload
+from .graphql.schemas import FeedPathStats, collect_feed_post_summaries, request_query_key
+from .graphql.extractors import (
+    _build_post_item,
+    _looks_like_group_post,
+    _multipass_post_fields,
+    coalesce_posts,
+    collect_post_summaries,
+)
+from .replay import _capture_record
+
+BENCH_GROUP_URL = "https://www.facebook.com/groups/bench/"
+BASELINE_NAME = "bench_baseline.json"
+KINDS = ("feed", "timeline", "reel", "comment", "reply")
+POST_KINDS = ("feed", "timeline", "reel")
+NOISE_FLOOR_S = 0.002  # chênh lệch tuyệt đối dưới mức này không tính là regression
+
+
+def _fixture_kind(root: Path, p: Path) -> str:
+    for part in p.relative_to(root).parts:
+        head = re.split(r"[_.\-]", part.lower(), 1)[0]
+        if head in KINDS:
+            return head
+    return "feed"
+
+
+def load_fixtures(root: Path) -> List[dict]:
+    """Trả về list record {"name", "kind", "responseText", "body"} (body rỗng với fixture text thô)."""
+    root = Path(root)
+    out = []
+    for p in sorted(root.rglob("*")):
+        if not p.is_file() or p.name == BASELINE_NAME:
+            continue
+        kind = _fixture_kind(root, p)
+        if p.suffix in (".txt", ".json"):
+            out.append({"name": p.name, "kind": kind, "responseText": p.read_text(encoding="utf-8"), "body": ""})
+        elif p.suffix == ".ndjson":
+            with p.open(encoding="utf-8") as f:
+                for i, line in enumerate(f):
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        rec = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    text = rec.get("responseText") if isinstance(rec, dict) else None
+                    if isinstance(text, str) and text:
+                        rec = _capture_record(rec)  # dòng archive: dựng lại body từ name / doc_id / variables
+                        out.append({"name": f"{p.name}:{i}", "kind": kind, "responseText": text,
+                                    "body": rec.get("body") or ""})
+    return out
+
+
+def _collect_multipass(obj, out, group_url):
+    """collect_post_summaries bản cũ: mỗi story node bị duyệt lại cho từng trường."""
+    if isinstance(obj, dict):
+        if _looks_like_group_post(obj):
+            out.append(_build_post_item(obj, group_url, _multipass_post_fields(obj)))
+        for v in obj.values():
+            _collect_multipass(v, out, group_url)
+    elif isinstance(obj, list):
+        for v in obj:
+            _collect_multipass(v, out, group_url)
+
+
+def _iter_json_values_sliced(s: str):
+    """iter_json_values bản cũ: re.search trên s[i:] + strip XSSI trên s[j:] (bậc 2 theo kích thước)."""
+    dec = json.JSONDecoder()
+    i, n = 0, len(s)
+    while i < n:
+        m = re.search(r'\S', s[i:])
+        if not m:
+            break
+        j = i + m.start()
+        try:
+            obj, k = dec.raw_decode(s, j)
+            yield obj
+            i = k
+        except json.JSONDecodeError:
+            chunk = strip_xssi_prefix(s[j:])
+            if chunk == s[j:]:
+                break
+            try:
+                obj, k_rel = dec.raw_decode(chunk, 0)
+                yield obj
+                i = j + k_rel
+            except json.JSONDecodeError:
+                break
+
+
+def _choose_by_dumps(objs):
+    """choose_best_graphql_obj bản cũ: đo bằng len(json.dumps(o)) (cùng thứ tự ưu tiên chunk)."""
+    objs = list(objs)
+    if not objs:
+        return None
+    with_data = [o for o in objs if isinstance(o, dict) and "data" in o]
+    main = [o for o in with_data if "path" not in o and "label" not in o]
+    pick = main or with_data or objs
+    return max(pick, key=lambda o: len(json.dumps(o, ensure_ascii=False)))
+
+
+def _best_of(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _run_collect(collect, payloads) -> List[dict]:
+    out: List[dict] = []
+    for p in payloads:
+        collect(p, out, BENCH_GROUP_URL)
+    return out
+
+
+def bench_extractors(fixtures, repeat: int) -> int:
+    parsed = [(parse_fb_graphql_payload(rec["responseText"]), rec) for rec in fixtures]
+    parsed = [(p, rec) for p, rec in parsed if p is not None]
+    payloads = [p for p, _ in parsed]
+    if not payloads:
+        print("[BENCH] không có payload hợp lệ")
+        return 1
+
+    old_items = _run_collect(_collect_multipass, payloads)
+    new_items = _run_collect(collect_post_summaries, payloads)
+    old_dump = [json.dumps(x, ensure_ascii=False) for x in old_items]
+    new_dump = [json.dumps(x, ensure_ascii=False) for x in new_items]
+    if old_dump != new_dump:
+        print(f"[BENCH] MISMATCH: multipass={len(old_dump)} items, single-pass={len(new_dump)} items")
+        return 2
+
+    t_old = _best_of(lambda: _run_collect(_collect_multipass, payloads), repeat)
+    t_new = _best_of(lambda: _run_collect(collect_post_summaries, payloads), repeat)
+    print(f"[BENCH] payloads={len(payloads)} items={len(new_items)} (output identical)")
+    print(f"[BENCH] multipass   : {t_old * 1000:9.1f} ms")
+    print(f"[BENCH] single-pass : {t_new * 1000:9.1f} ms  (x{t_old / t_new if t_new else 0:.2f})")
+
+    # fast-path theo friendly name / doc_id: phải ra đúng các item như quét toàn bộ
+    keyed = [(p, request_query_key(rec)) for p, rec in parsed]
+
+    def run_fast(stats=None):
+        out: List[dict] = []
+        for p, (friendly, doc_id) in keyed:
+            collect_feed_post_summaries(p, out, BENCH_GROUP_URL, friendly, doc_id, stats=stats)
+        return out
+
+    stats = FeedPathStats()
+    fast_dump = [json.dumps(x, ensure_ascii=False) for x in run_fast(stats)]
+    summary = stats.summary()
+    if fast_dump != new_dump:
+        print(f"[BENCH] MISMATCH: fast-path={len(fast_dump)} items, full scan={len(new_dump)} items")
+        return 2
+    t_fast = _best_of(run_fast, repeat)
+    print(f"[BENCH] fast-path   : {t_fast * 1000:9.1f} ms  (x{t_old / t_fast if t_fast else 0:.2f}) | {summary}")
+    return 0
+
+
+def bench_decoder(fixtures, repeat: int, mb: float) -> int:
+    """Ghép fixture thành 1 response batch (prefix `for (;;);` + các doc cách nhau bởi newline) cỡ `mb` MB."""
+    docs = [strip_xssi_prefix(rec["responseText"]) for rec in fixtures]
+    parts, size, target = [], 0, int(mb * 1024 * 1024)
+    while size < target:
+        for d in docs:
+            parts.append(d)
+            size += len(d) + 1
+            if size >= target:
+                break
+    text = "for (;;);" + "\n".join(parts)
+
+    # cách gọi cũ: strip prefix (copy cả chuỗi) rồi mới decode
+    old = lambda: sum(1 for _ in _iter_json_values_sliced(strip_xssi_prefix(text)))
+    new = lambda: sum(1 for _ in iter_json_values(text))
+    n_old, n_new = old(), new()
+    if n_new != n_old:
+        print(f"[BENCH] MISMATCH: sliced={n_old} docs, in-place={n_new} docs")
+        return 2
+
+    t_old = _best_of(old, repeat)
+    t_new = _best_of(new, repeat)
+    mbs = len(text) / (1024 * 1024)
+    print(f"[BENCH] response={mbs:.1f} MB docs={n_new}")
+    print(f"[BENCH] sliced   : {t_old * 1000:9.1f} ms  ({mbs / t_old:7.1f} MB/s)")
+    print(f"[BENCH] in-place : {t_new * 1000:9.1f} ms  ({mbs / t_new:7.1f} MB/s, x{t_old / t_new:.2f})")
+
+    # chọn payload chính: mỗi fixture + batch 2..5 fixture liền nhau
+    texts = [rec["responseText"] for rec in fixtures]
+    cases = texts + ["\n".join(texts[i:i + w]) for w in range(2, 6) for i in range(0, len(texts), w)]
+    # escape \uXXXX (tiếng Việt) làm text dài hơn json.dumps(ensure_ascii=False) của chính nó
+    escaped = ["\n".join(json.dumps(o) for o in iter_json_values(t)) for t in texts]
+    cases += ["\n".join(pair) for pair in zip(escaped, texts[1:])]
+    spans = [list(iter_json_spans(t)) for t in cases]
+    mismatch = sum(
+        1 for sp in spans
+        if choose_best_graphql_obj(sp) is not _choose_by_dumps(o for o, _, _ in sp)
+    )
+    t_dumps = _best_of(lambda: [_choose_by_dumps(o for o, _, _ in sp) for sp in spans], repeat)
+    t_span = _best_of(lambda: [choose_best_graphql_obj(sp) for sp in spans], repeat)
+    print(f"[BENCH] choose: cases={len(cases)} mismatch={mismatch}")
+    print(f"[BENCH] json.dumps : {t_dumps * 1000:9.1f} ms")
+    print(f"[BENCH] chooser    : {t_span * 1000:9.1f} ms")
+    return 2 if mismatch else 0
+
+
+def bench_json(fixtures, repeat: int) -> int:
+    """So sánh các JSON backend: json_loads từng document của response + parse_fb_graphql_payload."""
+    texts = [rec["responseText"] for rec in fixtures]
+    mbs = sum(len(t) for t in texts) / (1024 * 1024)
+    # response batch / stream có nhiều document -> cắt sẵn từng document, loads cả body sẽ lỗi "Extra data"
+    docs = [t[start:end] for t in texts for _, start, end in iter_json_spans(t)]
+    current = json_backend.BACKEND
+    results = {}
+    try:
+        for name in ("json", "orjson"):
+            if json_backend.use_backend(name) != name:
+                print(f"[BENCH] {name:7s}: chưa cài, bỏ qua")
+                continue
+            payloads = [parse_fb_graphql_payload(t) for t in texts]
+            results[name] = payloads
+            t_loads = _best_of(lambda: [json_backend.loads(d) for d in docs], repeat)
+            t_parse = _best_of(lambda: [parse_fb_graphql_payload(t) for t in texts], repeat)
+            print(f"[BENCH] {name:7s}: loads {len(docs)} docs {t_loads * 1000:8.1f} ms ({mbs / t_loads:6.1f} MB/s) | "
+                  f"parse_fb_graphql_payload {t_parse * 1000:8.1f} ms ({mbs / t_parse:6.1f} MB/s)")
+    finally:
+        json_backend.use_backend(current)
+
+    if len(results) == 2 and results["json"] != results["orjson"]:
+        print("[BENCH] MISMATCH: payload khác nhau giữa json và orjson")
+        return 2
+    return 0
+
+
+def _coalesce_count(items) -> int:
+    return len(coalesce_posts(items))
+
+
+def _suite_cases(fixtures):
+    """(tên case, hàm chạy 1 lượt trả về số record, số byte input)."""
+    by_kind = {k: [rec["responseText"] for rec in fixtures if rec["kind"] == k] for k in KINDS}
+    cases = []
+    for kind in POST_KINDS:
+        texts = by_kind[kind]
+        if not texts:
+            continue
+        nbytes = sum(len(t.encode("utf-8")) for t in texts)
+        payloads = [p for p in (parse_fb_graphql_payload(t) for t in texts) if p is not None]
+        items = _run_collect(collect_post_summaries, payloads)
+        cases += [
+            (f"{kind}/parse_fb_graphql_payload",
+             lambda texts=texts: sum(parse_fb_graphql_payload(t) is not None for t in texts), nbytes),
+            (f"{kind}/collect_post_summaries",
+             lambda payloads=payloads: len(_run_collect(collect_post_summaries, payloads)), nbytes),
+            (f"{kind}/coalesce_posts",
+             lambda items=items: _coalesce_count(items), nbytes),
+        ]
+    if by_kind["comment"]:
+        texts = by_kind["comment"]
+        cases.append(("comment/extract_full_posts_from_resptext",
+                      lambda: sum(len(extract_full_posts_from_resptext(t)[0]) for t in texts),
+                      sum(len(t.encode("utf-8")) for t in texts)))
+    if by_kind["reply"]:
+        texts = by_kind["reply"]
+        cases.append(("reply/extract_replies_from_depth_resp",
+                      lambda: sum(len(extract_replies_from_depth_resp(t)[0]) for t in texts),
+                      sum(len(t.encode("utf-8")) for t in texts)))
+    return cases
+
+
+def bench_suite(fixtures, repeat: int, baseline_path: Path, save: bool, max_slowdown: float) -> int:
+    cases = _suite_cases(fixtures)
+    if not cases:
+        print("[BENCH] không có fixture nào dùng được cho suite")
+        return 1
+
+    baseline = {}
+    if baseline_path.exists() and not save:
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8")).get("cases", {})
+
+    results, regressed = {}, []
+    for name, fn, nbytes in cases:
+        n = fn()
+        t = _best_of(fn, repeat)
+        mbs = nbytes / (1024 * 1024) / t if t else 0.0
+        rps = n / t if t else 0.0
+        results[name] = {"seconds": t, "records": n, "bytes": nbytes}
+        line = f"[BENCH] {name:45s} {t * 1000:9.1f} ms {mbs:8.1f} MB/s {rps:10.0f} rec/s"
+        base = baseline.get(name)
+        if base and base.get("seconds"):
+            ratio = t / base["seconds"]
+            line += f"  x{ratio:.2f} vs baseline"
+            if ratio > max_slowdown and t - base["seconds"] > NOISE_FLOOR_S:
+                regressed.append((name, ratio))
+                line += "  <-- REGRESSION"
+        print(line)
+
+    if save:
+        baseline_path.write_text(json.dumps({
+            "json_backend": json_backend.BACKEND,
+            "repeat": repeat,
+            "cases": results,
+        }, indent=2), encoding="utf-8")
+        print(f"[BENCH] đã lưu baseline: {baseline_path}")
+        return 0
+    if not baseline:
+        print(f"[BENCH] chưa có baseline ({baseline_path}), chạy lại với --save-baseline để tạo")
+        return 0
+    if regressed:
+        print(f"[BENCH] {len(regressed)} case chậm hơn baseline quá x{max_slowdown:.2f}: "
+              + ", ".join(f"{n} (x{r:.2f})" for n, r in regressed))
+        return 3
+    return 0
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m post.v3.bench")
+    ap.add_argument("target", choices=["extractors", "decoder", "json", "suite"])
+    ap.add_argument("--fixtures", type=str, required=True, help="Thư mục chứa responseText đã capture")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--mb", type=float, default=4.0, help="Kích thước response batch cho bench decoder")
+    ap.add_argument("--baseline", type=str, default=None,
+                    help=f"File baseline cho suite (mặc định <fixtures>/{BASELINE_NAME})")
+    ap.add_argument("--save-baseline", action="store_true", help="Ghi kết quả suite làm baseline mới")
+    ap.add_argument("--max-slowdown", type=float, default=1.3,
+                    help="Suite fail (exit 3) nếu case nào chậm hơn baseline quá số lần này")
+    args = ap.parse_args(argv)
+
+    fixtures = load_fixtures(Path(args.fixtures))
+    if not fixtures:
+        print(f"[BENCH] không tìm thấy fixture trong {args.fixtures}")
+        return 1
+
+    if args.target == "extractors":
+        return bench_extractors(fixtures, args.repeat)
+    if args.target == "decoder":
+        return bench_decoder(fixtures, args.repeat, args.mb)
+    if args.target == "json":
+        return bench_json(fixtures, args.repeat)
+    if args.target == "suite":
+        baseline = Path(args.baseline) if args.baseline else Path(args.fixtures) / BASELINE_NAME
+        return bench_suite(fixtures, args.repeat, baseline, args.save_baseline, args.max_slowdown)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
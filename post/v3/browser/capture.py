@@ -0,0 +1,367 @@
+# post/v3/browser/capture.py
+"""
+Backend capture response /api/graphql/ cho vòng scroll (chọn bằng --capture):
+
+  js  : hook fetch/XHR trong page (install_early_hook) – body nằm trong window.__gqlReqs
+        tới lần flush, rồi đi qua bridge WebDriver dưới dạng JSON.
+  cdp : đọc event Network.* từ performance log của chromedriver, lấy body bằng
+        Network.getResponseBody. Body không bao giờ nằm trong heap của page và bắt được cả
+        request mà page gọi bằng fetch/XHR gốc (bỏ qua wrapper của hook).
+        Cần tạo driver với performance log (create_chrome_attach(..., perf_log=True)).
+
+  push: như js nhưng hook gọi binding Runtime.addBinding ngay khi response xong; record tới
+        Python qua 1 websocket DevTools riêng trên thread nền. Vòng scroll wait() tới khi có
+        data mới thay vì sleep cố định. Binding mất (websocket đứt) thì hook tự quay về buffer.
+
+Các backend trả về record cùng dạng {kind, url, method, headers, body, responseText} và cùng thống kê
+(số record, MB, thời gian flush, JS heap của page) để so sánh trực tiếp trong log.
+Cả 2 áp cùng allow-list friendly name / doc_id (util.graphql_filters); dropped() trả về số
+request bị bỏ theo friendly name, cộng dồn suốt phiên.
+"""
+import base64
+import json
+import queue
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+from urllib.request import urlopen
+
+from logs.loging_config import logger
+from util.graphql_filters import GraphqlFilter, drop_key, query_key
+from .hooks import DEFAULT_BUFFER_MB, PUSH_BINDING, flush_gql_recs_with_stats, install_early_hook
+
+CAPTURE_BACKENDS = ("js", "cdp", "push")
+HEAP_SAMPLE_EVERY = 10  # flush; lấy mẫu ngay trước flush = lúc buffer trong page đầy nhất
+
+# chromedriver: bật performance log, chỉ lấy domain Network
+PERF_LOGGING_PREFS = {"enableNetwork": True, "enablePage": False}
+
+# giữ body trong buffer của DevTools đủ lâu cho tới lần flush sau
+_NETWORK_BUFFERS = {"maxTotalBufferSize": 200 * 1024 * 1024, "maxResourceBufferSize": 50 * 1024 * 1024}
+
+
+def _is_graphql_post(url: str, method: str) -> bool:
+    return "/api/graphql/" in (url or "") and (method or "").upper() == "POST"
+
+
+def page_heap_used_mb(driver) -> float:
+    try:
+        usage = driver.execute_cdp_cmd("Runtime.getHeapUsage", {})
+        return float(usage.get("usedSize") or 0) / (1024 * 1024)
+    except Exception:
+        return -1.0
+
+
+class _CaptureStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.records = 0
+        self.bytes = 0       # byte responseText thực sự qua bridge
+        self.raw_bytes = 0   # byte gốc trước projection (bằng bytes nếu không projection)
+        self.flushes = 0
+        self.seconds = 0.0
+        self.heap_peak_mb = 0.0
+
+    def add(self, recs: List[Dict[str, Any]], seconds: float) -> None:
+        self.flushes += 1
+        self.seconds += seconds
+        self.records += len(recs)
+        for r in recs:
+            n = len(r.get("responseText") or "")
+            self.bytes += n
+            self.raw_bytes += r.get("rawBytes") or n
+
+    def maybe_sample_heap(self, driver) -> None:
+        if self.flushes % HEAP_SAMPLE_EVERY == 0:
+            self.sample_heap(driver)
+
+    def sample_heap(self, driver) -> float:
+        mb = page_heap_used_mb(driver)
+        self.heap_peak_mb = max(self.heap_peak_mb, mb)
+        return mb
+
+    def summary(self, driver) -> str:
+        heap = self.sample_heap(driver)
+        mb = self.bytes / (1024 * 1024)
+        rate = (mb / self.seconds) if self.seconds else 0.0
+        kept = (100.0 * self.bytes / self.raw_bytes) if self.raw_bytes else 100.0
+        return (f"backend={self.name} records={self.records} body={mb:.1f} MB "
+                f"(raw {self.raw_bytes / (1024 * 1024):.1f} MB, bridge {kept:.0f}%) flushes={self.flushes} "
+                f"flush_time={self.seconds:.2f}s ({rate:.1f} MB/s) page_heap={heap:.1f} MB "
+                f"(peak {self.heap_peak_mb:.1f} MB)")
+
+
+class JsHookCapture:
+    """Backend cũ: đọc window.__gqlReqs do install_early_hook đổ vào."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.stats = _CaptureStats("js")
+        self._dropped = Counter()
+        self.overflow = 0
+        self.overflow_bytes = 0
+        self.buffer_peak_bytes = 0
+
+    def flush(self) -> List[Dict[str, Any]]:
+        self.stats.maybe_sample_heap(self.driver)
+        t0 = time.perf_counter()
+        recs, info = flush_gql_recs_with_stats(self.driver)
+        self.stats.add(recs, time.perf_counter() - t0)
+        self._dropped.update(info.get("dropped") or {})
+        self.buffer_peak_bytes = max(self.buffer_peak_bytes, int(info.get("bufferBytes") or 0))
+        lost = int(info.get("overflow") or 0)
+        if lost:
+            lost_bytes = int(info.get("overflowBytes") or 0)
+            self.overflow += lost
+            self.overflow_bytes += lost_bytes
+            ts = info.get("oldestDroppedTs")
+            logger.warning(
+                "[GQL] buffer overflow: mất %d record (%.1f MB) từ lần flush trước, cũ nhất lúc %s "
+                "-> flush thường hơn hoặc tăng --buffer-mb",
+                lost, lost_bytes / (1024 * 1024),
+                time.strftime("%H:%M:%S", time.localtime(ts / 1000)) if ts else "?",
+            )
+        return recs
+
+    def dropped(self) -> Counter:
+        return self._dropped
+
+    def summary(self) -> str:
+        return (f"{self.stats.summary(self.driver)} dropped={sum(self._dropped.values())} "
+                f"overflow={self.overflow} ({self.overflow_bytes / (1024 * 1024):.1f} MB) "
+                f"buffer_peak={self.buffer_peak_bytes / (1024 * 1024):.1f} MB")
+
+    def close(self) -> None:
+        pass
+
+
+class CdpCapture:
+    """
+    Backend CDP: requestWillBeSent (lấy url/method/headers/postData) -> loadingFinished ->
+    Network.getResponseBody. Request chưa xong thì để lại cho lần flush sau.
+    """
+
+    def __init__(self, driver, allow: Optional[dict] = None):
+        self.driver = driver
+        self.stats = _CaptureStats("cdp")
+        self.filter = GraphqlFilter(allow)
+        self._dropped = Counter()
+        self.failed = 0
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        driver.execute_cdp_cmd("Network.enable", dict(_NETWORK_BUFFERS))
+        self.driver.get_log("performance")  # bỏ event cũ trước khi bắt đầu
+
+    def _post_data(self, request_id: str, request: Dict[str, Any]) -> str:
+        body = request.get("postData")
+        if body is None and request.get("hasPostData"):
+            try:
+                body = self.driver.execute_cdp_cmd("Network.getRequestPostData", {"requestId": request_id}).get("postData")
+            except Exception:
+                body = None
+        return body or ""
+
+    def _response_body(self, request_id: str):
+        try:
+            res = self.driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+        except Exception as e:
+            self.failed += 1
+            logger.debug("[CDP] getResponseBody %s failed: %s", request_id, e)
+            return None
+        body = res.get("body")
+        if res.get("base64Encoded") and body:
+            body = base64.b64decode(body).decode("utf-8", "replace")
+        return body
+
+    def flush(self) -> List[Dict[str, Any]]:
+        self.stats.maybe_sample_heap(self.driver)
+        t0 = time.perf_counter()
+        try:
+            entries = self.driver.get_log("performance")
+        except Exception as e:
+            logger.warning("[CDP] get_log(performance) error: %s", e)
+            return []
+
+        recs: List[Dict[str, Any]] = []
+        for entry in entries:
+            try:
+                msg = json.loads(entry["message"])["message"]
+            except (KeyError, TypeError, ValueError):
+                continue
+            method = msg.get("method")
+            params = msg.get("params") or {}
+            rid = params.get("requestId")
+            if method == "Network.requestWillBeSent":
+                req = params.get("request") or {}
+                if _is_graphql_post(req.get("url"), req.get("method")):
+                    body = self._post_data(rid, req)
+                    if not self.filter.keep(body):
+                        self._dropped[drop_key(*query_key(body))] += 1
+                        continue
+                    self._pending[rid] = {
+                        "kind": "cdp",
+                        "url": req.get("url"),
+                        "method": req.get("method"),
+                        "headers": req.get("headers") or {},
+                        "body": body,
+                    }
+            elif method == "Network.loadingFinished" and rid in self._pending:
+                rec = self._pending.pop(rid)
+                rec["responseText"] = self._response_body(rid)
+                recs.append(rec)
+            elif method == "Network.loadingFailed" and rid in self._pending:
+                self._pending.pop(rid, None)
+                self.failed += 1
+
+        self.stats.add(recs, time.perf_counter() - t0)
+        return recs
+
+    def dropped(self) -> Counter:
+        return self._dropped
+
+    def summary(self) -> str:
+        return (f"{self.stats.summary(self.driver)} pending={len(self._pending)} failed={self.failed} "
+                f"dropped={sum(self._dropped.values())}")
+
+    def close(self) -> None:
+        pass
+
+
+class PushCapture:
+    """
+    Backend push: websocket DevTools thứ 2 gắn vào đúng tab của driver, Runtime.addBinding
+    PUSH_BINDING, thread nền nhận Runtime.bindingCalled và xếp record vào hàng đợi.
+    flush() = lấy hết hàng đợi + flush buffer JS (record đến trước khi có binding).
+    """
+
+    def __init__(self, driver, connect_timeout: float = 10.0):
+        import websocket  # websocket-client (đi kèm selenium)
+
+        self.driver = driver
+        self.js = JsHookCapture(driver)
+        self.stats = _CaptureStats("push")
+        self.pushed = 0
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        self._event = threading.Event()
+        self._closed = False
+        self._unbound = False
+        self._msg_id = 0
+
+        self._ws = websocket.create_connection(
+            self._target_ws_url(), timeout=connect_timeout, suppress_origin=True
+        )
+        self._ws.settimeout(None)
+        self._send("Runtime.enable")
+        self._send("Runtime.addBinding", {"name": PUSH_BINDING})
+        self._thread = threading.Thread(target=self._listen, name="gql-push", daemon=True)
+        self._thread.start()
+        logger.info("[PUSH] Listening for %s on %s", PUSH_BINDING, self._ws.url)
+
+    def _target_ws_url(self) -> str:
+        addr = (self.driver.capabilities.get("goog:chromeOptions") or {}).get("debuggerAddress")
+        if not addr:
+            raise RuntimeError("driver không có debuggerAddress")
+        with urlopen(f"http://{addr}/json/list", timeout=5) as r:
+            targets = json.loads(r.read().decode("utf-8"))
+        pages = [t for t in targets if t.get("type") == "page" and t.get("webSocketDebuggerUrl")]
+        handle = self.driver.current_window_handle  # chromedriver: window handle = target id
+        for t in pages:
+            if t.get("id") == handle:
+                return t["webSocketDebuggerUrl"]
+        url = self.driver.current_url
+        for t in pages:
+            if t.get("url") == url:
+                return t["webSocketDebuggerUrl"]
+        raise RuntimeError("không tìm thấy DevTools target của tab hiện tại")
+
+    def _send(self, method: str, params: Optional[dict] = None) -> None:
+        self._msg_id += 1
+        self._ws.send(json.dumps({"id": self._msg_id, "method": method, "params": params or {}}))
+
+    def _listen(self) -> None:
+        while not self._closed:
+            try:
+                msg = json.loads(self._ws.recv())
+            except Exception as e:
+                if not self._closed:
+                    logger.warning("[PUSH] websocket closed (%s), hook quay về buffer JS", e)
+                break
+            if msg.get("method") != "Runtime.bindingCalled":
+                continue
+            params = msg.get("params") or {}
+            if params.get("name") != PUSH_BINDING:
+                continue
+            try:
+                rec = json.loads(params.get("payload") or "")
+            except ValueError:
+                continue
+            if isinstance(rec, dict):
+                self._queue.put(rec)
+                self._event.set()
+
+    def wait(self, timeout: float) -> bool:
+        """Chờ tới khi có record mới (True) hoặc hết timeout (False)."""
+        got = self._event.wait(timeout)
+        self._event.clear()
+        return got
+
+    def flush(self) -> List[Dict[str, Any]]:
+        t0 = time.perf_counter()
+        recs: List[Dict[str, Any]] = []
+        while True:
+            try:
+                recs.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if not self._thread.is_alive():
+            self._unbind()
+        self.pushed += len(recs)
+        self.stats.add(recs, time.perf_counter() - t0)
+        return self.js.flush() + recs
+
+    def dropped(self) -> Counter:
+        return self.js.dropped()
+
+    def summary(self) -> str:
+        return f"{self.stats.summary(self.driver)} pushed={self.pushed} | fallback {self.js.summary()}"
+
+    def _unbind(self) -> None:
+        # binding còn trong page nhưng không ai nghe -> xoá để hook ghi lại vào buffer JS
+        if self._unbound:
+            return
+        self._unbound = True
+        try:
+            self.driver.execute_script(f"delete window.{PUSH_BINDING};")
+        except Exception:
+            pass
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._unbind()
+        try:
+            self._ws.close()
+        except Exception:
+            pass
+
+
+def make_capture(driver, backend: str = "js", keep_last: int = 350, allow: Optional[dict] = None,
+                 project: bool = False, max_buffer_mb: float = DEFAULT_BUFFER_MB):
+    """allow chỉ dùng cho cdp / khi phải cài lại hook; backend js lọc theo allow lúc install_early_hook."""
+    backend = (backend or "js").lower()
+    if backend == "push":
+        try:
+            return PushCapture(driver)
+        except Exception as e:
+            logger.warning("[PUSH] Không mở được kênh push (%s), dùng poll buffer JS.", e)
+        return JsHookCapture(driver)
+    if backend == "cdp":
+        try:
+            return CdpCapture(driver, allow)
+        except Exception as e:
+            # driver không bật performance log / CDP lỗi -> quay về hook JS
+            logger.warning("[CDP] Không dùng được capture cdp (%s), chuyển sang hook JS.", e)
+            install_early_hook(driver, keep_last=keep_last, allow=allow, project=project,
+                               max_buffer_mb=max_buffer_mb)
+    return JsHookCapture(driver)
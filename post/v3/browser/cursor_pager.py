@@ -0,0 +1,203 @@
+# post/v3/browser/cursor_pager.py
+"""
+Chế độ hybrid: scroll tới khi bắt được request phân trang của feed, rồi tự gọi lại query đó
+với end_cursor kế tiếp ngay trong page (fetch cùng cookie), không render gì.
+
+    scroll ... --(hook bắt GroupsCometFeedRegularStoriesPaginationQuery + có cursor)-->
+    fetch(cursor) -> stage.submit -> fetch(next cursor) -> ... --(template hỏng)--> scroll tiếp
+
+- page_info (has_next_page / end_cursor) đọc ngay trong JS của page nên trang sau gọi được luôn,
+  không phải chờ process pool parse xong.
+- Template coi là hỏng (stale) khi: HTTP lỗi / fetch lỗi, response không có page_info của feed,
+  cursor không đổi, hoặc liên tiếp max_idle_pages trang không ra post mới. Khi đó bỏ template,
+  vòng scroll bắt template mới rồi chuyển lại.
+- Quay lại cursor mode thì đi tiếp từ cursor cuối đã gọi được (DOM còn ở phía sau, scroll chỉ
+  để lấy template mới); lần resume đó hỏng ngay trang đầu thì lần sau lấy cursor của stage.
+- has_next_page=false -> hết feed.
+- fetch của pager đi bằng fetch gốc (window.__gqlOrigFetch) nên hook không capture lại trang đã
+  submit. Capture cdp vẫn thấy request đó, nhưng bản sao trùng variables + responseText nên
+  ResponseCache bỏ qua.
+- Post mới của 1 trang được đếm trễ 1 trang (writer ghi song song với fetch trang sau); trước khi
+  bỏ template vì idle thì join stage để đếm nốt.
+"""
+import json
+import time
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from logs.loging_config import logger
+from ..config import CURSOR_KEYS
+from ..graphql.schemas import feed_connection_path, request_query_key
+from ..parse_stage import ParseStage
+
+CURSOR_FETCH_JS = r"""
+const done = arguments[arguments.length - 1];
+(async () => {
+  const form = arguments[0], headers = arguments[1], conn = arguments[2], timeout = arguments[3];
+  const ctrl = new AbortController();
+  const to = setTimeout(() => ctrl.abort(), timeout);
+  try {
+    if (!location.host.includes('facebook.com')) return done({ok: false, error: 'bad_origin'});
+    // fetch gốc: gọi qua hook thì trang này bị capture lại, vòng scroll sau submit lần nữa
+    const res = await (window.__gqlOrigFetch || window.fetch).call(window, '/api/graphql/', {
+      method: 'POST', credentials: 'include', signal: ctrl.signal,
+      headers: Object.assign({'Content-Type': 'application/x-www-form-urlencoded'}, headers),
+      body: new URLSearchParams(form).toString(),
+    });
+    const text = await res.text();
+    let pi = null;
+    for (const line of text.split('\n')){
+      let o; try { o = JSON.parse(line.replace(/^for \(;;\);/, '')); } catch(e){ continue; }
+      let cur = o;
+      for (const k of conn) cur = (cur && typeof cur === 'object') ? cur[k] : null;
+      let p = cur && cur.page_info;
+      if (!p && Array.isArray(o.path) && o.path.includes(conn[conn.length - 1]) && o.data) p = o.data.page_info;
+      if (p) pi = p;
+    }
+    done({ok: res.ok, status: res.status, text: text,
+          hasNext: pi ? (pi.has_next_page ?? pi.hasNextPage ?? null) : null,
+          cursor: pi ? (pi.end_cursor || pi.endCursor || null) : null, pageInfo: !!pi});
+  } catch (e) {
+    done({ok: false, error: String(e && e.message || e)});
+  } finally { clearTimeout(to); }
+})();
+"""
+
+# header request gốc cần gửi kèm (lsd / friendly name); còn lại để browser tự đặt
+_HEADER_KEYS = ("x-fb-lsd", "x-fb-friendly-name", "x-asbd-id")
+
+
+def _with_cursor(form: Dict[str, str], cursor: str) -> Dict[str, str]:
+    out = dict(form)
+    try:
+        v = json.loads(out.get("variables") or "{}")
+    except ValueError:
+        v = {}
+    keys = [k for k in v if k in CURSOR_KEYS] or ["cursor"]
+    for k in keys:
+        v[k] = cursor
+    out["variables"] = json.dumps(v, separators=(",", ":"))
+    return out
+
+
+class CursorPager:
+    def __init__(self, driver, stage: ParseStage, delay: float = 0.5, max_idle_pages: int = 5,
+                 timeout_ms: int = 20000):
+        self.driver = driver
+        self.stage = stage
+        self.delay = delay
+        self.max_idle_pages = max_idle_pages
+        self.timeout_ms = timeout_ms
+        self.template: Optional[Dict[str, str]] = None
+        self.headers: Dict[str, str] = {}
+        self.conn: Optional[Tuple[str, ...]] = None
+        self.name: Optional[str] = None
+        self.cursor: Optional[str] = None  # cursor kế tiếp của lần cursor mode trước
+        self.pages = 0
+        self.posts = 0
+        self.stale = 0
+        self.seconds = 0.0
+
+    def observe(self, rec: Dict[str, Any]) -> None:
+        """Giữ request phân trang feed mới nhất (có biến cursor) làm template."""
+        friendly, doc_id = request_query_key(rec)
+        conn = feed_connection_path(friendly, doc_id)
+        if not conn:
+            return
+        form = dict(parse_qsl(rec.get("body") or "", keep_blank_values=True))
+        try:
+            variables = json.loads(form.get("variables") or "{}")
+        except ValueError:
+            return
+        if not isinstance(variables, dict) or not any(k in variables for k in CURSOR_KEYS):
+            return  # query load đầu (không có cursor) -> không dùng làm template được
+        if self.template is None:
+            logger.info("[CURSOR] Template: %s (doc_id=%s)", friendly, doc_id)
+        self.template, self.conn, self.name = form, conn, friendly or doc_id
+        hdrs = rec.get("headers") or {}
+        self.headers = {k: v for k, v in hdrs.items() if isinstance(k, str) and k.lower() in _HEADER_KEYS}
+
+    def ready(self) -> bool:
+        return self.template is not None and bool(self.cursor or self.stage.feed_cursor)
+
+    def _fetch(self, form: Dict[str, str]) -> Dict[str, Any]:
+        self.driver.set_script_timeout(int(self.timeout_ms / 1000) + 10)
+        res = self.driver.execute_async_script(CURSOR_FETCH_JS, form, self.headers, list(self.conn), self.timeout_ms)
+        return res if isinstance(res, dict) else {"ok": False, "error": "bad_return"}
+
+    def _drop_template(self, why: str, good_pages: int) -> str:
+        self.stale += 1
+        logger.warning("[CURSOR] Template %s stale (%s) -> quay lại scroll.", self.name, why)
+        self.template = None
+        if good_pages <= 0:
+            self.cursor = None  # hỏng ngay từ cursor đầu -> lần sau lấy cursor mới của stage
+        return "stale"
+
+    def run(self, should_stop, max_pages: int) -> Tuple[str, int]:
+        """
+        Gọi liên tiếp các trang sau. Trả về (lý do dừng, số trang đã gọi):
+          "end" (has_next_page=false), "stale", "stop" (cờ dừng), "limit" (hết max_pages).
+        """
+        if self.cursor is None:
+            self.stage.join()  # feed_cursor phải là cursor của response mới nhất đã capture
+            if self.stage.feed_has_next is False:
+                return "end", 0
+        cursor = self.cursor or self.stage.feed_cursor
+        logger.info("[CURSOR] Chuyển sang gọi thẳng %s từ cursor %s...", self.name, (cursor or "")[:24])
+        pages, idle = 0, 0
+        mark = self.stage.written
+        t0 = time.monotonic()
+        try:
+            while True:
+                self.cursor = cursor
+                if should_stop():
+                    return "stop", pages
+                if pages >= max_pages:
+                    return "limit", pages
+                form = _with_cursor(self.template, cursor)
+                try:
+                    res = self._fetch(form)
+                except Exception as e:
+                    return self._drop_template(f"fetch error: {e}", pages), pages
+                if not res.get("ok"):
+                    why = f"HTTP {res.get('status')} {res.get('error') or ''}".strip()
+                    return self._drop_template(why, pages), pages
+                pages += 1
+                self.pages += 1
+
+                self.stage.submit({"kind": "cursor", "url": "/api/graphql/", "method": "POST",
+                                   "headers": self.headers, "body": urlencode(form),
+                                   "responseText": res.get("text") or "", "ts": int(time.time() * 1000)},
+                                  log_prefix=f"@{self.pages}")
+                # submit() chỉ xếp hàng khi parse ở process pool -> đếm post đã ghi xong tới lúc này
+                new, mark = self.stage.written - mark, self.stage.written
+                self.posts += new
+                idle = 0 if new else idle + 1
+
+                if not res.get("pageInfo"):
+                    return self._drop_template("no page_info", pages - 1), pages
+                if res.get("hasNext") is False:
+                    logger.info("[CURSOR] has_next_page=false sau %d trang.", pages)
+                    return "end", pages
+                nxt = res.get("cursor")
+                if not nxt or nxt == cursor:
+                    return self._drop_template("cursor không đổi", pages - 1), pages
+                cursor = nxt
+                if idle >= self.max_idle_pages:
+                    self.stage.join()  # trang cuối có thể chưa ghi xong
+                    new, mark = self.stage.written - mark, self.stage.written
+                    self.posts += new
+                    if new:
+                        idle = 0
+                    else:
+                        self.cursor = cursor
+                        return self._drop_template(f"{idle} trang liền không có post mới", pages), pages
+                time.sleep(self.delay)
+        finally:
+            self.posts += self.stage.written - mark
+            self.seconds += time.monotonic() - t0
+
+    def summary(self) -> str:
+        ppm = self.posts / (self.seconds / 60) if self.seconds else 0.0
+        return (f"pages={self.pages} posts~{self.posts} ({ppm:.1f} posts/min in cursor mode) "
+                f"stale={self.stale} template={self.name or '-'}")
@@ -6,6 +6,8 @@ from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
 from selenium.common.exceptions import SessionNotCreatedException
 
+from .capture import PERF_LOGGING_PREFS
+
 # Tắt bớt log rác
 logging.getLogger("WDM").setLevel(logging.WARNING)
 
@@ -17,13 +19,17 @@ def _get_driver_path(version: str):
         print(f"Không tải được driver bản {version}: {e}")
         return None
 
-def create_chrome_attach(debug_port: int) -> webdriver.Chrome:
+def create_chrome_attach(debug_port: int, perf_log: bool = False) -> webdriver.Chrome:
     """
     Attach Selenium vào Chrome MoreLogin.
     Tự động thử Driver v142 trước, nếu lỗi version thì fallback về v140.
+    perf_log=True: bật performance log (event Network.*) cho capture backend "cdp".
     """
     chrome_opts = Options()
     chrome_opts.add_experimental_option("debuggerAddress", f"127.0.0.1:{debug_port}")
+    if perf_log:
+        chrome_opts.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+        chrome_opts.add_experimental_option("perfLoggingPrefs", PERF_LOGGING_PREFS)
 
     # --- CHIẾN THUẬT: THỬ SAI (TRY-EXCEPT) ---
     
@@ -1,6 +1,8 @@
 # post/v3/browser/hooks.py
 import time
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
+
+from util.graphql_filters import hook_filter_js
 
 CLEANUP_JS = r"""
 (function(keep) {
@@ -34,46 +36,181 @@ CLEANUP_JS = r"""
 """
 
 
-def install_early_hook(driver, keep_last: int = 350):
+# Projection trong page: chỉ giữ story / comment node (nguyên cây con) + page_info, cùng các
+# field scalar của node tổ tiên (giữ nguyên path data.node.group_feed.edges[].node...).
+# Chọn document chính theo cùng thứ tự ưu tiên với choose_best_graphql_obj (có "data" và không
+# phải chunk $defer/$stream, rồi tới có "data", dòng dài nhất). Document chính ra không có
+# path / label nên sau khi cắt, dù ngắn hơn chunk, parse_fb_graphql_payload vẫn chọn đúng nó.
+# Gặp gì bất thường thì trả null = giữ text gốc.
+# Lưu ý: JSON.parse làm tròn số nguyên > 2^53 (id của FB là string nên extractor không bị ảnh hưởng).
+PROJECT_JS = r"""
+      function __gqlKeepWhole(o){
+        return o.__typename === 'Story' || o.__isFeedUnit === 'Story' || o.__typename === 'Comment'
+            || ('post_id' in o) || ('comet_sections' in o);
+      }
+      function __gqlPrune(o){
+        if (Array.isArray(o)){
+          const out = [];
+          for (const v of o){ const p = __gqlPrune(v); if (p !== undefined) out.push(p); }
+          return out.length ? out : undefined;
+        }
+        if (!o || typeof o !== 'object') return undefined;
+        if (__gqlKeepWhole(o)) return o;
+        let out = null, scalars = {};
+        for (const k in o){
+          const v = o[k];
+          if (k === 'page_info' || k === 'pageInfo'){ (out = out || {})[k] = v; continue; }
+          if (v && typeof v === 'object'){
+            const p = __gqlPrune(v);
+            if (p !== undefined) (out = out || {})[k] = p;
+          } else {
+            scalars[k] = v;
+          }
+        }
+        return out ? Object.assign(scalars, out) : undefined;
+      }
+      function __gqlProject(text){
+        try{
+          if (typeof text !== 'string' || !text) return null;
+          const body = text.replace(/^\s*(?:(?:for\s*\(\s*;\s*;\s*\)\s*;|\)\]\}')\s*)*/, '');
+          let best = null, bestLen = -1, bestRank = -1;
+          const docs = [];
+          for (const line of body.split('\n')){
+            const t = line.trim();
+            if (!t) continue;
+            const doc = JSON.parse(t);
+            docs.push(doc);
+            const hasData = !!(doc && typeof doc === 'object' && !Array.isArray(doc) && ('data' in doc));
+            // 2 = có data, không phải chunk; 1 = chunk $defer/$stream; 0 = không có data
+            const rank = hasData ? (('path' in doc || 'label' in doc) ? 1 : 2) : 0;
+            if (rank > bestRank || (rank === bestRank && t.length > bestLen)){
+              best = doc; bestLen = t.length; bestRank = rank;
+            }
+          }
+          if (best === null || typeof best !== 'object') return null;
+          // chunk $defer / $stream (page_info, edge stream tới sau) giữ lại kèm path/label để
+          // feed_page_info khớp được connection; chunk không còn gì sau khi cắt thì bỏ
+          const out = [];
+          for (const doc of docs){
+            if (doc === best){
+              const pruned = __gqlPrune(best);
+              out.push(JSON.stringify(pruned !== undefined ? pruned : (Array.isArray(best) ? [] : {})));
+              continue;
+            }
+            if (!doc || typeof doc !== 'object' || Array.isArray(doc)) continue;
+            const p = __gqlPrune(doc);
+            if (p === undefined) continue;
+            if (Array.isArray(doc.path)) p.path = doc.path;
+            if (typeof doc.label === 'string') p.label = doc.label;
+            out.push(JSON.stringify(p));
+          }
+          return out.join('\n');
+        }catch(e){ return null; }
+      }
+"""
+
+
+DEFAULT_BUFFER_MB = 64
+PUSH_BINDING = "__gqlPush"  # Runtime.addBinding; có binding thì hook đẩy record thẳng về Python
+
+
+def install_early_hook(
+    driver,
+    keep_last: int = 350,
+    allow: Optional[dict] = None,
+    project: bool = False,
+    max_buffer_mb: float = DEFAULT_BUFFER_MB,
+):
+    """
+    window.__gqlReqs là ring buffer giới hạn cả số record (keep_last) lẫn tổng độ dài
+    responseText (max_buffer_mb). Vượt thì bỏ record cũ nhất và ghi vào window.__gqlBuf:
+    overflow (số record), overflowBytes, oldestDroppedTs (ts capture của record cũ nhất bị bỏ).
+    flush_gql_recs_with_stats trả về và reset các số này mỗi lần flush.
+    Nếu page có binding PUSH_BINDING (capture push) thì record được đẩy thẳng qua CDP, không vào buffer.
+    window.__gqlNet = {inflight, lastDone, lastMs}: số request /api/graphql/ đang chờ (kể cả request
+    bị allow-list bỏ), lúc request cuối xong và latency của nó -> browser.pacing dùng để canh scroll.
+
+    allow: allow-list friendly name / doc_id (util.graphql_filters.resolve_allow). Request ngoài
+    list bị bỏ ngay trong page (không clone body) và được đếm ở window.__gqlDropped.
+    project: cắt responseText trong page trước khi vào buffer (PROJECT_JS): document chính + các
+    chunk $defer/$stream còn story / page_info; record có thêm rawBytes = độ dài text gốc. Tắt khi
+    cần lưu raw đầy đủ (archive).
+    Gọi lại trên cùng driver (browser.pool reset tab) thì script cũ được gỡ, không cài chồng.
+    """
     hook_src = r"""
     (function(){
       if (window.__gqlHooked) return;
       window.__gqlHooked = true;
       window.__gqlReqs = [];
+      window.__gqlBuf = {bytes: 0, overflow: 0, overflowBytes: 0, oldestDroppedTs: null};
+      window.__gqlNet = {inflight: 0, lastDone: 0, lastMs: 0};
+      function netStart(){ window.__gqlNet.inflight += 1; return Date.now(); }
+      function netDone(t0){
+        const n = window.__gqlNet, now = Date.now();
+        n.inflight = Math.max(0, n.inflight - 1); n.lastDone = now; n.lastMs = now - t0;
+      }
+      __FILTER_JS__
       function headersToObj(h){try{
         if (!h) return {};
         if (h instanceof Headers){const o={}; h.forEach((v,k)=>o[k]=v); return o;}
         if (Array.isArray(h)){const o={}; for (const [k,v] of h) o[k]=v; return o;}
         return (typeof h==='object')?h:{};}catch(e){return {}}
       }
+      __PROJECT_JS__
       function pushRec(rec){try{
-        const q = window.__gqlReqs; q.push(rec);
-        if (q.length > __KEEP_LAST__) q.splice(0, q.length - __KEEP_LAST__);
+        if (__PROJECT__ && typeof rec.responseText === 'string'){
+          rec.rawBytes = rec.responseText.length;
+          const p = __gqlProject(rec.responseText);
+          if (p !== null) rec.responseText = p;
+        }
+        rec.ts = Date.now();
+        rec.size = (typeof rec.responseText === 'string') ? rec.responseText.length : 0;
+        if (typeof window.__PUSH_BINDING__ === 'function'){
+          try{ window.__PUSH_BINDING__(JSON.stringify(rec)); return; }catch(e){}
+        }
+        const q = window.__gqlReqs, buf = window.__gqlBuf;
+        q.push(rec); buf.bytes += rec.size;
+        while (q.length > 1 && (q.length > __KEEP_LAST__ || buf.bytes > __MAX_BYTES__)){
+          const old = q.shift();
+          buf.bytes -= old.size; buf.overflow += 1; buf.overflowBytes += old.size;
+          if (buf.oldestDroppedTs === null || old.ts < buf.oldestDroppedTs) buf.oldestDroppedTs = old.ts;
+        }
       }catch(e){}}
       const origFetch = window.fetch;
+      window.__gqlOrigFetch = origFetch;  // fetch không qua hook (cursor_pager tự submit response của nó)
       window.fetch = async function(input, init){
         const url = (typeof input==='string') ? input : (input&&input.url)||'';
         const method = (init&&init.method)||'GET';
         const body = (init && typeof init.body==='string') ? init.body : '';
         const hdrs = headersToObj(init && init.headers);
         let rec = null;
-        if (url.includes('/api/graphql/') && method==='POST'){
+        const isGql = url.includes('/api/graphql/') && method==='POST';
+        if (isGql && __gqlKeep(body)){
           rec = {kind:'fetch', url, method, headers:hdrs, body:String(body)};
         }
-        const res = await origFetch(input, init);
-        if (rec){
-          try{ rec.responseText = await res.clone().text(); }catch(e){ rec.responseText = null; }
-          pushRec(rec);
+        const t0 = isGql ? netStart() : 0;
+        try{
+          const res = await origFetch(input, init);
+          if (rec){
+            try{ rec.responseText = await res.clone().text(); }catch(e){ rec.responseText = null; }
+            pushRec(rec);
+          }
+          return res;
+        } finally {
+          if (isGql) netDone(t0);
         }
-        return res;
       };
       const XO = XMLHttpRequest.prototype.open, XS = XMLHttpRequest.prototype.send;
       XMLHttpRequest.prototype.open = function(m,u,a){ this.__m=m; this.__u=u; return XO.apply(this, arguments); };
       XMLHttpRequest.prototype.send = function(b){
         this.__b = (typeof b==='string')?b:'';
+        if ((this.__u||'').includes('/api/graphql/') && (this.__m||'')==='POST'){
+          const t0 = netStart();
+          this.addEventListener('loadend', ()=>netDone(t0));
+        }
         this.addEventListener('load', ()=>{
           try{
-            if ((this.__u||'').includes('/api/graphql/') && (this.__m||'')==='POST'){
+            if ((this.__u||'').includes('/api/graphql/') && (this.__m||'')==='POST' && __gqlKeep(this.__b)){
               pushRec({kind:'xhr', url:this.__u, method:this.__m, headers:{}, body:String(this.__b),
                        responseText:(typeof this.responseText==='string'?this.responseText:null)});
             }
@@ -82,9 +219,19 @@ def install_early_hook(driver, keep_last: int = 350):
         return XS.apply(this, arguments);
       };
     })();
-    """.replace("__KEEP_LAST__", str(keep_last))
+    """.replace("__KEEP_LAST__", str(keep_last)).replace("__FILTER_JS__", hook_filter_js(allow)).replace(
+        "__MAX_BYTES__", str(int(max_buffer_mb * 1024 * 1024))).replace("__PUSH_BINDING__", PUSH_BINDING)
+    hook_src = hook_src.replace("__PROJECT_JS__", PROJECT_JS if project else "").replace(
+        "__PROJECT__", "true" if project else "false")
 
-    driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": hook_src})
+    old_id = getattr(driver, "_gql_hook_id", None)
+    if old_id:
+        try:
+            driver.execute_cdp_cmd("Page.removeScriptToEvaluateOnNewDocument", {"identifier": old_id})
+        except Exception:
+            pass
+    res = driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": hook_src})
+    driver._gql_hook_id = (res or {}).get("identifier")
     driver.execute_script(hook_src)
 
 
@@ -94,6 +241,7 @@ def flush_gql_recs(driver) -> List[Dict[str, Any]]:
             """
             const q = window.__gqlReqs || [];
             window.__gqlReqs = [];
+            if (window.__gqlBuf) window.__gqlBuf.bytes = 0;
             return q;
             """
         )
@@ -102,3 +250,35 @@ def flush_gql_recs(driver) -> List[Dict[str, Any]]:
         return recs
     except Exception:
         return []
+
+def flush_gql_recs_with_stats(driver) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Như flush_gql_recs nhưng lấy (và reset) luôn thống kê của hook từ lần flush trước:
+      dropped         : {friendly name: số request bị allow-list bỏ}
+      overflow        : số record bị ring buffer đẩy ra trước khi kịp flush
+      overflowBytes   : tổng độ dài responseText của các record đó
+      oldestDroppedTs : ts (ms) capture của record cũ nhất bị đẩy ra, None nếu không mất gì
+      bufferBytes     : độ dài responseText đang nằm trong buffer lúc flush
+    """
+    try:
+        res = driver.execute_script(
+            """
+            const q = window.__gqlReqs || [];
+            const dropped = window.__gqlDropped || {};
+            const buf = window.__gqlBuf || {};
+            window.__gqlReqs = [];
+            window.__gqlDropped = {};
+            window.__gqlBuf = {bytes: 0, overflow: 0, overflowBytes: 0, oldestDroppedTs: null};
+            return {recs: q, dropped: dropped, overflow: buf.overflow || 0,
+                    overflowBytes: buf.overflowBytes || 0, oldestDroppedTs: buf.oldestDroppedTs || null,
+                    bufferBytes: buf.bytes || 0};
+            """
+        )
+    except Exception:
+        return [], {}
+    if not isinstance(res, dict):
+        return [], {}
+    recs = res.pop("recs", None)
+    if not isinstance(res.get("dropped"), dict):
+        res["dropped"] = {}
+    return (recs if isinstance(recs, list) else []), res
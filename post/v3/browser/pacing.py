@@ -0,0 +1,128 @@
+# post/v3/browser/pacing.py
+"""
+Canh nhịp scroll theo hoạt động mạng thay vì sleep cố định.
+
+Sau mỗi scrollBy, ScrollPacer chờ tới khi không còn request /api/graphql/ nào đang chạy và đã
+yên được quiet_ms (đọc window.__gqlNet do hook đếm), tối đa max_wait giây. Rồi chỉnh kiểu AIMD:
+  - settle nhanh + có post mới -> tăng dần (cộng) quãng scroll, giảm dần delay
+  - hết max_wait mà request chưa xong / latency vượt slow_ms -> giảm nửa quãng scroll, gấp đôi delay
+Không có hook (capture cdp) thì window.__gqlNet không có -> không có tín hiệu để backoff nên chạy
+như fixed, không chỉnh quãng / delay.
+
+Mode "fixed": sleep 1s sau scroll + 1s cuối vòng, quãng 0.9 màn hình (hành vi cũ).
+"""
+import time
+from typing import Optional
+
+from logs.loging_config import logger
+
+PACING_MODES = ("adaptive", "fixed")
+
+_NET_JS = "const n = window.__gqlNet; return n ? [n.inflight, Date.now() - n.lastDone, n.lastMs] : null;"
+
+
+class ScrollPacer:
+    def __init__(
+        self,
+        mode: str = "adaptive",
+        quiet_ms: int = 300,
+        max_wait: float = 4.0,
+        slow_ms: int = 2500,
+        min_delay: float = 0.3,
+        max_delay: float = 4.0,
+        min_step: float = 0.6,
+        max_step: float = 3.0,
+        log_every: int = 20,
+    ):
+        self.mode = mode if mode in PACING_MODES else "adaptive"
+        self.quiet_ms = quiet_ms
+        self.max_wait = max_wait
+        self.slow_ms = slow_ms
+        self.min_delay, self.max_delay = min_delay, max_delay
+        self.min_step, self.max_step = min_step, max_step
+        self.log_every = log_every
+
+        self.step = 0.9  # phần màn hình mỗi lần scroll
+        self.delay = 1.0
+        self.scrolls = 0
+        self.posts = 0
+        self.backoffs = 0
+        self.timeouts = 0
+        self._slow = False
+        self._no_net = False  # page không có window.__gqlNet -> chạy như fixed
+        self._t0 = time.monotonic()
+
+    def _fixed(self) -> bool:
+        return self.mode == "fixed" or self._no_net
+
+    def scroll_js(self) -> str:
+        return f"window.scrollBy(0, Math.floor(window.innerHeight * {self.step:.2f}));"
+
+    def _net(self, d) -> Optional[list]:
+        try:
+            v = d.execute_script(_NET_JS)
+        except Exception:
+            return None
+        return v if isinstance(v, list) and len(v) == 3 else None
+
+    def wait_after_scroll(self, d, capture=None) -> None:
+        """Chờ sau scrollBy: fixed -> 1s; adaptive -> tới khi mạng yên (hoặc max_wait)."""
+        self.scrolls += 1
+        if self.mode == "fixed":
+            if hasattr(capture, "wait"):
+                capture.wait(1.0)
+            else:
+                time.sleep(1.0)
+            return
+
+        t0 = time.monotonic()
+        time.sleep(self.min_delay)  # cho page kịp bắn request của lần scroll này
+        net = self._net(d)
+        self._no_net = net is None
+        if net is None:
+            time.sleep(max(0.0, 1.0 - self.min_delay))
+            return
+        settled = False
+        while time.monotonic() - t0 < self.max_wait:
+            net = self._net(d)
+            if net is None:
+                break
+            inflight, idle_ms, _ = net
+            if inflight <= 0 and idle_ms >= self.quiet_ms:
+                settled = True
+                break
+            if hasattr(capture, "wait"):
+                capture.wait(0.1)
+            else:
+                time.sleep(0.1)
+        self._slow = not settled or (net is not None and net[2] > self.slow_ms)
+        if not settled:
+            self.timeouts += 1
+
+    def end_of_round(self, new_posts: int) -> None:
+        """Cập nhật AIMD theo kết quả vòng vừa rồi rồi nghỉ `delay` (fixed: 1s)."""
+        self.posts += max(0, new_posts)
+        if self._fixed():
+            time.sleep(1.0)
+        else:
+            if self._slow:
+                self.backoffs += 1
+                self.step = max(self.min_step, self.step / 2)
+                self.delay = min(self.max_delay, self.delay * 2)
+            elif new_posts > 0:
+                self.step = min(self.max_step, self.step + 0.2)
+                self.delay = max(self.min_delay, self.delay - 0.1)
+            self._slow = False
+            time.sleep(max(0.0, self.delay - self.min_delay))
+        if self.log_every and self.scrolls % self.log_every == 0:
+            logger.info("[PACE] %s", self.summary())
+
+    def rates(self):
+        minutes = max(1e-6, (time.monotonic() - self._t0) / 60)
+        return self.scrolls / minutes, self.posts / minutes
+
+    def summary(self) -> str:
+        spm, ppm = self.rates()
+        mode = "adaptive (no __gqlNet -> fixed)" if self.mode == "adaptive" and self._no_net else self.mode
+        return (f"{mode}: {spm:.1f} scrolls/min {ppm:.1f} posts/min | step={self.step:.2f} "
+                f"delay={self.delay:.2f}s backoffs={self.backoffs} timeouts={self.timeouts}")
@@ -0,0 +1,122 @@
+# post/v3/browser/pool.py
+"""
+Giữ browser MoreLogin đã attach (profile + chromedriver + hook) sống qua nhiều URL, thay cho
+quit + close_profile + nghỉ 5s sau mỗi URL.
+
+    acquire() -> driver : lần đầu / sau recycle thì start (open_profile + attach + hook, 10-20s);
+                          các lần sau chỉ reset (bỏ record sót trong buffer, about:blank, cài lại hook)
+    release(ok)         : đo bộ nhớ tab lúc page còn mở; ok=False hoặc tab chết -> recycle ở lần sau
+
+Recycle (stop + nghỉ restart_delay + start lại) khi:
+  - JS heap của tab (Performance.getMetrics: JSHeapTotalSize) lúc release vượt max_heap_mb
+    (SystemInfo của CDP không có số RAM, chỉ CPU time của process nên không dùng)
+  - browser đã sống quá max_age_min phút, hoặc đã chạy max_urls URL (0 = không giới hạn;
+    max_urls=1 = restart mỗi URL như cũ)
+"""
+import time
+from typing import Callable, Dict, Optional
+
+from logs.loging_config import logger
+from .tabs import tab_alive
+
+
+def tab_metrics(driver) -> Dict[str, float]:
+    """Performance.getMetrics của tab -> {name: value} ({} nếu lỗi)."""
+    try:
+        driver.execute_cdp_cmd("Performance.enable", {})
+        res = driver.execute_cdp_cmd("Performance.getMetrics", {})
+    except Exception:
+        return {}
+    return {m.get("name"): m.get("value") for m in (res or {}).get("metrics") or [] if m.get("name")}
+
+
+class BrowserPool:
+    def __init__(
+        self,
+        start: Callable[[], object],
+        stop: Callable[[object], None],
+        reset: Callable[[object], None],
+        max_age_min: float = 120,
+        max_heap_mb: float = 1024,
+        max_urls: int = 0,
+        restart_delay: float = 5.0,
+    ):
+        self._start = start
+        self._stop = stop
+        self._reset = reset
+        self.max_age_min = max_age_min
+        self.max_heap_mb = max_heap_mb
+        self.max_urls = max(0, int(max_urls or 0))
+        self.restart_delay = restart_delay
+        self.driver = None
+        self.urls = 0
+        self.starts = 0
+        self.reuses = 0
+        self.last_heap_mb = 0.0
+        self._born = 0.0
+        self._recycle_reason: Optional[str] = None
+        self._cooldown = False
+
+    def _age_min(self) -> float:
+        return (time.monotonic() - self._born) / 60
+
+    def acquire(self):
+        if self.driver is not None and self._recycle_reason is None:
+            if self.max_age_min and self._age_min() >= self.max_age_min:
+                self._recycle_reason = f"age {self._age_min():.0f} phút"
+            elif self.max_urls and self.urls >= self.max_urls:
+                self._recycle_reason = f"{self.urls} URL"
+        if self.driver is not None and self._recycle_reason is None:
+            try:
+                self._reset(self.driver)
+                self.reuses += 1
+                logger.info("[POOL] Dùng lại browser (URL thứ %d, tuổi %.0f phút, heap %.0f MB)",
+                            self.urls + 1, self._age_min(), self.last_heap_mb)
+                return self.driver
+            except Exception as e:
+                self._recycle_reason = f"reset lỗi: {e}"
+        if self.driver is not None:
+            self._shutdown(self._recycle_reason)
+        if self._cooldown and self.restart_delay > 0:
+            time.sleep(self.restart_delay)  # tránh lỗi port khi mở lại profile ngay sau khi đóng / start lỗi
+        self._cooldown = True
+        driver = self._start()
+        if not driver:
+            return None
+        self.driver = driver
+        self.starts += 1
+        self.urls = 0
+        self.last_heap_mb = 0.0
+        self._born = time.monotonic()
+        self._recycle_reason = None
+        return self.driver
+
+    def release(self, ok: bool = True) -> None:
+        if self.driver is None:
+            return
+        self.urls += 1
+        if not ok or not tab_alive(self.driver):
+            self._recycle_reason = "URL lỗi / tab chết"
+            return
+        heap = tab_metrics(self.driver).get("JSHeapTotalSize")
+        if heap is not None:
+            self.last_heap_mb = heap / (1024 * 1024)
+            if self.max_heap_mb and self.last_heap_mb >= self.max_heap_mb:
+                self._recycle_reason = f"heap {self.last_heap_mb:.0f} MB"
+
+    def _shutdown(self, why: Optional[str]) -> None:
+        logger.info("[POOL] Recycle browser (%s) sau %d URL, tuổi %.0f phút", why or "close", self.urls,
+                    self._age_min())
+        try:
+            self._stop(self.driver)
+        except Exception as e:
+            logger.warning("[POOL] Lỗi khi đóng browser: %s", e)
+        self.driver = None
+
+    def close(self) -> None:
+        if self.driver is not None:
+            self._shutdown("close")
+        logger.info("[POOL] %s", self.summary())
+
+    def summary(self) -> str:
+        return f"starts={self.starts} reuses={self.reuses} last_heap={self.last_heap_mb:.0f} MB"
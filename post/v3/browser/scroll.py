@@ -1,12 +1,14 @@
 # post/v3/browser/scroll.py
-import time
+from datetime import datetime
 from pathlib import Path
-from typing import Set, Dict, Any
+from typing import Set, Dict, Any, Optional
 
 from logs.loging_config import logger
+from util.graphql_filters import format_counts
 from ..browser.hooks import CLEANUP_JS, flush_gql_recs
 from ..graphql.extractors import _best_primary_key
-from ..pipeline import process_single_gql_rec  # sẽ tạo file này bên dưới
+from ..parse_stage import ParseStage
+from .pacing import ScrollPacer
 
 
 _SHOULD_STOP = False
@@ -19,6 +21,9 @@ def reset_stop_flag():
     global _SHOULD_STOP  
     _SHOULD_STOP = False 
     logger.info("[RESET] Đã reset cờ dừng về False.")
+
+def stop_requested() -> bool:
+    return _SHOULD_STOP
 def crawl_scroll_loop(
     d,
     group_url: str,
@@ -26,15 +31,42 @@ def crawl_scroll_loop(
     seen_ids: Set[str],
     keep_last: int,
     max_scrolls: int = 10000000000,
+    stage: Optional[ParseStage] = None,
+    capture=None,
+    pacer: Optional[ScrollPacer] = None,
+    pager=None,
+    stop=None,
 ) -> bool:
     """
+    Vòng scroll chỉ flush record thô rồi submit sang `stage` (parse/extract chạy ở process pool,
+    ghi NDJSON ở writer thread). Không truyền stage thì xử lý inline như cũ.
+    capture: backend từ browser.capture (js / cdp / push); None = flush_gql_recs như cũ.
+        Backend có wait() (push) thì chờ tới khi có record mới thay vì sleep cố định.
+    pacer: nhịp scroll (browser.pacing); None = fixed (sleep 1s sau scroll + 1s cuối vòng như cũ).
+    pager: CursorPager (browser.cursor_pager) cho mode hybrid: bắt được template phân trang feed
+        thì gọi thẳng các trang sau bằng cursor, template hỏng thì scroll tiếp. Mỗi trang tính 1 vòng.
+    stop: threading.Event riêng của phiên (timeout của URL / tab); cờ global set_stop_flag()
+        (SIGINT/SIGTERM) vẫn dừng mọi phiên.
+
+    Dừng ngay khi response feed báo has_next_page=false (stage.feed_has_next, sau khi join để chắc
+    đã parse hết). Heuristic chiều cao trang + vòng không có post mới chỉ là dự phòng khi không đọc
+    được cursor (query lạ, capture cdp bị lọc...).
+    Stage có biên dưới (floor_ts, crawl theo cửa sổ thời gian) thì dừng khi đã ghi BOUNDARY_HITS
+    post cũ hơn biên (không dừng vì 1 post ghim cũ lẻ loi) – phần cũ hơn là việc của cửa sổ sau.
+
     Return:
         True  -> dừng vì stall (Stall confirmed ...)
-        False -> dừng vì lý do khác (STOP flag, MAX_SCROLLS, error...)
+        False -> dừng vì lý do khác (hết feed, tới biên cửa sổ, STOP flag, MAX_SCROLLS, error...)
     """
+    if stage is None:
+        stage = ParseStage(group_url, seen_ids, out_path, workers=0)
+    if pacer is None:
+        pacer = ScrollPacer("fixed")
+
     MAX_SCROLLS = max_scrolls
     CLEANUP_EVERY = 25
     STALL_THRESHOLD = 8
+    BOUNDARY_HITS = 3
 
     DOM_KEEP = max(30, min(keep_last or 40, 60))
 
@@ -43,9 +75,24 @@ def crawl_scroll_loop(
     idle_rounds_no_new_posts = 0
     i = 0
     stopped_due_to_stall = False  # NEW
+    written_before = stage.written
+    stage.reset_feed()
+
+    def should_stop() -> bool:
+        return _SHOULD_STOP or (stop is not None and stop.is_set())
+
+    def at_boundary() -> bool:
+        if stage.created.below < BOUNDARY_HITS:
+            return False
+        logger.info(
+            "[STOP] Reached window boundary: %d posts older than %s.",
+            stage.created.below,
+            datetime.fromtimestamp(stage.created.floor).strftime("%Y-%m-%d"),
+        )
+        return True
 
     while True:
-        if _SHOULD_STOP:
+        if should_stop():
             logger.info("[STOP] Received stop flag, breaking scroll loop.")
             break
 
@@ -54,42 +101,65 @@ def crawl_scroll_loop(
             break
 
         try:
-            d.execute_script(
-                "window.scrollBy(0, Math.floor(window.innerHeight * 0.9));"
-            )
+            d.execute_script(pacer.scroll_js())
         except Exception as e:
             logger.warning("[SCROLL] execute_script error: %s", e)
             break
 
-        time.sleep(1.0)
-
-        recs = flush_gql_recs(d)
-        total_new_from_batch = 0
-
-        if recs:
-            for idx, rec in enumerate(recs):
-                num_new = process_single_gql_rec(
-                    rec,
-                    group_url=group_url,
-                    seen_ids=seen_ids,
-                    out_path=out_path,
-                    log_prefix=f"#{i}/{idx}",
-                )
-                total_new_from_batch += num_new
-
-            if total_new_from_batch:
-                logger.info(
-                    "[GQL] #%d: collected %d new posts (total_seen=%d)",
-                    i,
-                    total_new_from_batch,
-                    len(seen_ids),
-                )
+        pacer.wait_after_scroll(d, capture)
+
+        recs = capture.flush() if capture is not None else flush_gql_recs(d)
+        for idx, rec in enumerate(recs or []):
+            stage.submit(rec, log_prefix=f"#{i}/{idx}")
+            if pager is not None:
+                pager.observe(rec)
+
+        if pager is not None and pager.ready():
+            status, pages = pager.run(lambda: should_stop() or stage.created.below >= BOUNDARY_HITS, MAX_SCROLLS - i)
+            i += pages
+            logger.info("[CURSOR] %s after %d pages | %s", status, pages, pager.summary())
+            if status == "end":
+                logger.info("[STOP] End of feed (cursor mode).")
+                break
+            # pager dừng vì biên cửa sổ: pager.ready() vẫn True, continue thì lại vào pager ngay
+            if status == "stop" and at_boundary():
+                break
+            # stale / stop / limit: về vòng scroll (đầu vòng tự xử lý cờ dừng và MAX_SCROLLS)
+            written_before = stage.written
+            prev_height, stall_count, idle_rounds_no_new_posts = None, 0, 0
+            continue
+
+        # số post mới writer đã ghi kể từ vòng trước (record vòng này có thể sang vòng sau mới xong)
+        total_new_from_batch = stage.written - written_before
+        written_before = stage.written
+
+        if total_new_from_batch:
+            logger.info(
+                "[GQL] #%d: collected %d new posts (total_seen=%d, pending=%d)",
+                i,
+                total_new_from_batch,
+                len(seen_ids),
+                stage.pending(),
+            )
 
         if total_new_from_batch == 0:
             idle_rounds_no_new_posts += 1
         else:
             idle_rounds_no_new_posts = 0
 
+        if stage.feed_has_next is False:
+            stage.join()  # pool có thể còn record cũ hơn; chờ writer áp xong rồi xem lại
+            if stage.feed_has_next is False:
+                logger.info(
+                    "[STOP] End of feed: has_next_page=false after %d feed pages (last cursor=%s).",
+                    stage.feed_pages,
+                    (stage.feed_cursor or "-")[:24],
+                )
+                break
+
+        if at_boundary():
+            break
+
         if i > 0 and (i % CLEANUP_EVERY == 0):
             try:
                 d.execute_script(CLEANUP_JS, DOM_KEEP)
@@ -119,7 +189,21 @@ def crawl_scroll_loop(
             break
 
         i += 1
-        time.sleep(1)
+        pacer.end_of_round(total_new_from_batch)
 
+    # drain: record đã capture trước khi dừng (stop flag / timeout / stall) vẫn được ghi hết
+    stage.join()
     logger.info("[DONE] Crawl loop finished. Total unique posts seen: %d", len(seen_ids))
+    logger.info("[PACE] %s", pacer.summary())
+    if pager is not None:
+        logger.info("[CURSOR] %s", pager.summary())
+    logger.info("[GQL] feed fast-path: %s", stage.feed_path.summary())
+    logger.info("[GQL] response cache: %s", stage.cache.summary())
+    logger.info("[GQL] dedup-before-extract: %s", stage.extract_summary())
+    if capture is not None:
+        logger.info("[GQL] capture: %s", capture.summary())
+        if capture.dropped():
+            logger.info("[GQL] dropped by allow-list: %s", format_counts(capture.dropped()))
+    if stage.learn:
+        logger.info("[GQL] learn: %s", stage.learn_summary())
     return stopped_due_to_stall  # NEW
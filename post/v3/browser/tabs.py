@@ -0,0 +1,52 @@
+# post/v3/browser/tabs.py
+"""
+Mở thêm tab trong cùng browser MoreLogin đang attach để crawl song song.
+
+Mỗi tab là 1 session chromedriver riêng attach vào cùng debuggerAddress rồi mở target mới
+(switch_to.new_window), nên execute_script / execute_cdp_cmd / hook của session đó chỉ đụng
+tab của nó và các tab chạy được ở thread khác nhau. Tab dùng chung cookie / fingerprint của profile.
+
+Mở dạng cửa sổ riêng chứ không phải tab nền: tab bị che thì Chrome dừng render / bóp timer, feed
+không load thêm khi scroll.
+"""
+from logs.loging_config import logger
+from .driver_morelogin import create_chrome_attach
+
+
+def debugger_port(driver) -> int:
+    addr = (driver.capabilities.get("goog:chromeOptions") or {}).get("debuggerAddress")
+    if not addr:
+        raise RuntimeError("driver không có debuggerAddress")
+    return int(addr.rsplit(":", 1)[1])
+
+
+def open_tab(driver, perf_log: bool = False):
+    """Session mới trên cùng browser với `driver`, đang đứng ở 1 tab trống mới mở."""
+    d = create_chrome_attach(debugger_port(driver), perf_log=perf_log)
+    d.switch_to.new_window("window")
+    try:
+        d.execute_cdp_cmd("Emulation.setFocusEmulationEnabled", {"enabled": True})
+    except Exception:
+        pass
+    logger.info("[TAB] Opened tab %s", d.current_window_handle)
+    return d
+
+
+def tab_alive(d) -> bool:
+    try:
+        d.current_window_handle
+        return True
+    except Exception:
+        return False
+
+
+def close_tab(d) -> None:
+    """Đóng tab của session rồi thả chromedriver (browser + các tab khác vẫn chạy)."""
+    try:
+        d.close()
+    except Exception:
+        pass
+    try:
+        d.quit()
+    except Exception:
+        pass
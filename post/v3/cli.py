@@ -1,29 +1,38 @@
 # post/v3/cli.py
 import os
 import sys
+import queue
 import signal
 import time
 import threading
 import re
 from pathlib import Path
 from urllib.parse import urlparse, parse_qs
-from datetime import datetime, date
-from typing import Set, List, Optional
+from datetime import datetime, date, timedelta
+from typing import Set, List, Optional, Tuple
 
 from logs.loging_config import logger
 from util.startdriverproxy import bootstrap_auth
+from util.graphql_filters import GQL_ALLOW_LISTS, resolve_allow
 
 from .config import PROJECT_ROOT, env
 from .browser.driver import create_chrome, make_headless
-from .browser.hooks import install_early_hook
+from .browser.hooks import DEFAULT_BUFFER_MB, flush_gql_recs, install_early_hook
+from .browser.capture import CAPTURE_BACKENDS, make_capture
 from .browser.navigation import go_to_date
-from .browser.scroll import crawl_scroll_loop, set_stop_flag, reset_stop_flag
+from .browser.pacing import PACING_MODES, ScrollPacer
+from .browser.cursor_pager import CursorPager
+from .browser.scroll import crawl_scroll_loop, set_stop_flag, reset_stop_flag, stop_requested
 from .browser.morelogin_client import close_profile, open_profile
+from .browser.tabs import close_tab, open_tab, tab_alive
+from .browser.pool import BrowserPool
 from .browser.driver_morelogin import create_chrome_attach
 
 from .storage.paths import compute_paths
-from .storage.checkpoint import save_checkpoint
-from . import pipeline
+from .storage.checkpoint import load_checkpoint, save_checkpoint
+from .storage.archive import RawArchive
+from .parse_stage import ParseStage, SharedDedup
+from .pipeline import CreatedRange
 
 # --- CẤU HÌNH BATCH ---
 BATCH_SIZE = 3 
@@ -40,17 +49,56 @@ def add_common_args(ap):
     ap.add_argument("--data-root", type=str, default=env("DATA_ROOT", str(PROJECT_ROOT / "database")))
     ap.add_argument("--cookies-path", type=str, default=env("COOKIE_PATH", ""))
     ap.add_argument("--keep-last", type=int, default=env("KEEP_LAST", 350, int))
+    ap.add_argument("--buffer-mb", type=float, default=env("GQL_BUFFER_MB", DEFAULT_BUFFER_MB, float),
+                    help="Giới hạn tổng responseText nằm trong window.__gqlReqs giữa 2 lần flush")
     ap.add_argument("--headless", action="store_true")
     ap.add_argument("--no-headless", action="store_true")
     ap.add_argument("--page-limit", type=int, default=env("PAGE_LIMIT", None, int))
     ap.add_argument("--date", type=str, help="YYYY-MM-DD")
+    ap.add_argument("--since", type=str, default=env("SINCE_DATE", None),
+                    help="YYYY-MM-DD: ngày đầu của khoảng crawl khi chia cửa sổ (mặc định: ngày trong checkpoint)")
+    ap.add_argument("--windows", type=int, default=env("TIME_WINDOWS", 1, int),
+                    help="Chia khoảng [--since, --date] thành N cửa sổ thời gian, mỗi cửa sổ 1 tab crawl song song "
+                         "(chỉ page, group không có go_to_date)")
     ap.add_argument("--morelogin-profile-id", type=str, required=True,
                     help="Profile ID của MoreLogin")
-IS_TIMEOUT_TRIGGERED = False
-
+    ap.add_argument("--browser-max-age", type=float, default=env("BROWSER_MAX_AGE", 120, float),
+                    help="Phút: browser sống quá lâu thì đóng profile mở lại trước URL kế tiếp (0 = không giới hạn)")
+    ap.add_argument("--browser-max-heap-mb", type=float, default=env("BROWSER_MAX_HEAP_MB", 1024, float),
+                    help="JS heap của tab (Performance.getMetrics) sau 1 URL vượt mức này thì mở lại browser")
+    ap.add_argument("--browser-max-urls", type=int, default=env("BROWSER_MAX_URLS", 0, int),
+                    help="Số URL tối đa trên 1 browser trước khi mở lại (0 = không giới hạn, 1 = restart mỗi URL như cũ)")
+    ap.add_argument("--tabs", type=int, default=env("TABS", 1, int),
+                    help="Số tab crawl song song trong cùng 1 profile (mỗi tab lấy URL kế tiếp trong --group-urls)")
+    ap.add_argument("--parse-workers", type=int, default=env("PARSE_WORKERS", 2, int),
+                    help="Số process parse/extract GraphQL (0 = xử lý inline trong vòng scroll)")
+    ap.add_argument("--parse-queue", type=int, default=env("PARSE_QUEUE", 64, int),
+                    help="Số record tối đa chờ parse trước khi vòng scroll phải đợi")
+    ap.add_argument("--capture", type=str, choices=CAPTURE_BACKENDS, default=env("CAPTURE_BACKEND", "js"),
+                    help="Cách bắt response GraphQL: js = hook fetch/XHR trong page, cdp = Network.getResponseBody, "
+                         "push = hook JS đẩy record qua Runtime.addBinding (không poll)")
+    ap.add_argument("--pacing", type=str, choices=PACING_MODES, default=env("SCROLL_PACING", "adaptive"),
+                    help="Nhịp scroll: adaptive = chờ request GraphQL xong rồi chỉnh quãng/delay (AIMD), fixed = sleep 1s như cũ")
+    ap.add_argument("--feed-mode", type=str, choices=["scroll", "hybrid"], default=env("FEED_MODE", "scroll"),
+                    help="scroll = cuộn DOM cho mọi trang; hybrid = bắt query phân trang rồi gọi thẳng bằng end_cursor trong page")
+    ap.add_argument("--cursor-delay", type=float, default=env("CURSOR_DELAY", 0.5, float),
+                    help="Nghỉ (giây) giữa 2 trang ở mode hybrid")
+    ap.add_argument("--gql-allow", type=str, choices=["off", *GQL_ALLOW_LISTS], default=env("GQL_ALLOW", "off"),
+                    help="Allow-list friendly name/doc_id cho hook capture (off = giữ mọi /api/graphql/)")
+    ap.add_argument("--gql-allow-extra", type=str, nargs="*", default=[],
+                    help="Regex friendly name / doc_id bổ sung vào allow-list")
+    ap.add_argument("--gql-learn", action="store_true", default=env("GQL_LEARN", False, bool),
+                    help="Log friendly name nào thực sự ra post để chỉnh allow-list")
+    ap.add_argument("--project", action="store_true", default=env("GQL_PROJECT", False, bool),
+                    help="Cắt response trong page, chỉ giữ story/comment node + page_info trước khi qua bridge (chỉ capture js)")
+    ap.add_argument("--archive", action="store_true", default=env("GQL_ARCHIVE", False, bool),
+                    help="Lưu mọi response GraphQL thô (zstd) vào raw_dump_posts/ để replay offline (tự tắt --project)")
+    ap.add_argument("--archive-segment-mb", type=float, default=env("ARCHIVE_SEGMENT_MB", 64, float),
+                    help="Kích thước (MB, sau nén) mỗi segment archive trước khi mở segment mới")
+    ap.add_argument("--payload-cache", type=int, default=env("PAYLOAD_CACHE", 512, int),
+                    help="Số fingerprint response giữ trong LRU để bỏ qua response trùng (0 = tắt)")
 def _handle_sigterm(sig, frame):
-    if not IS_TIMEOUT_TRIGGERED:
-        logger.warning("[SIGNAL] Nhận tín hiệu dừng hệ thống.")
+    logger.warning("[SIGNAL] Nhận tín hiệu dừng hệ thống.")
     set_stop_flag()
 
 signal.signal(signal.SIGTERM, _handle_sigterm)
@@ -101,6 +149,43 @@ def init_driver_and_login(args):
         pass
         
     return d
+def _gql_allow(args):
+    return resolve_allow(getattr(args, "gql_allow", None), getattr(args, "gql_allow_extra", None))
+
+def _gql_project(args) -> bool:
+    # projection làm mất dữ liệu thô -> tự tắt khi cần lưu raw đầy đủ
+    return bool(getattr(args, "project", False)) and not getattr(args, "archive", False)
+
+def _use_cdp(args) -> bool:
+    return getattr(args, "capture", "js") == "cdp"
+
+def _setup_cdp(driver, args):
+    """Network.enable + tắt cache + cài hook JS (capture cdp thì không cài hook)."""
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd(
+            "Network.setCacheDisabled",
+            {"cacheDisabled": True}
+        )
+
+        # capture cdp: không cài hook JS để body không nằm trong heap của page
+        if hasattr(args, "keep_last") and not _use_cdp(args):
+            install_early_hook(
+                driver,
+                keep_last=int(args.keep_last),
+                allow=_gql_allow(args),
+                project=_gql_project(args),
+                max_buffer_mb=getattr(args, "buffer_mb", DEFAULT_BUFFER_MB),
+            )
+    except Exception as e:
+        logger.debug("[DRIVER] CDP hook skipped: %s", e)
+
+def _open_tab(driver, args):
+    """Tab mới (session chromedriver riêng) trong browser của `driver`, đã cài hook như tab chính."""
+    d = open_tab(driver, perf_log=_use_cdp(args))
+    _setup_cdp(d, args)
+    return d
+
 def init_driver_and_login(args):
     """
     Start MoreLogin profile → attach Selenium → setup CDP hooks
@@ -117,23 +202,8 @@ def init_driver_and_login(args):
             cdp_evasion=True,
         )
 
-        driver = create_chrome_attach(debug_port)
-
-        # ---- CDP setup (optional nhưng nên có) ----
-        try:
-            driver.execute_cdp_cmd("Network.enable", {})
-            driver.execute_cdp_cmd(
-                "Network.setCacheDisabled",
-                {"cacheDisabled": True}
-            )
-
-            if hasattr(args, "keep_last"):
-                install_early_hook(
-                    driver,
-                    keep_last=int(args.keep_last)
-                )
-        except Exception as e:
-            logger.debug("[DRIVER] CDP hook skipped: %s", e)
+        driver = create_chrome_attach(debug_port, perf_log=_use_cdp(args))
+        _setup_cdp(driver, args)
 
         logger.info(
             "[DRIVER] Attach MoreLogin OK | profile=%s | port=%s",
@@ -150,7 +220,7 @@ def init_driver_and_login(args):
             close_profile(profile_id)
 
         raise
-def _run_single_session(*, driver, args, group_url: str, target_date: date, out_ndjson: Path, keep_last: int, seen_ids: Set[str]):
+def _run_single_session(*, driver, args, group_url: str, target_date: date, out_ndjson: Path, keep_last: int, seen_ids: Set[str], stage: Optional[ParseStage] = None, capture=None, stop=None):
     stopped_due_to_stall = False
     try:
         logger.info(f"[NAV] Đang truy cập: {group_url}")
@@ -167,18 +237,166 @@ def _run_single_session(*, driver, args, group_url: str, target_date: date, out_
             seen_ids=seen_ids,
             keep_last=keep_last,
             max_scrolls=args.page_limit or 10000,
+            stage=stage,
+            capture=capture,
+            pacer=ScrollPacer(getattr(args, "pacing", "fixed")),
+            pager=(
+                CursorPager(driver, stage, delay=getattr(args, "cursor_delay", 0.5))
+                if getattr(args, "feed_mode", "scroll") == "hybrid" and stage is not None else None
+            ),
+            stop=stop,
         )
     except Exception as e:
         logger.error(f"[SESSION] Error: {e}")
     
     return stopped_due_to_stall
 
-def process_url(url, args, driver):
-    global IS_TIMEOUT_TRIGGERED
-    
-    reset_stop_flag()
-    IS_TIMEOUT_TRIGGERED = False
+def _make_stage(args, group_url: str, seen_ids: Set[str], out_ndjson: Path, archive=None,
+                shared: Optional[SharedDedup] = None, floor_ts: Optional[int] = None) -> ParseStage:
+    return ParseStage(
+        group_url, seen_ids, out_ndjson,
+        workers=getattr(args, "parse_workers", 0),
+        max_pending=getattr(args, "parse_queue", 64),
+        cache_size=getattr(args, "payload_cache", 512),
+        learn=getattr(args, "gql_learn", False),
+        archive=archive,
+        shared=shared,
+        floor_ts=floor_ts,
+    )
 
+def _make_capture(driver, args):
+    return make_capture(driver, getattr(args, "capture", "js"), int(args.keep_last), _gql_allow(args),
+                        _gql_project(args), getattr(args, "buffer_mb", DEFAULT_BUFFER_MB))
+
+def _crawl_with_retries(*, driver, args, group_url: str, target_date: date, out_ndjson: Path,
+                        seen_ids: Set[str], stage: ParseStage, capture, stop: threading.Event, tag: str = ""):
+    """
+    go_to_date -> scroll; dừng vì stall thì đi lại từ ngày của post cũ nhất stage đã ghi (tối đa 3 lần).
+    stop: Event timeout của URL (set thì không retry nữa).
+    """
+    MAX_STALL_RETRIES = 3
+    stall_retry_count = 0
+    current_target_date = target_date
+    while True:
+        if stop.is_set():
+            break
+
+        stopped_due_to_stall = _run_single_session(
+            driver=driver,
+            args=args,
+            group_url=group_url,
+            target_date=current_target_date,
+            out_ndjson=out_ndjson,
+            keep_last=int(args.keep_last),
+            seen_ids=seen_ids,
+            stage=stage,
+            capture=capture,
+            stop=stop,
+        )
+
+        if stop.is_set():
+            break
+
+        if not stopped_due_to_stall:
+            logger.info(f"[SESSION]{tag} Xong (không phải stall).")
+            break
+
+        stall_retry_count += 1
+        if stall_retry_count >= MAX_STALL_RETRIES:
+            break
+
+        if stage.created.earliest is None:
+            break
+
+        current_target_date = datetime.fromtimestamp(stage.created.earliest).date()
+        logger.info(f"[SESSION]{tag} Stall -> go_to_date lại từ {current_target_date}")
+
+def _split_date_range(start: date, end: date, n: int) -> List[Tuple[date, date]]:
+    """[start, end] -> tối đa n cửa sổ liền nhau theo ngày, mới nhất trước: [(ngày cuối, ngày đầu), ...]."""
+    days = (end - start).days + 1
+    n = max(1, min(n, days))
+    out = []
+    hi = end
+    for k in range(n):
+        span = days * (k + 1) // n - days * k // n
+        lo = hi - timedelta(days=span - 1)
+        out.append((hi, lo))
+        hi = lo - timedelta(days=1)
+    return out
+
+def _plan_windows(args, group_url: str, target_date: date, checkpoint: Path) -> List[Tuple[date, date]]:
+    """Cửa sổ thời gian cho --windows N; [] -> crawl tuần tự như cũ."""
+    n = int(getattr(args, "windows", 1) or 1)
+    if n <= 1:
+        return []
+    if "group" in group_url:
+        logger.warning("[WINDOW] Group không có bộ lọc ngày (go_to_date) -> crawl tuần tự.")
+        return []
+    if getattr(args, "since", None):
+        try:
+            since = datetime.strptime(args.since, "%Y-%m-%d").date()
+        except ValueError:
+            raise SystemExit("Since format error")
+    else:
+        last_ts = load_checkpoint(checkpoint)
+        if last_ts is None:
+            logger.warning("[WINDOW] Không có --since và chưa có checkpoint -> crawl tuần tự.")
+            return []
+        since = datetime.fromtimestamp(last_ts).date()
+    if since >= target_date:
+        return []
+    return _split_date_range(since, target_date, n)
+
+def _crawl_time_windows(*, driver, args, group_url: str, windows: List[Tuple[date, date]], out_ndjson: Path,
+                        seen_ids: Set[str], archive, stop: threading.Event) -> List[CreatedRange]:
+    """
+    Mỗi cửa sổ (ngày cuối, ngày đầu) chạy ở 1 tab + 1 thread: go_to_date(ngày cuối) rồi scroll tới khi
+    gặp post cũ hơn ngày đầu (biên của cửa sổ sau). Cửa sổ mới nhất dùng tab chính. Mọi cửa sổ ghi
+    chung out_ndjson qua 1 SharedDedup nên phần chồng lấn ở biên chỉ ghi 1 lần.
+    """
+    shared = SharedDedup(seen_ids)
+    ranges: List[CreatedRange] = []
+
+    def run(k: int, end: date, start: date):
+        tag = f"[W{k + 1}/{len(windows)} {start}..{end}]"
+        d = stage = capture = None
+        try:
+            d = driver if k == 0 else _open_tab(driver, args)
+            floor_ts = int(datetime.combine(start, datetime.min.time()).timestamp())
+            stage = _make_stage(args, group_url, seen_ids, out_ndjson, archive, shared=shared, floor_ts=floor_ts)
+            ranges.append(stage.created)
+            capture = _make_capture(d, args)
+            logger.info(f"[WINDOW]{tag} Bắt đầu")
+            _crawl_with_retries(driver=d, args=args, group_url=group_url, target_date=end, out_ndjson=out_ndjson,
+                                seen_ids=seen_ids, stage=stage, capture=capture, stop=stop, tag=tag)
+        except Exception as e:
+            logger.exception(f"[WINDOW]{tag} Lỗi: {e}")
+        finally:
+            if stage is not None:
+                stage.close()
+                logger.info(f"[WINDOW]{tag} Xong: written={stage.written}")
+            if capture is not None:
+                capture.close()
+            if d is not None and d is not driver:
+                close_tab(d)
+
+    logger.info(f"[WINDOW] Crawl song song {len(windows)} cửa sổ: " +
+                ", ".join(f"{lo}..{hi}" for hi, lo in windows))
+    threads = [
+        threading.Thread(target=run, args=(k, hi, lo), name=f"window-{k + 1}", daemon=True)
+        for k, (hi, lo) in enumerate(windows)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return ranges
+
+def process_url(url, args, driver):
+    """
+    Crawl 1 URL trên tab của `driver`. Cờ dừng / timeout là của riêng lần gọi này (Event) nên nhiều
+    tab gọi song song được; cờ global (SIGINT/SIGTERM) vẫn dừng tất cả.
+    """
     group_url = url.strip()
     
     # --- LOGIC TẠO TÊN FOLDER RIÊNG BIỆT ---
@@ -189,7 +407,6 @@ def process_url(url, args, driver):
 
     account_tag = (args.account_tag or "").strip()
     data_root = Path(args.data_root).resolve()
-    keep_last = int(args.keep_last)
     timeout_mins = args.timeout
 
     # Path sẽ được tính toán dựa trên page_name mới
@@ -205,13 +422,12 @@ def process_url(url, args, driver):
     else:
         target_date = date.today()
 
+    stop = threading.Event()
     timer = None
     if timeout_mins > 0:
         def on_timeout():
-            global IS_TIMEOUT_TRIGGERED
             logger.warning(f"[TIMEOUT] Hết giờ ({timeout_mins}p) cho {group_url}")
-            IS_TIMEOUT_TRIGGERED = True
-            set_stop_flag() 
+            stop.set()
 
         timer = threading.Timer(timeout_mins * 60, on_timeout)
         timer.start()
@@ -219,53 +435,112 @@ def process_url(url, args, driver):
 
     logger.info(f"====== CRAWL URL: {group_url} | FOLDER: {page_name} ======")
     seen_ids: Set[str] = set()
-    MAX_STALL_RETRIES = 3
-    stall_retry_count = 0
-    current_target_date = target_date
+    archive = (
+        RawArchive(raw_dumps_dir, segment_mb=getattr(args, "archive_segment_mb", 64))
+        if getattr(args, "archive", False) else None
+    )
+    windows = _plan_windows(args, group_url, target_date, checkpoint) if driver is not None else []
+    stage = None
+    capture = None
+    ranges: List[CreatedRange] = []
 
     try:
-        while True:
-            if IS_TIMEOUT_TRIGGERED:
-                break
+        if driver is None:
+            logger.error("[SESSION] Driver không tồn tại, bỏ qua URL này.")
+        elif windows:
+            ranges = _crawl_time_windows(driver=driver, args=args, group_url=group_url, windows=windows,
+                                         out_ndjson=out_ndjson, seen_ids=seen_ids, archive=archive,
+                                         stop=stop)
+        else:
+            stage = _make_stage(args, group_url, seen_ids, out_ndjson, archive)
+            ranges = [stage.created]
+            capture = _make_capture(driver, args)
+            _crawl_with_retries(driver=driver, args=args, group_url=group_url, target_date=target_date,
+                                out_ndjson=out_ndjson, seen_ids=seen_ids, stage=stage, capture=capture,
+                                stop=stop)
             
-            if driver is None:
-                logger.error("[SESSION] Driver không tồn tại, bỏ qua URL này.")
-                break
-
-            stopped_due_to_stall = _run_single_session(
-                driver=driver,
-                args=args,
-                group_url=group_url,
-                target_date=current_target_date,
-                out_ndjson=out_ndjson,
-                keep_last=keep_last,
-                seen_ids=seen_ids,
-            )
+    finally:
+        if timer:
+            timer.cancel()
+        if stage is not None:
+            stage.close()
+        if archive is not None:
+            archive.close()
+        if capture is not None:
+            capture.close()
+        latest = max((r.latest for r in ranges if r.latest is not None), default=None)
+        if latest is not None:
+            save_checkpoint(checkpoint, latest)
+        logger.info(f"[DONE] URL: {group_url}. Output: {out_ndjson}")
 
-            if IS_TIMEOUT_TRIGGERED:
-                break
-            
-            if not stopped_due_to_stall:
-                logger.info("[SESSION] Xong (không phải stall).")
-                break
+def _stop_browser(driver, profile_id: str):
+    try:
+        driver.quit()
+    except Exception:
+        pass
+    # Gọi API MoreLogin để stop profile (Giải phóng process ngầm)
+    try:
+        close_profile(profile_id)
+    except Exception as e:
+        logger.warning(f"Lỗi khi đóng profile MoreLogin: {e}")
 
-            stall_retry_count += 1
-            if stall_retry_count >= MAX_STALL_RETRIES:
-                break
+def _reset_tab(driver, args):
+    """Dọn tab cho URL sau mà không restart browser: bỏ record sót, về about:blank, cài lại hook."""
+    flush_gql_recs(driver)
+    if _use_cdp(args):
+        driver.get_log("performance")
+    driver.get("about:blank")
+    _setup_cdp(driver, args)
 
-            if pipeline.EARLIEST_CREATED_TS is None:
-                break
+def run_tabs(urls: List[str], args, n_tabs: int):
+    """
+    --tabs N: 1 profile MoreLogin, 1 browser, N tab crawl song song; mỗi tab là 1 thread lấy URL kế
+    tiếp trong hàng đợi. Capture / seen_ids / cờ dừng / timeout là của từng URL (process_url).
+    Tab chết (crash, bị đóng tay) thì mở tab mới thay ở URL sau; SIGINT/SIGTERM dừng mọi tab.
+    """
+    profile_id = args.morelogin_profile_id
+    jobs: "queue.Queue" = queue.Queue()
+    for i, url in enumerate(urls):
+        jobs.put((i, url))
 
-            new_date = datetime.fromtimestamp(pipeline.EARLIEST_CREATED_TS).date()
-            current_target_date = new_date
-            reset_stop_flag()
-            
+    driver = None
+    try:
+        driver = init_driver_and_login(args)
+        if not driver:
+            logger.error("[MAIN] Không thể khởi tạo driver.")
+            return
+
+        def worker(k: int):
+            d = driver if k == 0 else None  # tab 0 = tab chính, các tab khác mở khi có việc
+            try:
+                while not stop_requested():
+                    try:
+                        i, url = jobs.get_nowait()
+                    except queue.Empty:
+                        return
+                    try:
+                        if d is None or not tab_alive(d):
+                            if d is not None and d is not driver:
+                                close_tab(d)
+                            d = None  # mở tab lỗi thì URL sau thử lại
+                            d = _open_tab(driver, args)
+                        logger.info(f"[TAB {k + 1}] URL {i + 1}/{len(urls)}: {url}")
+                        process_url(url, args, d)
+                    except Exception as e:
+                        logger.exception(f"[TAB {k + 1}] Lỗi tại URL {url}: {e}")
+            finally:
+                if d is not None and d is not driver:
+                    close_tab(d)
+
+        threads = [threading.Thread(target=worker, args=(k,), name=f"tab-{k + 1}", daemon=True)
+                   for k in range(n_tabs)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
     finally:
-        if timer:
-            timer.cancel()
-        if pipeline.LATEST_CREATED_TS is not None:
-            save_checkpoint(checkpoint, pipeline.LATEST_CREATED_TS)
-        logger.info(f"[DONE] URL: {group_url}. Output: {out_ndjson}")
+        logger.info("[MAIN] Đang đóng driver và profile...")
+        _stop_browser(driver, profile_id)
 
 def main(argv=None):
     import argparse
@@ -278,51 +553,54 @@ def main(argv=None):
         logger.error("No URLs provided")
         return
 
+    n_tabs = min(max(1, int(getattr(args, "tabs", 1) or 1)), len(urls))
+    if n_tabs > 1:
+        logger.info(f"[MAIN] Bắt đầu xử lý {len(urls)} URLs. Chế độ: {n_tabs} tab song song trong 1 profile.")
+        run_tabs(urls, args, n_tabs)
+        logger.info("[MAIN] HOÀN TẤT TOÀN BỘ DANH SÁCH.")
+        return
+
     profile_id = args.morelogin_profile_id
-    logger.info(f"[MAIN] Bắt đầu xử lý {len(urls)} URLs. Chế độ: Restart Driver sau mỗi URL.")
+    logger.info(f"[MAIN] Bắt đầu xử lý {len(urls)} URLs. Chế độ: giữ browser qua các URL (recycle theo heap / tuổi).")
+
+    pool = BrowserPool(
+        start=lambda: init_driver_and_login(args),
+        stop=lambda d: _stop_browser(d, profile_id),
+        reset=lambda d: _reset_tab(d, args),
+        max_age_min=args.browser_max_age,
+        max_heap_mb=args.browser_max_heap_mb,
+        max_urls=args.browser_max_urls,
+    )
 
     # --- VÒNG LẶP XỬ LÝ TỪNG URL ---
-    for i, url in enumerate(urls):
-        logger.info(f"\n{'='*10} PROCESSING URL {i+1}/{len(urls)} {'='*10}")
-        logger.info(f"Target: {url}")
+    try:
+        for i, url in enumerate(urls):
+            logger.info(f"\n{'='*10} PROCESSING URL {i+1}/{len(urls)} {'='*10}")
+            logger.info(f"Target: {url}")
 
-        current_driver = None
-        
-        try:
-            # 1. KHỞI TẠO DRIVER (Mới cho mỗi URL)
-            current_driver = init_driver_and_login(args)
-            
-            if not current_driver:
-                logger.error(f"[MAIN] Không thể khởi tạo driver cho URL {i+1}. Bỏ qua.")
-                continue
+            ok = False
+            try:
+                # 1. LẤY DRIVER (browser đang chạy đã reset, hoặc start mới khi cần recycle)
+                current_driver = pool.acquire()
 
-            # 2. XỬ LÝ URL
-            process_url(url, args, current_driver)
+                if not current_driver:
+                    logger.error(f"[MAIN] Không thể khởi tạo driver cho URL {i+1}. Bỏ qua.")
+                    continue
 
-        except Exception as e:
-            logger.exception(f"[MAIN] Lỗi không mong muốn tại URL {url}: {e}")
+                # 2. XỬ LÝ URL (Ctrl+C chỉ bỏ URL hiện tại, sang URL sau như cũ)
+                reset_stop_flag()
+                process_url(url, args, current_driver)
+                ok = True
 
-        finally:
-            # 3. DỌN DẸP (Quan trọng nhất để giải phóng RAM)
-            logger.info("[MAIN] Đang đóng driver và profile để giải phóng RAM...")
-            
-            # 3a. Đóng Selenium Driver
-            if current_driver:
-                try:
-                    current_driver.quit()
-                except Exception:
-                    pass
-            
-            # 3b. Gọi API MoreLogin để stop profile (Giải phóng process ngầm)
-            try:
-                close_profile(profile_id)
             except Exception as e:
-                logger.warning(f"Lỗi khi đóng profile MoreLogin: {e}")
+                logger.exception(f"[MAIN] Lỗi không mong muốn tại URL {url}: {e}")
 
-            # 3c. Nghỉ một chút trước khi mở lại để tránh lỗi Port
-            if i < len(urls) - 1:
-                logger.info("Nghỉ 5s trước khi sang URL tiếp theo...")
-                time.sleep(5)
+            finally:
+                # 3. Đo bộ nhớ tab; URL lỗi / tab chết thì lần sau mở lại browser
+                pool.release(ok)
+    finally:
+        # 4. DỌN DẸP: đóng driver + stop profile MoreLogin 1 lần ở cuối
+        pool.close()
 
     logger.info("[MAIN] HOÀN TẤT TOÀN BỘ DANH SÁCH.")
 
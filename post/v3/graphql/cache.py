@@ -0,0 +1,79 @@
+# post/v3/graphql/cache.py
+"""
+LRU fingerprint cho response GraphQL đã xử lý.
+
+Sau stall retry / go_to_date, FB gửi lại y hệt mấy trang feed đầu. Response trùng
+(cùng variables + responseText) chắc chắn chỉ ra các post đã có trong seen_ids, nên bỏ qua
+luôn, khỏi parse/extract. Cache phải sống cùng seen_ids (1 URL), không dùng chung giữa các URL.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs
+
+
+def _request_variables(rec: Dict[str, Any]) -> str:
+    body = rec.get("body") or ""
+    if not isinstance(body, str) or "variables=" not in body:
+        return ""
+    try:
+        return (parse_qs(body).get("variables") or [""])[0]
+    except Exception:
+        return ""
+
+
+def response_fingerprint(rec: Dict[str, Any]) -> bytes:
+    h = hashlib.blake2b(digest_size=16)
+    h.update(_request_variables(rec).encode("utf-8", "surrogatepass"))
+    h.update(b"\0")
+    h.update((rec.get("responseText") or "").encode("utf-8", "surrogatepass"))
+    return h.digest()
+
+
+class ResponseCache:
+    """
+    key() lấy fingerprint, seen() hỏi, mark() đánh dấu. Tách mark() ra để chỉ đánh dấu khi response
+    đã ghi xong: response extract / ghi lỗi thì lần capture lại y hệt vẫn được xử lý.
+    seen() chạy ở scroll loop, mark() ở writer thread nên có lock.
+    """
+
+    def __init__(self, maxsize: int = 512):
+        self.maxsize = max(0, int(maxsize or 0))
+        self.hits = 0
+        self.misses = 0
+        self.bytes_skipped = 0
+        self._keys: "OrderedDict[bytes, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, rec: Dict[str, Any]) -> Optional[bytes]:
+        """Fingerprint của response (None nếu cache tắt)."""
+        return response_fingerprint(rec) if self.maxsize else None
+
+    def seen(self, key: Optional[bytes], size: int = 0) -> bool:
+        """True nếu response có fingerprint `key` đã được xử lý xong (mark) rồi."""
+        if key is None:
+            return False
+        with self._lock:
+            if key in self._keys:
+                self._keys.move_to_end(key)
+                self.hits += 1
+                self.bytes_skipped += size
+                return True
+            self.misses += 1
+            return False
+
+    def mark(self, key: Optional[bytes]) -> None:
+        if key is None:
+            return
+        with self._lock:
+            self._keys[key] = None
+            self._keys.move_to_end(key)
+            if len(self._keys) > self.maxsize:
+                self._keys.popitem(last=False)
+
+    def summary(self) -> str:
+        total = self.hits + self.misses
+        rate = (100.0 * self.hits / total) if total else 0.0
+        return (f"hit={self.hits} miss={self.misses} ({rate:.0f}% hit) "
+                f"skipped={self.bytes_skipped / (1024 * 1024):.1f} MB size={len(self._keys)}/{self.maxsize}")
@@ -1,10 +1,10 @@
 # post/v3/graphql/extractors.py
 import re
-from typing import List, Optional
+from typing import Dict, List, Optional, Set, Tuple
 from urllib.parse import urlparse, parse_qs
 
 from ..config import POST_URL_RE
-from .parser import deep_collect_timestamps
+from .parser import TIMESTAMP_KEYS, as_epoch_s, deep_collect_timestamps
 from ..utils import _norm_link 
 
 REACTION_KEYS = {
@@ -313,35 +313,52 @@ def _all_urls_from_text(s: str):
             out.append(u); seen.add(u)
     return out
 
+_ATTACHMENT_URL_KEYS = ("url","canonical_url","source","href","permalink_url","external_url")
+_ATTACHMENT_META_KEYS = (("title","og_title"),("subtitle","og_desc"),("site_name","og_site_name"),("publisher","og_site_name"))
+
+class _AttachmentSink:
+    """Gom URL (+ OG meta) theo từng dict được duyệt, dùng chung cho _dig_attachment_urls và visitor."""
+    __slots__ = ("urls", "seen", "meta")
+
+    def __init__(self, with_meta: bool = True):
+        self.urls, self.seen = [], set()
+        self.meta = {} if with_meta else None
+
+    def take(self, u):
+        u=_clean_url(u)
+        if u and u not in self.seen:
+            self.urls.append(u); self.seen.add(u)
+
+    def visit(self, x: dict):
+        # các key hay chứa URL
+        for k in _ATTACHMENT_URL_KEYS:
+            v=x.get(k)
+            if isinstance(v,str): self.take(v)
+        meta = self.meta
+        if meta is None:
+            return
+        # OG-esque meta
+        for (k1,k2) in _ATTACHMENT_META_KEYS:
+            if isinstance(x.get(k1), dict) and isinstance(x[k1].get("text"), str):
+                meta.setdefault(k2, x[k1]["text"].strip())
+            elif isinstance(x.get(k1), str):
+                meta.setdefault(k2, x[k1].strip())
+
 def _dig_attachment_urls(n:dict):
     """
     Lục các URL trong attachments/shareable để lấy OG meta.
     Trả về (urls, meta) với meta có og_title/og_desc/site_name nếu có.
     """
-    urls, meta = [], {}
-    def take(u):
-        u=_clean_url(u)
-        if u and u not in urls:
-            urls.append(u)
+    sink = _AttachmentSink()
 
     def dive(x):
         if isinstance(x, dict):
-            # các key hay chứa URL
-            for k in ("url","canonical_url","source","href","permalink_url","external_url"):
-                v=x.get(k)
-                if isinstance(v,str): take(v)
-            # OG-esque meta
-            for (k1,k2) in (("title","og_title"),("subtitle","og_desc"),("site_name","og_site_name"),("publisher","og_site_name")):
-                if isinstance(x.get(k1), dict) and isinstance(x[k1].get("text"), str):
-                    meta.setdefault(k2, x[k1]["text"].strip())
-                elif isinstance(x.get(k1), str):
-                    meta.setdefault(k2, x[k1].strip())
-
+            sink.visit(x)
             for v in x.values(): dive(v)
         elif isinstance(x, list):
             for v in x: dive(v)
     dive(n)
-    return urls, meta
+    return sink.urls, sink.meta
 
 def extract_share_flags_smart(n: dict, actor_text: str = None):
     """
@@ -351,9 +368,10 @@ def extract_share_flags_smart(n: dict, actor_text: str = None):
     - origin_id: id bài gốc nếu tóm được
     - share_meta: {og_title, og_desc, og_site_name} nếu có
     """
-    is_share, link_share, type_share, origin_id = False, None, None, None
-    share_meta = {}
+    cand_nodes = _share_candidate_nodes(n)
+    return _share_flags_from(cand_nodes, [_dig_attachment_urls(node) for node in cand_nodes], actor_text)
 
+def _share_candidate_nodes(n: dict) -> list:
     cs = n.get("comet_sections") or {}
     # 1) cố nhìn attached/content story (nếu share)
     cand_nodes = []
@@ -370,11 +388,16 @@ def extract_share_flags_smart(n: dict, actor_text: str = None):
         cand_nodes.append(n["attachments"])
     if isinstance(n.get("story_attachment"), dict):
         cand_nodes.append(n["story_attachment"])
+    return cand_nodes
+
+def _share_flags_from(cand_nodes: list, dug: list, actor_text: str = None):
+    """dug[i] = _dig_attachment_urls(cand_nodes[i])"""
+    is_share, link_share, type_share, origin_id = False, None, None, None
+    share_meta = {}
 
     # gom URL + meta trong attachments
     att_urls = []
-    for node in cand_nodes:
-        u, meta = _dig_attachment_urls(node)
+    for u, meta in dug:
         att_urls.extend(u)
         share_meta.update({k:v for k,v in meta.items() if v})
 
@@ -445,38 +468,60 @@ def _extract_url_digits(url: str) -> Optional[str]:
             return v[0]
     return None
 
-def _dig_text(o):
-    texts = []
-    def take(x):
+_SKIP_TEXTS = {"see more", "xem thêm"}
+_TEXT_LABEL_KEYS = ("title", "subtitle", "headline", "label", "contextual_message")
+
+class _TextSink:
+    """Bước xử lý 1 dict của _dig_text, tách ra để visitor gọi được."""
+    __slots__ = ("texts",)
+
+    def __init__(self):
+        self.texts = []
+
+    def take(self, x):
         if isinstance(x, str):
             t = x.strip()
-            if t and t.lower() not in {"see more", "xem thêm"}:
-                texts.append(t)
+            if t and t.lower() not in _SKIP_TEXTS:
+                self.texts.append(t)
+
+    def visit(self, v: dict):
+        take = self.take
+        if "text" in v and isinstance(v["text"], str): take(v["text"])
+        if "message" in v and isinstance(v["message"], dict):
+            if isinstance(v["message"].get("text"), str): take(v["message"]["text"])
+        if "body" in v and isinstance(v["body"], dict):
+            if isinstance(v["body"].get("text"), str): take(v["body"]["text"])
+        if "savable_description" in v and isinstance(v["savable_description"], dict):
+            if isinstance(v["savable_description"].get("text"), str): take(v["savable_description"]["text"])
+        for k in _TEXT_LABEL_KEYS:
+            val = v.get(k)
+            if isinstance(val, dict) and isinstance(val.get("text"), str): take(val["text"])
+            elif isinstance(val, str): take(val)
+
+    def result(self):
+        uniq, seen = [], set()
+        for t in self.texts:
+            if t not in seen:
+                uniq.append(t); seen.add(t)
+        return uniq
+
+def _dig_text(o):
+    sink = _TextSink()
     def dive(v):
         if isinstance(v, dict):
-            if "text" in v and isinstance(v["text"], str): take(v["text"])
-            if "message" in v and isinstance(v["message"], dict):
-                if isinstance(v["message"].get("text"), str): take(v["message"]["text"])
-            if "body" in v and isinstance(v["body"], dict):
-                if isinstance(v["body"].get("text"), str): take(v["body"]["text"])
-            if "savable_description" in v and isinstance(v["savable_description"], dict):
-                if isinstance(v["savable_description"].get("text"), str): take(v["savable_description"]["text"])
-            for k in ("title", "subtitle", "headline", "label", "contextual_message"):
-                val = v.get(k)
-                if isinstance(val, dict) and isinstance(val.get("text"), str): take(val["text"])
-                elif isinstance(val, str): take(val)
+            sink.visit(v)
             for vv in v.values(): dive(vv)
         elif isinstance(v, list):
             for it in v: dive(it)
     dive(o)
-    uniq, seen = [], set()
-    for t in texts:
-        if t not in seen:
-            uniq.append(t); seen.add(t)
-    return uniq
+    return sink.result()
 
-def _extract_share_texts(n: dict):
-    actor_texts, attached_texts = [], []
+def _share_text_seeds(n: dict):
+    """
+    Phần rẻ của _extract_share_texts (chỉ đọc vài key top-level).
+    Trả về (actor_texts, attached_texts, story) – story là node cần _dig_text thêm (hoặc None).
+    """
+    actor_texts, attached_texts, story = [], [], None
     if isinstance(n.get("message"), dict) and isinstance(n["message"].get("text"), str):
         actor_texts.append(n["message"]["text"])
     cs = n.get("comet_sections") or {}
@@ -492,9 +537,11 @@ def _extract_share_texts(n: dict):
             if isinstance(story, dict):
                 if isinstance(story.get("message"), dict) and isinstance(story["message"].get("text"), str):
                     attached_texts.append(story["message"]["text"])
-                attached_texts.extend(_dig_text(story))
-    if not actor_texts:
-        actor_texts.extend(_dig_text(n))
+            if not story:
+                story = None
+    return actor_texts, attached_texts, story
+
+def _combine_share_texts(actor_texts, attached_texts):
     def _uniq_keep(seq):
         out, seen = [], set()
         for s in seq:
@@ -518,6 +565,14 @@ def _extract_share_texts(n: dict):
             attached_texts[0] if attached_texts else None,
             combined)
 
+def _extract_share_texts(n: dict):
+    actor_texts, attached_texts, story = _share_text_seeds(n)
+    if story is not None:
+        attached_texts.extend(_dig_text(story))
+    if not actor_texts:
+        actor_texts.extend(_dig_text(n))
+    return _combine_share_texts(actor_texts, attached_texts)
+
 def filter_only_feed_posts(items):
     keep = []
     for it in items or []:
@@ -533,86 +588,420 @@ def filter_only_feed_posts(items):
 # Post collectors (ưu tiên rid + link + created_time)
 # =========================
 
-def collect_post_summaries(obj, out, group_url):
+_IMAGE_KEYS = frozenset(("image", "previewImage", "photo_image", "preferred_thumbnail"))
+_PLAYABLE_KEYS = frozenset(("playable_url_quality_hd", "playable_url",
+                            "browser_native_hd_url", "browser_native_sd_url"))
+_COMMENT_INT_KEYS = frozenset(("total_comment_count", "comment_count", "commentsCount", "display_comments_count"))
+_CREATED_KEYS = frozenset(("creation_time", "created_time", "creationTime"))
+_GROUP_KEYS = frozenset(("group_id", "groupid", "groupidv2"))
+# Mọi key mà visitor cần xem giá trị (ngoài group id – so sánh lower-case – và list reaction kiểu cũ)
+_VISITOR_KEYS = (_IMAGE_KEYS | _PLAYABLE_KEYS | _COMMENT_INT_KEYS | _CREATED_KEYS | TIMESTAMP_KEYS | {
+    "videoDeliveryResponseFragment",
+    "share_count", "i18n_share_count", "sharecount", "resharesCount",
+    "comments_count_summary_renderer", "i18n_comment_count",
+    "top_reactions", "reaction_count",
+})
+_MISSING = object()
+
+
+class _PostFieldVisitor:
+    """
+    Gom các trường "nặng" của 1 story node trong MỘT lần duyệt cây:
+    media, counts, timestamps, group id, attachment URLs, share flags, text.
+
+    Kết quả giống hệt cách cũ (extract_media, extract_reactions_and_counts, deep_collect_timestamps,
+    deep_get_first, _dig_attachment_urls, _extract_share_texts, extract_share_flags_smart) –
+    mỗi "lượt" cũ có accumulator riêng, ghép lại theo đúng thứ tự cũ ở fields().
+    """
+    __slots__ = (
+        "node", "images", "image_seen", "videos", "reel_videos",
+        "share", "cmt_summary", "cmt_other", "breakdown", "found_breakdown", "total_any", "legacy_rx",
+        "ts_max", "created_first", "group_id",
+        "urls", "actor_texts", "attached_texts", "story_texts", "root_texts", "cand_nodes", "cand_sinks",
+        "dict_sinks",
+    )
+
+    def __init__(self, node: dict, pending: dict):
+        self.node = node
+        self.images, self.image_seen = [], set()
+        self.videos, self.reel_videos = [], []
+        self.share = 0
+        self.cmt_summary = 0
+        self.cmt_other = 0
+        self.breakdown = {v: 0 for v in REACTION_KEYS.values()}
+        self.found_breakdown = False
+        self.total_any = 0
+        self.legacy_rx = {v: 0 for v in REACTION_KEYS.values()}
+        self.ts_max = None
+        self.created_first = _MISSING
+        self.group_id = _MISSING
+
+        # out_links: _dig_attachment_urls(node)[0]
+        self.urls = _AttachmentSink(with_meta=False)
+        dict_sinks = [self.urls]
+
+        # text: phần top-level tính luôn, phần cần đào sâu thì đăng ký sink theo id(node con)
+        self.actor_texts, self.attached_texts, story = _share_text_seeds(node)
+        self.story_texts = self.root_texts = None
+        if story is not None:
+            self.story_texts = _TextSink()
+            pending.setdefault(id(story), []).append(self.story_texts)
+        if not self.actor_texts:
+            self.root_texts = _TextSink()
+            dict_sinks.append(self.root_texts)
+
+        # share flags: mỗi cand node 1 sink URL + meta
+        self.cand_nodes = _share_candidate_nodes(node)
+        self.cand_sinks = []
+        for cand in self.cand_nodes:
+            sink = _AttachmentSink()
+            self.cand_sinks.append(sink)
+            pending.setdefault(id(cand), []).append(sink)
+
+        self.dict_sinks = tuple(dict_sinks)
+
+    def item(self, k, v):
+        if k in _VISITOR_KEYS:
+            self._item_known(k, v)
+        elif isinstance(v, list):
+            self._legacy_reactions(v)
+        if self.group_id is _MISSING and k[:1] in "gG" and k and k.lower() in _GROUP_KEYS:
+            self.group_id = v
+
+    def _item_known(self, k, v):
+        # ---- media (extract_media)
+        if k in _IMAGE_KEYS:
+            if isinstance(v, dict):
+                uri = v.get("uri") or v.get("url")
+                if isinstance(uri, str) and uri.startswith("http"):
+                    if uri not in self.image_seen:
+                        self.images.append(uri); self.image_seen.add(uri)
+        elif k in _PLAYABLE_KEYS:
+            if isinstance(v, str) and v.startswith("http"):
+                self.videos.append(v)
+        elif k == "videoDeliveryResponseFragment" and isinstance(v, dict):
+            res = v.get("videoDeliveryResponseResult") or {}
+            prog_list = res.get("progressive_urls") or []
+            for it in prog_list:
+                url = it.get("progressive_url")
+                if isinstance(url, str) and url.startswith("http"):
+                    self.reel_videos.append(url)
+
+        # ---- share
+        elif k == "share_count":
+            if isinstance(v, dict):
+                c = v.get("count")
+                if isinstance(c, int):
+                    self.share = max(self.share, c)
+        elif k == "i18n_share_count":
+            try:
+                s = str(v).replace(".", "").replace(",", "")
+                c = int(s)
+                self.share = max(self.share, c)
+            except:
+                pass
+        elif k in ("sharecount", "resharesCount"):
+            if isinstance(v, int):
+                self.share = max(self.share, v)
+
+        # ---- comment
+        elif k == "comments_count_summary_renderer":
+            if isinstance(v, dict):
+                fb = v.get("feedback") or {}
+                cri = fb.get("comment_rendering_instance") or {}
+                comments = cri.get("comments") or {}
+                tc = comments.get("total_count")
+                if isinstance(tc, int):
+                    self.cmt_summary = max(self.cmt_summary, tc)
+                tlc = cri.get("top_level_comments") or {}
+                tc2 = tlc.get("count")
+                if isinstance(tc2, int):
+                    self.cmt_summary = max(self.cmt_summary, tc2)
+        elif k == "i18n_comment_count":
+            try:
+                c = int(str(v).replace(".", "").replace(",", ""))
+                self.cmt_other = max(self.cmt_other, c)
+            except:
+                pass
+
+        # ---- reactions
+        elif k == "top_reactions":
+            if isinstance(v, dict):
+                self._top_reactions(v)
+        elif k == "reaction_count":
+            if isinstance(v, dict):
+                c = v.get("count")
+                if isinstance(c, int):
+                    self.total_any = max(self.total_any, c)
+
+        if k in _COMMENT_INT_KEYS:
+            if isinstance(v, int):
+                self.cmt_other = max(self.cmt_other, v)
+            if k == "comment_count" and isinstance(v, dict):
+                c = v.get("count")
+                if isinstance(c, int):
+                    self.cmt_other = max(self.cmt_other, c)
+
+        # ---- timestamps
+        if k in TIMESTAMP_KEYS:
+            vv = as_epoch_s(v)
+            if vv and (self.ts_max is None or vv > self.ts_max):
+                self.ts_max = vv
+            if self.created_first is _MISSING and k in _CREATED_KEYS and isinstance(v, (int, float, str)):
+                self.created_first = v
+
+        if isinstance(v, list):
+            self._legacy_reactions(v)
+
+    def _top_reactions(self, v: dict):
+        edges = v.get("edges") or []
+        for e in edges:
+            if not isinstance(e, dict):
+                continue
+            node = (e.get("node") or {})
+            rid  = node.get("id")
+            rname= node.get("localized_name")
+            rkey = None
+            if isinstance(rid, str) and rid in REACTION_ID_MAP:
+                rkey = REACTION_ID_MAP[rid]
+            if not rkey and rname:
+                rkey = _norm_reaction_name(rname)
+            rc = e.get("reaction_count")
+            if rkey in REACTION_KEYS.values() and isinstance(rc, int):
+                self.breakdown[rkey] = max(self.breakdown[rkey], rc)
+                self.found_breakdown = True
+
+    def _legacy_reactions(self, v: list):
+        if v and isinstance(v[0], dict) and (
+            ("reactionType" in v[0] and "count" in v[0]) or
+            ("key" in v[0] and "total_count" in v[0])
+        ):
+            for it in v:
+                rtype = (it.get("reactionType") or it.get("key") or "")
+                cnt = it.get("count") if "count" in it else it.get("total_count")
+                if isinstance(rtype, str):
+                    rtype = rtype.upper()
+                if rtype in REACTION_KEYS and isinstance(cnt, int):
+                    key = REACTION_KEYS[rtype]
+                    self.legacy_rx[key] = max(self.legacy_rx[key], cnt)
+
+    def fields(self) -> dict:
+        n = self.node
+
+        # media: video kiểu cũ trước, reel sau (giữ thứ tự extract_media)
+        video_urls, seen = [], set()
+        for u in self.videos + self.reel_videos:
+            if u not in seen:
+                video_urls.append(u); seen.add(u)
+
+        # counts: ghép theo đúng thứ tự các lượt trong extract_reactions_and_counts
+        counts = dict(self.breakdown)
+        counts.update({"comment": 0, "share": self.share})
+        counts["comment"] = max(counts["comment"], max(self.cmt_summary, self.cmt_other))
+        if self.total_any and not self.found_breakdown:
+            counts["like"] = max(counts["like"], self.total_any)
+        for key, c in self.legacy_rx.items():
+            counts[key] = max(counts[key], c)
+
+        if self.ts_max is not None:
+            created = self.ts_max
+        else:
+            t = n.get("creation_time") or n.get("created_time") or n.get("creationTime")
+            if not t and self.created_first is not _MISSING:
+                t = self.created_first
+            try:
+                created = int(t)
+            except:
+                created = t
+
+        attached_texts = self.attached_texts
+        if self.story_texts is not None:
+            attached_texts = attached_texts + self.story_texts.result()
+        actor_texts = self.actor_texts
+        if self.root_texts is not None:
+            actor_texts = actor_texts + self.root_texts.result()
+        texts = _combine_share_texts(actor_texts, attached_texts)
+
+        return {
+            "texts": texts,
+            "media": (self.images, video_urls),
+            "counts": counts,
+            "share_sources": (self.cand_nodes, [(sink.urls, sink.meta) for sink in self.cand_sinks]),
+            "created": created,
+            "attachment_urls": self.urls.urls,
+            "group_id": None if self.group_id is _MISSING else self.group_id,
+        }
+
+
+def _multipass_post_fields(obj: dict) -> dict:
+    """Cách cũ: mỗi trường tự duyệt lại node. Giữ làm chuẩn đối chiếu cho bench."""
+    created_candidates = deep_collect_timestamps(obj)
+    _k, _v = deep_get_first(obj, {"group_id", "groupID", "groupIDV2"})
+    cand_nodes = _share_candidate_nodes(obj)
+    return {
+        "texts": _extract_share_texts(obj),
+        "media": extract_media(obj),
+        "counts": extract_reactions_and_counts(obj),
+        "share_sources": (cand_nodes, [_dig_attachment_urls(node) for node in cand_nodes]),
+        "created": max(created_candidates) if created_candidates else extract_created_time(obj),
+        "attachment_urls": _dig_attachment_urls(obj)[0],
+        "group_id": _v,
+    }
+
+
+def _build_post_item(obj: dict, group_url: str, fields: dict) -> dict:
+    post_id_api = obj.get("post_id")
+    fb_id      = obj.get("id")
+    url        = obj.get("wwwURL") or obj.get("url")
+    url_digits = _extract_url_digits(url)
+    rid        = post_id_api or url_digits or fb_id
+    author_id, author_name, author_link, avatar, type_label = extract_author(obj)
+
+    actor_text, attached_text, text_combined = fields["texts"]
+    image_urls, video_urls = fields["media"]
+    counts = fields["counts"]
+    smart_is_share, smart_link, smart_type, origin_id, share_meta = _share_flags_from(*fields["share_sources"], actor_text or text_combined)
+    created = fields["created"]
+
+    hashtags = extract_hashtags(text_combined)
+    out_links = list(dict.fromkeys(_all_urls_from_text(text_combined or "") + fields["attachment_urls"]))
+    out_domains = []
+    for u in out_links:
+        try:
+            host = urlparse(u).netloc.lower().split(":")[0]
+            if host: out_domains.append(host)
+        except: pass
+    out_domains = list(dict.fromkeys(out_domains))
+    source_id = None
+    _v = fields["group_id"]
+    if _v: source_id = _v
+    if not source_id:
+        try:
+            slug = re.search(r"/groups/([^/?#]+)", group_url).group(1)
+            source_id = slug
+        except:
+            pass
+
+    item = {
+        "id": fb_id,
+        "rid": rid,
+        "type": type_label,
+        "link": url,
+        "author_id": author_id,
+        "author": author_name,
+        "author_link": author_link,
+        "avatar": avatar,
+        "created_time": created,
+        "content": text_combined,
+        "image_url": image_urls,
+        "like": counts["like"],
+        "comment": counts["comment"],
+        "haha": counts["haha"],
+        "wow": counts["wow"],
+        "sad": counts["sad"],
+        "love": counts["love"],
+        "angry": counts["angry"],
+        "care": counts["care"],
+        "share": counts["share"],
+        "hashtag": hashtags,
+        "video": video_urls,
+        "source_id": source_id,
+        "is_share": smart_is_share,
+        "link_share": smart_link,
+        "type_share": smart_type,
+        "origin_id": origin_id,
+        "out_links": out_links,
+        "out_domains": out_domains,
+    }
+    if share_meta:
+        item["share_meta"] = share_meta
+    if smart_is_share:
+        item["content_parts"] = {
+            "actor_text": actor_text,
+            "attached_text": attached_text
+        }
+    return item
+
+
+def _node_identity_keys(obj: dict) -> List[str]:
+    """Join key của story node (id / rid / link) – tính như _build_post_item nhưng không extract gì thêm."""
+    url = obj.get("wwwURL") or obj.get("url")
+    fb_id = obj.get("id")
+    rid = obj.get("post_id") or _extract_url_digits(url) or fb_id
+    return _all_join_keys({"id": fb_id, "rid": rid, "link": url})
+
+
+class KnownPosts:
+    """
+    Identity pass chạy trước extract: story node mà mọi join key đều đã nằm trong `keys` (post
+    đã ghi) thì không mở visitor, không build item – vẫn duyệt xuống dưới để bắt story lồng bên
+    trong. Node có thêm key mới (permalink / id khác của post đã ghi) vẫn extract để writer gộp
+    key đó vào index; bỏ qua thì fragment sau chỉ mang key đó sẽ bị ghi thành post mới.
+
+    keys: container hỗ trợ `in` – set key (worker tự nhớ qua remember()) hoặc PostIndex của phiên.
+    """
+
+    def __init__(self, keys=None):
+        self.keys = keys if keys is not None else set()
+        self.checked = 0
+        self.skipped = 0
+
+    def seen(self, obj: dict) -> bool:
+        self.checked += 1
+        keys = _node_identity_keys(obj)
+        if keys and all(k in self.keys for k in keys):
+            self.skipped += 1
+            return True
+        return False
+
+    def remember(self, items: List[dict]) -> None:
+        """Nhớ key của các post có id vừa trả về (writer chắc chắn gộp chúng vào nhóm đã ghi)."""
+        for it in items:
+            if it.get("id") not in (None, ""):
+                self.keys.update(_all_join_keys(it))
+
+
+def _walk_posts(obj, out, group_url, visitors, dict_sinks, pending, known=None):
+    """
+    Duyệt payload đúng 1 lần. Mỗi story node gặp trên đường đi mở 1 _PostFieldVisitor;
+    mọi dict/item bên dưới được "phát" cho tất cả visitor đang mở (story lồng nhau vẫn đúng).
+    """
     if isinstance(obj, dict):
-        if _looks_like_group_post(obj):
-            post_id_api = obj.get("post_id")
-            fb_id      = obj.get("id")
-            url        = obj.get("wwwURL") or obj.get("url")
-            url_digits = _extract_url_digits(url)
-            rid        = post_id_api or url_digits or fb_id
-            author_id, author_name, author_link, avatar, type_label = extract_author(obj)
-
-            actor_text, attached_text, text_combined = _extract_share_texts(obj)
-            image_urls, video_urls = extract_media(obj)
-            counts = extract_reactions_and_counts(obj)
-            smart_is_share, smart_link, smart_type, origin_id, share_meta = extract_share_flags_smart(obj, actor_text or text_combined)
-            created_candidates = deep_collect_timestamps(obj)
-            created = max(created_candidates) if created_candidates else extract_created_time(obj)
-
-            hashtags = extract_hashtags(text_combined)
-            out_links = list(dict.fromkeys(_all_urls_from_text(text_combined or "") + _dig_attachment_urls(obj)[0]))
-            out_domains = []
-            for u in out_links:
-                try:
-                    host = urlparse(u).netloc.lower().split(":")[0]
-                    if host: out_domains.append(host)
-                except: pass
-            out_domains = list(dict.fromkeys(out_domains))
-            source_id = None
-            _k, _v = deep_get_first(obj, {"group_id", "groupID", "groupIDV2"})
-            if _v: source_id = _v
-            if not source_id:
-                try:
-                    slug = re.search(r"/groups/([^/?#]+)", group_url).group(1)
-                    source_id = slug
-                except:
-                    pass
-
-            item = {
-                "id": fb_id,
-                "rid": rid,
-                "type": type_label,
-                "link": url,
-                "author_id": author_id,
-                "author": author_name,
-                "author_link": author_link,
-                "avatar": avatar,
-                "created_time": created,
-                "content": text_combined,
-                "image_url": image_urls,
-                "like": counts["like"],
-                "comment": counts["comment"],
-                "haha": counts["haha"],
-                "wow": counts["wow"],
-                "sad": counts["sad"],
-                "love": counts["love"],
-                "angry": counts["angry"],
-                "care": counts["care"],
-                "share": counts["share"],
-                "hashtag": hashtags,
-                "video": video_urls,
-                "source_id": source_id,
-                "is_share": smart_is_share,
-                "link_share": smart_link,
-                "type_share": smart_type,
-                "origin_id": origin_id,
-                "out_links": out_links,
-                "out_domains": out_domains,
-            }
-            if share_meta:
-                item["share_meta"] = share_meta
-            if smart_is_share:
-                item["content_parts"] = {
-                    "actor_text": actor_text,
-                    "attached_text": attached_text
-                }
-            out.append(item)
-        for v in obj.values():
-            collect_post_summaries(v, out, group_url)
+        extra = pending.pop(id(obj), None) if pending else None
+        visitor = None
+        if _looks_like_group_post(obj) and not (known is not None and known.seen(obj)):
+            visitor = _PostFieldVisitor(obj, pending)
+            slot = len(out)
+            out.append(None)  # giữ chỗ: story cha đứng trước story con như cách cũ
+            visitors = visitors + (visitor,)
+            dict_sinks = dict_sinks + visitor.dict_sinks
+        if extra:
+            dict_sinks = dict_sinks + tuple(extra)
+        for sink in dict_sinks:
+            sink.visit(obj)
+        if visitors:
+            for k, v in obj.items():
+                for vis in visitors:
+                    vis.item(k, v)
+                if isinstance(v, (dict, list)):
+                    _walk_posts(v, out, group_url, visitors, dict_sinks, pending, known)
+        else:
+            for v in obj.values():
+                if isinstance(v, (dict, list)):
+                    _walk_posts(v, out, group_url, visitors, dict_sinks, pending, known)
+        if visitor is not None:
+            out[slot] = _build_post_item(obj, group_url, visitor.fields())
     elif isinstance(obj, list):
+        extra = pending.pop(id(obj), None) if pending else None
+        if extra:
+            dict_sinks = dict_sinks + tuple(extra)
         for v in obj:
-            collect_post_summaries(v, out, group_url)
+            if isinstance(v, (dict, list)):
+                _walk_posts(v, out, group_url, visitors, dict_sinks, pending, known)
+
+
+def collect_post_summaries(obj, out, group_url, known: Optional[KnownPosts] = None):
+    _walk_posts(obj, out, group_url, (), (), {}, known)
 
 # =========================
 # Dedupe/merge (rid + normalized link)
@@ -646,20 +1035,114 @@ def merge_two_posts(a: dict, b: dict) -> dict:
     except: m["created_time"] = ca or cb
     return m
 
-def coalesce_posts(items: List[dict]) -> List[dict]:
-    groups, key2group, seq = {}, {}, 0
-    def _new_gid():
-        nonlocal seq; seq += 1; return f"g{seq}"
-    for it in (items or []):
+_INDEX_FIELDS = ("id", "rid", "link", "created_time")
+
+
+class PostIndex:
+    """
+    Disjoint-set trên mọi join key (_all_join_keys) của post.
+
+    Item mới nối với MỌI nhóm có chung key (kể cả bắc cầu rid <-> link <-> id), mỗi lần add
+    gần như O(số key). Dùng 2 kiểu:
+      - trong 1 response: coalesce_posts (giữ full dict, thứ tự nhóm xuất hiện đầu tiên);
+      - cả phiên crawl (slim=True): chỉ giữ id/rid/link/created_time + cờ "đã ghi" để
+        fragment đến muộn gộp vào post đã ghi thay vì thành record mới.
+    """
+
+    def __init__(self, slim: bool = False):
+        self.slim = slim
+        self._parent: Dict[str, str] = {}
+        self._size: Dict[str, int] = {}
+        self._post: Dict[str, dict] = {}   # root -> post đã gộp
+        self._seq: Dict[str, int] = {}     # root -> thứ tự xuất hiện đầu tiên
+        self._emitted: Set[str] = set()    # root đã ghi ra output
+        self._n = 0
+        self.bridged = 0                   # số lần 1 item nối >= 2 nhóm cũ
+
+    def __len__(self) -> int:
+        return len(self._post)
+
+    def __contains__(self, key: str) -> bool:
+        """key thuộc 1 nhóm đã ghi ra output (dùng làm KnownPosts.keys)."""
+        return key in self._parent and self._find(key) in self._emitted
+
+    def _find(self, k: str) -> str:
+        parent = self._parent
+        while parent[k] != k:
+            parent[k] = parent[parent[k]]
+            k = parent[k]
+        return k
+
+    def _union(self, root: str, k: str) -> str:
+        if k not in self._parent:
+            self._parent[k] = root
+            self._size[root] += 1
+            return root
+        rk = self._find(k)
+        if rk == root:
+            return root
+        if self._size[rk] > self._size[root]:
+            root, rk = rk, root
+        self._parent[rk] = root
+        self._size[root] += self._size.pop(rk)
+        return root
+
+    def add(self, it: dict) -> Tuple[Optional[str], bool]:
+        """Gộp item vào index. Trả về (root, nhóm này đã ghi ra output trước đó chưa)."""
         keys = _all_join_keys(it)
-        gid = None
+        if not keys:
+            if self.slim:
+                return None, False
+            keys = [f"\0{self._n}"]  # item không key: nhóm riêng, không ai nối vào được
+
+        roots: List[str] = []
         for k in keys:
-            if k in key2group:
-                gid = key2group[k]; break
-        if gid is None:
-            gid = _new_gid(); groups[gid] = it
-        else:
-            groups[gid] = merge_two_posts(groups[gid], it)
-        for k in _all_join_keys(groups[gid]):
-            key2group[k] = gid
-    return list(groups.values())
\ No newline at end of file
+            if k in self._parent:
+                r = self._find(k)
+                if r not in roots:
+                    roots.append(r)
+        if len(roots) > 1:
+            self.bridged += 1
+
+        merged, emitted, seq = None, False, None
+        for r in roots:
+            prev = self._post.pop(r)
+            merged = merge_two_posts(merged, prev) if merged else prev
+            if r in self._emitted:
+                self._emitted.discard(r)
+                emitted = True
+            s = self._seq.pop(r)
+            seq = s if seq is None else min(seq, s)
+        if self.slim:
+            it = {f: it.get(f) for f in _INDEX_FIELDS}
+        merged = merge_two_posts(merged, it) if merged else it
+        if seq is None:
+            seq = self._n
+            self._n += 1
+
+        root = roots[0] if roots else keys[0]
+        if root not in self._parent:
+            self._parent[root] = root
+            self._size[root] = 1
+        for k in keys + [k for k in _all_join_keys(merged) if k not in keys]:
+            root = self._union(root, k)
+
+        self._post[root] = merged
+        self._seq[root] = seq
+        if emitted:
+            self._emitted.add(root)
+        return root, emitted
+
+    def mark_emitted(self, root: Optional[str]) -> None:
+        if root is not None:
+            self._emitted.add(self._find(root))
+
+    def posts(self) -> List[dict]:
+        return [self._post[r] for r in sorted(self._post, key=self._seq.__getitem__)]
+
+
+def coalesce_posts(items: List[dict]) -> List[dict]:
+    index = PostIndex()
+    for it in (items or []):
+        index.add(it)
+    return index.posts()
@@ -0,0 +1,130 @@
+# post/v3/graphql/schemas.py
+"""
+Đường đi "biết trước" tới story node cho các query feed quen thuộc.
+
+Mỗi record capture có body dạng form (fb_api_req_friendly_name=...&doc_id=...&variables=...).
+Nếu friendly name (hoặc doc_id đã gặp) khớp 1 schema ở FEED_SCHEMAS thì chỉ duyệt các
+edges[] của feed, bỏ qua phần còn lại của payload; không khớp thì quét toàn bộ như cũ.
+"""
+import re
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+from util.graphql_filters import query_key
+
+from .extractors import collect_post_summaries
+
+# (regex friendly name, path tới list edges)
+FEED_SCHEMAS = (
+    (r"^(?:GroupsCometFeedRegularStoriesPaginationQuery|CometGroupDiscussionRootSuccessQuery)$",
+     ("data", "node", "group_feed", "edges")),
+    (r"^ProfileCometTimelineFeed(?:Refetch)?Query$",
+     ("data", "node", "timeline_list_feed_units", "edges")),
+    (r"^CometNewsFeedPaginationQuery$",
+     ("data", "viewer", "news_feed", "edges")),
+)
+_COMPILED = tuple((re.compile(p), path) for p, path in FEED_SCHEMAS)
+
+_PATH_BY_NAME: Dict[str, Optional[Tuple[str, ...]]] = {}
+_PATH_BY_DOC_ID: Dict[str, Tuple[str, ...]] = {}
+
+
+class FeedPathStats:
+    """Thống kê fast-path của 1 phiên crawl (ParseStage), không dùng chung giữa các tab / URL."""
+
+    def __init__(self):
+        self.counts = Counter()  # hit / miss / fallback
+        self.misses = Counter()  # friendly name -> số lần phải quét toàn bộ
+
+    def update(self, counts, misses) -> None:
+        self.counts.update(counts)
+        self.misses.update(misses)
+
+    def summary(self) -> str:
+        hit = self.counts["hit"]
+        total = hit + self.counts["miss"] + self.counts["fallback"]
+        rate = (100.0 * hit / total) if total else 0.0
+        top = ", ".join(f"{k}={v}" for k, v in self.misses.most_common(5))
+        return (f"hit={hit} miss={self.counts['miss']} fallback={self.counts['fallback']} "
+                f"({rate:.0f}% hit) | top miss: {top or '-'}")
+
+
+def request_query_key(rec: dict) -> Tuple[Optional[str], Optional[str]]:
+    """(fb_api_req_friendly_name, doc_id) lấy từ body của request đã capture."""
+    return query_key(rec.get("body") or "")
+
+
+def _path_for(friendly: Optional[str], doc_id: Optional[str]) -> Optional[Tuple[str, ...]]:
+    if friendly:
+        if friendly not in _PATH_BY_NAME:
+            _PATH_BY_NAME[friendly] = next((path for rx, path in _COMPILED if rx.match(friendly)), None)
+        return _PATH_BY_NAME[friendly]
+    if doc_id:
+        return _PATH_BY_DOC_ID.get(doc_id)
+    return None
+
+
+def _resolve_edges(payload, path):
+    cur = payload
+    for k in path:
+        if not isinstance(cur, dict):
+            return None
+        cur = cur.get(k)
+    return cur if isinstance(cur, list) and cur else None
+
+
+def collect_feed_post_summaries(payload, out, group_url, friendly: Optional[str] = None, doc_id: Optional[str] = None,
+                                known=None, stats: Optional[FeedPathStats] = None):
+    """
+    Như collect_post_summaries nhưng nhảy thẳng tới edges[] khi query là feed đã biết.
+    Mỗi edge vẫn đi qua collect_post_summaries (bắt được cả story lồng bên trong).
+    `stats`: FeedPathStats để đếm hit / miss / fallback (None = không đếm).
+    """
+    path = _path_for(friendly, doc_id)
+    edges = _resolve_edges(payload, path) if path else None
+    if edges is not None:
+        if stats is not None:
+            stats.counts["hit"] += 1
+        if doc_id:
+            _PATH_BY_DOC_ID[doc_id] = path
+        for edge in edges:
+            collect_post_summaries(edge, out, group_url, known)
+        return
+
+    if stats is not None:
+        stats.counts["fallback" if path else "miss"] += 1
+        stats.misses[friendly or doc_id or "?"] += 1
+    collect_post_summaries(payload, out, group_url, known)
+
+
+def feed_connection_path(friendly: Optional[str], doc_id: Optional[str] = None) -> Optional[Tuple[str, ...]]:
+    """Path tới connection feed (object chứa edges[] + page_info), None nếu không phải feed đã biết."""
+    path = _path_for(friendly, doc_id)
+    return path[:-1] if path else None
+
+
+def feed_page_info(chunks, friendly: Optional[str] = None, doc_id: Optional[str] = None
+                   ) -> Optional[Tuple[Optional[bool], Optional[str]]]:
+    """
+    (has_next_page, end_cursor) của connection feed trong response, None nếu không phải feed
+    đã biết hoặc không thấy page_info. Tìm ở cạnh edges[] trong object chính, và ở chunk
+    $defer/$stream có path trỏ tới connection đó (FB gửi page_info sau cùng).
+    """
+    conn = feed_connection_path(friendly, doc_id)
+    if not conn:
+        return None
+    found = None
+    for obj in chunks or ():
+        if not isinstance(obj, dict):
+            continue
+        cur = obj
+        for k in conn:
+            cur = cur.get(k) if isinstance(cur, dict) else None
+        pi = cur.get("page_info") if isinstance(cur, dict) else None
+        if not isinstance(pi, dict) and isinstance(obj.get("path"), list) and conn[-1] in obj["path"]:
+            pi = (obj.get("data") or {}).get("page_info") if isinstance(obj.get("data"), dict) else None
+        if isinstance(pi, dict):
+            hn = pi.get("has_next_page", pi.get("hasNextPage"))
+            found = (hn if isinstance(hn, bool) else None, pi.get("end_cursor") or pi.get("endCursor"))
+    return found
+
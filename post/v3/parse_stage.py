@@ -0,0 +1,302 @@
+# post/v3/parse_stage.py
+"""
+Tách parse/extract ra khỏi vòng scroll.
+
+    scroll loop --submit(rec)--> [process pool: extract_page] --> writer thread
+                                                                        (dedup seen_ids,
+                                                                         min/max created_time,
+                                                                         append NDJSON)
+
+- Writer ghi theo đúng thứ tự submit nên output giống hệt chạy inline.
+- Hàng đợi có giới hạn (max_pending): extractor chậm thì submit() block -> scroll tự chậm lại,
+  RAM không phình.
+- workers=0: xử lý ngay trong submit() (hành vi cũ, dùng để debug / so sánh).
+- Response trùng hệt response đã ghi xong (graphql.cache) bị bỏ qua ngay trong submit(); fingerprint
+  chỉ được đánh dấu sau khi ghi thành công.
+- Writer dedup bằng PostIndex (union-find trên mọi join key) sống suốt stage, nên post bị
+  tách ở 2 response khác nhau vẫn chỉ ghi 1 lần.
+- Đếm record / post mới theo friendly name (learn_summary) để chỉnh allow-list của hook.
+- Dedup-before-extract (KnownPosts): story node đã ghi (mọi join key đều đã biết) bị bỏ qua
+  trước khi extract. Inline thì hỏi thẳng PostIndex; mỗi worker tự nhớ key các post nó đã trả về.
+  Ghi lỗi thì trí nhớ đó không còn là tập con của index: stage tăng thế hệ known, worker quên hết
+  ở job sau, kết quả job cũ có node bị bỏ qua thì parse lại inline.
+- Cursor feed: page_info (has_next_page / end_cursor) của response feed được writer ghi nhận
+  theo thứ tự submit -> feed_has_next / feed_cursor là trạng thái mới nhất của phiên scroll.
+- archive (storage.archive.RawArchive): mọi record submit vào đều được archive trước khi dedup,
+  ghi ở thread riêng của archive.
+- shared (SharedDedup): nhiều stage (mỗi tab / cửa sổ thời gian 1 stage) dùng chung 1 PostIndex +
+  seen_ids, ghi cùng 1 file dưới 1 lock. Cursor feed, cache, min/max created_time (created) vẫn
+  là của riêng từng stage.
+"""
+import multiprocessing
+import queue
+import signal
+import threading
+from collections import Counter
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Any, Dict, Optional, Set
+
+from logs.loging_config import logger
+from util.graphql_filters import drop_key, format_counts
+from .graphql import schemas
+from .graphql.cache import ResponseCache
+from .graphql.extractors import KnownPosts, PostIndex
+from .pipeline import CreatedRange, extract_page, write_fresh_posts
+
+_STOP = object()
+
+_WORKER_KNOWN: Optional[KnownPosts] = None
+_WORKER_GEN = 0
+
+
+def _init_worker():
+    global _WORKER_KNOWN
+    # Ctrl+C chỉ để process chính xử lý (set_stop_flag rồi drain), worker không tự chết giữa chừng
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _WORKER_KNOWN = KnownPosts()
+
+
+def _extract_job(rec: Dict[str, Any], group_url: str, gen: int = 0):
+    """
+    Chạy trong worker. Trả kèm thống kê fast-path / identity pass của riêng record này để process chính cộng dồn.
+    gen: thế hệ known của stage; đổi (writer vừa ghi lỗi) thì quên hết key đã nhớ.
+    """
+    global _WORKER_KNOWN, _WORKER_GEN
+    if gen > _WORKER_GEN and _WORKER_KNOWN is not None:
+        _WORKER_KNOWN = KnownPosts()
+        _WORKER_GEN = gen
+    stats = schemas.FeedPathStats()
+    known = _WORKER_KNOWN
+    checked, skipped = (known.checked, known.skipped) if known is not None else (0, 0)
+    posts, page_info = extract_page(rec, group_url, known, stats)
+    if known is not None:
+        known.remember(posts)
+        checked, skipped = known.checked - checked, known.skipped - skipped
+    return posts, dict(stats.counts), dict(stats.misses), (checked, skipped), page_info
+
+
+class SharedDedup:
+    """PostIndex + seen_ids + lock dùng chung cho nhiều ParseStage cùng ghi 1 file output."""
+
+    def __init__(self, seen_ids: Optional[Set[str]] = None):
+        self.index = PostIndex(slim=True)
+        self.seen_ids = seen_ids if seen_ids is not None else set()
+        self.lock = threading.Lock()
+
+
+class ParseStage:
+    def __init__(
+        self,
+        group_url: str,
+        seen_ids: Set[str],
+        out_path: Path,
+        workers: int = 2,
+        max_pending: int = 64,
+        cache_size: int = 512,
+        learn: bool = False,
+        archive=None,
+        shared: Optional[SharedDedup] = None,
+        floor_ts: Optional[int] = None,
+    ):
+        self.group_url = group_url
+        self.seen_ids = shared.seen_ids if shared is not None else seen_ids
+        self.out_path = out_path
+        self.workers = max(0, int(workers or 0))
+        self.written = 0
+        self.submitted = 0
+        self.failed = 0
+        self._broken = False
+        self.cache = ResponseCache(cache_size)
+        self.shared = shared
+        self.index = shared.index if shared is not None else PostIndex(slim=True)
+        # chỉ dùng khi parse inline. Index dùng chung thì tự nhớ như worker: post tab khác đã ghi vẫn
+        # phải extract để stage thấy created_time (biên cửa sổ), index vẫn chặn ghi trùng
+        self.known = KnownPosts(self.index) if shared is None else KnownPosts()
+        self.created = CreatedRange(floor_ts)
+        self._known_gen = 0  # tăng khi ghi lỗi: key worker đã nhớ không còn là tập con của index
+        self._write_lock = shared.lock if shared is not None else nullcontext()
+        self.nodes_checked = 0
+        self.nodes_skipped = 0
+        self.learn = learn
+        self.archive = archive
+        self.feed_has_next: Optional[bool] = None
+        self.feed_cursor: Optional[str] = None
+        self.feed_pages = 0
+        self.recs_by_name = Counter()
+        self.posts_by_name = Counter()
+        self.feed_path = schemas.FeedPathStats()
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._queue: Optional[queue.Queue] = None
+        self._writer: Optional[threading.Thread] = None
+        if self.workers:
+            # spawn: không fork process đang giữ thread của selenium / timer
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+            self._queue = queue.Queue(maxsize=max(1, int(max_pending)))
+            self._writer = threading.Thread(target=self._write_loop, name="gql-writer", daemon=True)
+            self._writer.start()
+            logger.info("[PARSE] Off-thread parse: %d workers, max_pending=%d", self.workers, max_pending)
+
+    def submit(self, rec: Dict[str, Any], log_prefix: str = "") -> None:
+        if not rec or not rec.get("responseText"):
+            return
+        if self.archive is not None:
+            self.archive.add(rec)
+        key = self.cache.key(rec)
+        if self.cache.seen(key, len(rec["responseText"])):
+            logger.debug("[PARSE%s] duplicate response, skip", log_prefix)
+            return
+        self.submitted += 1
+        friendly, doc_id = schemas.request_query_key(rec)
+        name = drop_key(friendly, doc_id) if (friendly or doc_id) else "?"
+        self.recs_by_name[name] += 1
+        if self._pool is None:
+            posts, page_info = self._extract_inline(rec)
+            self._note_page_info(page_info)
+            try:
+                self._write(posts, log_prefix, name)
+            except Exception:
+                self._forget_known()
+                raise
+            self.cache.mark(key)
+            return
+        gen = self._known_gen
+        try:
+            fut = self._pool.submit(_extract_job, rec, self.group_url, gen)
+        except BrokenProcessPool as e:
+            # worker chết (OOM, bị kill...) -> parse ngay tại đây, vẫn xếp hàng để giữ thứ tự ghi
+            self._note_broken(e)
+            fut = Future()
+            fut.set_result(self._extract_fallback(rec))
+        self._queue.put((fut, rec, gen, key, log_prefix, name))  # block khi đầy -> backpressure lên scroll loop
+
+    def _note_broken(self, e: Exception) -> None:
+        if not self._broken:
+            logger.warning("[PARSE] Process pool hỏng (%s), chuyển sang parse inline.", e)
+            self._broken = True
+
+    def _extract_fallback(self, rec: Dict[str, Any]):
+        """Parse inline khi pool hỏng, trả về cùng dạng kết quả với _extract_job."""
+        posts, page_info = extract_page(rec, self.group_url, stats=self.feed_path)
+        return posts, {}, {}, (0, 0), page_info
+
+    def _forget_known(self) -> None:
+        """Ghi lỗi: post đã nhớ (known.remember) chưa thực sự được ghi -> bỏ trí nhớ của worker / inline."""
+        self._known_gen += 1
+        if self.shared is not None:
+            self.known = KnownPosts()
+
+    def _extract_inline(self, rec: Dict[str, Any]):
+        checked, skipped = self.known.checked, self.known.skipped
+        posts, page_info = extract_page(rec, self.group_url, self.known, self.feed_path)
+        if self.shared is not None:
+            self.known.remember(posts)
+        self.nodes_checked += self.known.checked - checked
+        self.nodes_skipped += self.known.skipped - skipped
+        return posts, page_info
+
+    def _note_page_info(self, page_info) -> None:
+        if page_info is None:
+            return
+        has_next, cursor = page_info
+        self.feed_pages += 1
+        if has_next is not None:
+            self.feed_has_next = has_next
+        if cursor:
+            self.feed_cursor = cursor
+
+    def reset_feed(self) -> None:
+        """Gọi khi bắt đầu 1 lượt scroll mới (load lại page / go_to_date): cursor cũ không còn đúng."""
+        self.feed_has_next = None
+        self.feed_cursor = None
+        self.feed_pages = 0
+
+    def extract_summary(self) -> str:
+        rate = (100.0 * self.nodes_skipped / self.nodes_checked) if self.nodes_checked else 0.0
+        return f"story nodes={self.nodes_checked} skipped before extract={self.nodes_skipped} ({rate:.0f}%)"
+
+    def learn_summary(self) -> str:
+        """Friendly name nào ra post mới, cái nào chỉ tốn công (gợi ý cho allow-list)."""
+        producing = {k: self.posts_by_name[k] for k in self.recs_by_name if self.posts_by_name[k]}
+        idle = {k: v for k, v in self.recs_by_name.items() if not self.posts_by_name[k]}
+        return f"producing posts: {format_counts(producing, 20)} | no posts (recs): {format_counts(idle, 20)}"
+
+    def pending(self) -> int:
+        return self._queue.unfinished_tasks if self._queue is not None else 0
+
+    def join(self) -> None:
+        """Chờ mọi record đã submit được ghi xong (dùng trước khi đọc seen_ids / created)."""
+        if self._queue is not None:
+            self._queue.join()
+
+    def close(self) -> None:
+        """Drain nốt hàng đợi rồi tắt pool. Gọi nhiều lần không sao."""
+        if self._pool is None:
+            return
+        self._queue.put((_STOP, None, 0, None, "", ""))
+        self._writer.join()
+        self._pool.shutdown(wait=True)
+        self._pool = None
+        logger.info(
+            "[PARSE] Closed: submitted=%d written=%d failed=%d | index posts=%d bridged=%d | %s | cache %s",
+            self.submitted, self.written, self.failed, len(self.index), self.index.bridged,
+            self.extract_summary(), self.cache.summary(),
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def _write(self, posts, log_prefix: str, name: str) -> None:
+        self.created.note_below(posts)
+        with self._write_lock:
+            n = write_fresh_posts(posts, self.seen_ids, self.out_path, log_prefix,
+                                  index=self.index, created=self.created)
+        self.written += n
+        self.posts_by_name[name] += n
+
+    def _write_loop(self) -> None:
+        while True:
+            fut, rec, gen, key, log_prefix, name = self._queue.get()
+            try:
+                if fut is _STOP:
+                    return
+                try:
+                    try:
+                        res = fut.result()
+                    except BrokenProcessPool as e:
+                        # record đã xếp hàng trước khi pool hỏng: parse lại inline, không bỏ mất
+                        self._note_broken(e)
+                        res = self._extract_fallback(rec)
+                    if gen != self._known_gen and res[3][1]:
+                        # worker đã bỏ qua node theo trí nhớ cũ (trước lần ghi lỗi) -> parse lại, để index dedup
+                        res = self._extract_fallback(rec)
+                    posts, stats, misses, (checked, skipped), page_info = res
+                except Exception as e:
+                    self.failed += 1
+                    logger.warning("[PARSE%s] extract failed: %s", log_prefix, e)
+                    continue
+                self.feed_path.update(stats, misses)
+                self.nodes_checked += checked
+                self.nodes_skipped += skipped
+                self._note_page_info(page_info)
+                try:
+                    self._write(posts, log_prefix, name)
+                except Exception as e:
+                    self.failed += 1
+                    logger.error("[PARSE%s] write failed: %s", log_prefix, e)
+                    self._forget_known()
+                    continue
+                self.cache.mark(key)
+            finally:
+                self._queue.task_done()
@@ -1,55 +1,115 @@
 # post/v3/pipeline.py
 from pathlib import Path
-from typing import Dict, Any, Set, List, Optional
+from typing import Dict, Any, Set, List, Optional, Tuple
 
 from logs.loging_config import logger
 from .graphql.parser import parse_fb_graphql_payload
 from .graphql.extractors import (
-    collect_post_summaries,
+    KnownPosts,
+    PostIndex,
     coalesce_posts,
     _best_primary_key,
 )
+from .graphql.schemas import FeedPathStats, collect_feed_post_summaries, feed_page_info, request_query_key
 from .storage.ndjson import append_ndjson
 
 
 LATEST_CREATED_TS: Optional[int] = None
 EARLIEST_CREATED_TS: Optional[int] = None  # NEW
 
-def process_single_gql_rec(
+
+class CreatedRange:
+    """
+    min/max created_time của các post đã ghi trong 1 phiên crawl (1 stage / 1 tab), thay cho
+    2 biến global ở trên khi nhiều phiên chạy song song trong cùng process.
+    floor: biên dưới (cửa sổ thời gian); `below` đếm số post extract được (kể cả post tab khác đã
+    ghi rồi) có created_time < floor.
+    """
+
+    __slots__ = ("earliest", "latest", "floor", "below")
+
+    def __init__(self, floor: Optional[int] = None):
+        self.earliest: Optional[int] = None
+        self.latest: Optional[int] = None
+        self.floor = floor
+        self.below = 0
+
+    def update(self, ts: int) -> None:
+        if self.latest is None or ts > self.latest:
+            self.latest = ts
+        if self.earliest is None or ts < self.earliest:
+            self.earliest = ts
+
+    def note_below(self, posts: List[Dict[str, Any]]) -> None:
+        if self.floor is None:
+            return
+        for p in posts:
+            ts = p.get("created_time")
+            if isinstance(ts, (int, float)) and ts < self.floor:
+                self.below += 1
+
+def extract_page(
     rec: Dict[str, Any],
     group_url: str,
-    seen_ids: Set[str],
-    out_path: Path,
-    log_prefix: str = "",
-) -> int:
-    global LATEST_CREATED_TS, EARLIEST_CREATED_TS  # UPDATED
-
+    known: Optional[KnownPosts] = None,
+    stats: Optional[FeedPathStats] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[Tuple[Optional[bool], Optional[str]]]]:
+    """
+    Parse + extract + coalesce 1 record. Không đụng state dùng chung nên chạy được ở process khác.
+    Có `known` thì story node đã ghi rồi bị bỏ qua trước khi extract (xem KnownPosts).
+    `stats`: nơi đếm fast-path (FeedPathStats của stage gọi).
+    Trả về (posts, page_info): page_info = (has_next_page, end_cursor) nếu là query feed đã biết.
+    """
     text = rec.get("responseText")
     if not text:
-        return 0
+        return [], None
 
-    payload = parse_fb_graphql_payload(text)
+    chunks: List[Any] = []
+    payload = parse_fb_graphql_payload(text, chunks)
     if payload is None:
-        logger.debug("[GQL%s] responseText parse fail (no JSON payload)", log_prefix)
-        return 0
+        return [], None
 
     raw_items: List[Dict[str, Any]] = []
+    friendly, doc_id = request_query_key(rec)
 
     if isinstance(payload, dict):
-        collect_post_summaries(payload, raw_items, group_url)
+        collect_feed_post_summaries(payload, raw_items, group_url, friendly, doc_id, known, stats)
     elif isinstance(payload, list):
         for obj in payload:
-            collect_post_summaries(obj, raw_items, group_url)
+            collect_feed_post_summaries(obj, raw_items, group_url, friendly, doc_id, known, stats)
 
+    page_info = feed_page_info(chunks or (payload if isinstance(payload, list) else [payload]), friendly, doc_id)
     if not raw_items:
-        logger.debug("[GQL%s] collect_post_summaries -> 0 items", log_prefix)
-        return 0
+        return [], page_info
+    return coalesce_posts(raw_items), page_info
+
 
-    logger.debug(
-        "[GQL%s] collect_post_summaries -> %d items", log_prefix, len(raw_items)
-    )
+def extract_page_posts(
+    rec: Dict[str, Any],
+    group_url: str,
+    known: Optional[KnownPosts] = None,
+) -> List[Dict[str, Any]]:
+    return extract_page(rec, group_url, known)[0]
+
+
+def write_fresh_posts(
+    page_posts: List[Dict[str, Any]],
+    seen_ids: Set[str],
+    out_path: Path,
+    log_prefix: str = "",
+    index: Optional[PostIndex] = None,
+    created: Optional[CreatedRange] = None,
+) -> int:
+    """
+    Dedup, cập nhật min/max created_time rồi append NDJSON. Chạy ở process chính.
+    `created`: CreatedRange của phiên gọi (cập nhật cùng lúc với 2 biến global).
+
+    Có `index` (PostIndex của cả phiên crawl) thì dedup theo mọi join key: fragment đến muộn
+    của post đã ghi (chỉ có link, hoặc id khác rid...) được gộp vào index, không ghi lại.
+    Không có thì dedup theo _best_primary_key trong seen_ids như cũ.
+    """
+    global LATEST_CREATED_TS, EARLIEST_CREATED_TS  # UPDATED
 
-    page_posts = coalesce_posts(raw_items)
     logger.debug("[GQL%s] coalesce_posts -> %d items", log_prefix, len(page_posts))
 
     if not page_posts:
@@ -57,14 +117,26 @@ def process_single_gql_rec(
 
     written_this_round: Set[str] = set()
     fresh: List[Dict[str, Any]] = []
+    already = 0
     for p in page_posts:
         pk = _best_primary_key(p)
-        if pk and (pk not in seen_ids) and (pk not in written_this_round):
+        if not pk:
+            continue
+        if index is not None:
+            root, emitted = index.add(p)
+            if emitted:
+                already += 1
+                continue
+            if p.get("id") in (None, ""):
+                continue  # append_ndjson cũng bỏ qua; giữ trong index chờ fragment có id
+            fresh.append(p)
+            index.mark_emitted(root)
+        elif (pk not in seen_ids) and (pk not in written_this_round):
             fresh.append(p)
             written_this_round.add(pk)
 
     if not fresh:
-        logger.debug("[GQL%s] no fresh posts after dedup", log_prefix)
+        logger.debug("[GQL%s] no fresh posts after dedup (merged into written=%d)", log_prefix, already)
         return 0
 
     # cập nhật min/max created_time
@@ -76,6 +148,8 @@ def process_single_gql_rec(
                 LATEST_CREATED_TS = ts_int
             if EARLIEST_CREATED_TS is None or ts_int < EARLIEST_CREATED_TS:
                 EARLIEST_CREATED_TS = ts_int
+            if created is not None:
+                created.update(ts_int)
 
     append_ndjson(fresh, out_path)
 
@@ -85,4 +159,15 @@ def process_single_gql_rec(
             seen_ids.add(pk)
 
     logger.info("[GQL%s] wrote %d fresh posts", log_prefix, len(fresh))
-    return len(fresh)
\ No newline at end of file
+    return len(fresh)
+
+
+def process_single_gql_rec(
+    rec: Dict[str, Any],
+    group_url: str,
+    seen_ids: Set[str],
+    out_path: Path,
+    log_prefix: str = "",
+) -> int:
+    page_posts = extract_page_posts(rec, group_url)
+    return write_fresh_posts(page_posts, seen_ids, out_path, log_prefix)
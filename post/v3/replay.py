@@ -0,0 +1,199 @@
+# post/v3/replay.py
+"""
+Replay offline: dựng lại output từ response GraphQL đã capture, không cần Selenium / MoreLogin.
+
+    python -m post.v3.replay posts    --input <raw_dump_posts/> --out posts_replay.ndjson [--group-url URL]
+    python -m post.v3.replay comments --input <raw_dump_comments/> --out comments_replay.ndjson
+
+Input: thư mục / segment archive (storage.archive, seg-*.zst) hoặc file *.ndjson mỗi dòng 1
+record có "responseText" (có thể truyền nhiều --input).
+
+posts   : extract_page_posts (parse + collect_post_summaries + coalesce) chạy ở process pool,
+          process chính ghi theo đúng thứ tự capture qua write_fresh_posts + PostIndex, cùng
+          cách dedup như lúc crawl.
+comments: extract_full_posts_from_resptext + extract_replies_from_depth_resp (comment/v3/extract.py),
+          dedup theo raw_comment_id rồi ghi 1 lần ở cuối (cùng dạng dòng với crawler comment).
+
+--out luôn được ghi mới (xoá file cũ nếu có). Record extract lỗi được bỏ qua và đếm (failed).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List
+from urllib.parse import urlencode
+
+from comment.v3.extract import extract_full_posts_from_resptext, extract_replies_from_depth_resp
+from logs.loging_config import logger
+
+from .graphql.extractors import PostIndex
+from .pipeline import extract_page_posts, write_fresh_posts
+from .storage.archive import iter_archive
+
+
+def _capture_record(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Record archive -> dạng record capture (dựng lại body để request_query_key đọc được)."""
+    if "body" in row:
+        return row
+    qs = [(k, row[f]) for k, f in (("fb_api_req_friendly_name", "name"), ("doc_id", "doc_id"),
+                                   ("variables", "variables")) if row.get(f)]
+    return {"url": row.get("url"), "body": urlencode(qs), "responseText": row.get("responseText"),
+            "ts": row.get("ts"), "source": row.get("source")}
+
+
+def iter_records(inputs: Iterable[Path]) -> Iterator[Dict[str, Any]]:
+    for path in inputs:
+        path = Path(path)
+        if path.suffix == ".ndjson":
+            with path.open(encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        rec = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if isinstance(rec, dict) and rec.get("responseText"):
+                        yield _capture_record(rec)
+        else:
+            for row in iter_archive(path):
+                if row.get("responseText"):
+                    yield _capture_record(row)
+
+
+def _ordered_map(fn: Callable, items: Iterable, workers: int, window: int) -> Iterator:
+    """
+    fn(item) cho từng item ở process pool, trả kết quả theo đúng thứ tự input. Chỉ giữ tối đa
+    `window` job đang chạy nên archive lớn không bị đọc hết vào RAM. workers=0 -> chạy tại chỗ.
+    """
+    if workers <= 0:
+        for it in items:
+            yield fn(it)
+        return
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        pending = deque()
+        for it in items:
+            pending.append(pool.submit(fn, it))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _post_job(args):
+    rec, group_url = args
+    size = len(rec.get("responseText") or "")
+    try:
+        return size, extract_page_posts(rec, group_url)
+    except Exception:
+        return size, None
+
+
+def _comment_job(rec):
+    text = rec.get("responseText")
+    if not isinstance(text, str) or not text:
+        return 0, [], []
+    try:
+        rows, end_cursor, _, _ = extract_full_posts_from_resptext(text)
+        replies, next_token = extract_replies_from_depth_resp(text)
+    except Exception:
+        return len(text), None, None
+    source = rec.get("source")
+    for r in rows or []:
+        r.setdefault("cursor", end_cursor)
+    for r in replies or []:
+        r.setdefault("cursor", next_token or end_cursor)
+    if source:
+        for r in (rows or []) + (replies or []):
+            r.setdefault("source", source)
+    return len(text), rows or [], replies or []
+
+
+def replay_posts(inputs: List[Path], out_path: Path, group_url: str = "", workers: int = 0) -> int:
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.unlink(missing_ok=True)
+    index = PostIndex(slim=True)
+    seen_ids = set()
+    recs = written = nbytes = failed = 0
+    t0 = time.perf_counter()
+    jobs = ((rec, group_url) for rec in iter_records(inputs))
+    for size, posts in _ordered_map(_post_job, jobs, workers, max(4, workers * 4)):
+        recs += 1
+        nbytes += size
+        if posts is None:
+            failed += 1
+            continue
+        written += write_fresh_posts(posts, seen_ids, out_path, f"#{recs}", index=index)
+    dt = time.perf_counter() - t0
+    logger.info("[REPLAY] posts: records=%d written=%d failed=%d index=%d bridged=%d | %.1fs %.1f MB/s -> %s",
+                recs, written, failed, len(index), index.bridged, dt,
+                nbytes / (1024 * 1024) / dt if dt else 0.0, out_path)
+    return written
+
+
+def replay_comments(inputs: List[Path], out_path: Path, workers: int = 0) -> int:
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    by_id: Dict[str, Dict[str, Any]] = {}
+    recs = nbytes = failed = 0
+    t0 = time.perf_counter()
+    for size, rows, replies in _ordered_map(_comment_job, iter_records(inputs), workers, max(4, workers * 4)):
+        recs += 1
+        nbytes += size
+        if rows is None:
+            failed += 1
+            continue
+        for row in rows + replies:
+            cid = row.get("raw_comment_id") or row.get("id")
+            if not cid:
+                continue
+            if cid not in by_id:
+                by_id[cid] = row
+            else:
+                by_id[cid].update({k: v for k, v in row.items() if v not in (None, "", [], {})})
+
+    with out_path.open("w", encoding="utf-8") as f:
+        for i, row in enumerate(by_id.values()):
+            obj = dict(row)
+            obj.setdefault("page", 0)
+            obj.setdefault("idx", i)
+            if "text" not in obj and "content" in obj:
+                obj["text"] = obj.get("content")
+            f.write(json.dumps(obj, ensure_ascii=False) + "\n")
+    dt = time.perf_counter() - t0
+    logger.info("[REPLAY] comments: records=%d unique=%d failed=%d | %.1fs %.1f MB/s -> %s",
+                recs, len(by_id), failed, dt, nbytes / (1024 * 1024) / dt if dt else 0.0, out_path)
+    return len(by_id)
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m post.v3.replay")
+    ap.add_argument("target", choices=["posts", "comments"])
+    ap.add_argument("--input", type=str, nargs="+", required=True,
+                    help="Thư mục archive (seg-*.zst), file segment hoặc file capture *.ndjson")
+    ap.add_argument("--out", type=str, required=True, help="File NDJSON output (ghi mới)")
+    ap.add_argument("--group-url", type=str, default="", help="URL group/page lúc crawl (dùng dựng link post)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                    help="Số process extract (0 = chạy tuần tự trong process chính)")
+    args = ap.parse_args(argv)
+
+    inputs = [Path(p) for p in args.input]
+    missing = [str(p) for p in inputs if not p.exists()]
+    if missing:
+        logger.error("[REPLAY] Không tìm thấy input: %s", ", ".join(missing))
+        return 1
+
+    if args.target == "posts":
+        replay_posts(inputs, Path(args.out), args.group_url, args.workers)
+    else:
+        replay_comments(inputs, Path(args.out), args.workers)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,388 @@
+# post/v3/scheduler.py
+"""
+Chạy 1 hàng đợi URL trên nhiều profile MoreLogin cùng lúc, mỗi profile 1 worker process.
+
+    python -m post.v3.scheduler posts    --profiles P1 P2 P3 --urls URL ... [option của post.v3.cli]
+    python -m post.v3.scheduler comments --profiles P1 P2 --input links.xlsx --page-name X
+
+- Worker = 1 process (spawn) giữ 1 profile + 1 driver suốt đời, nhận từng job qua inbox riêng.
+  Worker báo "ready" là được giao job kế tiếp -> job luôn đi tới worker đang rảnh.
+- Job lỗi (exception) -> đưa lại vào hàng đợi (tối đa --max-attempts lần), worker tiếp tục.
+- Worker chết (crash, driver/tab hỏng, bị kill) -> job đang chạy được đưa lại hàng đợi, profile đó
+  được mở lại worker mới (tối đa --max-restarts lần; quá thì bỏ profile, các profile khác chạy tiếp).
+- posts   : process_url của post.v3.cli (option còn lại trên dòng lệnh chuyển nguyên cho cli).
+- comments: crawl_comments_for_post như comment/v3/main_batch.py, output
+            <data-root>/comment/page/<page-name>/<link>.ndjson.
+Input: --urls và/hoặc --input (file .txt mỗi dòng 1 URL, hoặc .xlsx có cột 'link').
+Ctrl+C: không giao job mới, worker xong / dừng job đang chạy rồi đóng profile.
+"""
+import argparse
+import multiprocessing
+import queue
+import signal
+import sys
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from logs.loging_config import logger
+
+from .config import PROJECT_ROOT, env
+
+TARGETS = ("posts", "comments")
+
+
+# ---------------- worker (process con) ----------------
+
+def _posts_runner(profile_id: str, passthrough: List[str]):
+    from . import cli
+    from .browser.scroll import stop_requested
+    from .browser.tabs import tab_alive
+
+    ap = argparse.ArgumentParser()
+    cli.add_common_args(ap)
+    args = ap.parse_args(passthrough + ["--morelogin-profile-id", profile_id])
+    driver = cli.init_driver_and_login(args)
+    if not driver:
+        raise RuntimeError("không khởi tạo được driver")
+
+    def run(url: str) -> None:
+        cli.process_url(url, args, driver)
+        if stop_requested():
+            raise RuntimeError("bị dừng giữa chừng (SIGINT/SIGTERM)")
+
+    def alive() -> bool:
+        return tab_alive(driver) and not stop_requested()
+
+    def close() -> None:
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        cli.close_profile(profile_id)
+
+    return run, alive, close
+
+
+def _comments_runner(profile_id: str, opts: Dict[str, Any]):
+    comment_dir = str(PROJECT_ROOT / "comment" / "v3")
+    if comment_dir not in sys.path:
+        sys.path.insert(0, comment_dir)  # module comment/v3 import phẳng (from hook import ...)
+    from crawl_comments import crawl_comments_for_post
+    from driver_morelogin import create_chrome_attach
+    from hook import comment_allow, install_early_hook
+    from main_batch import safe_filename_from_url
+    from morelogin_client import close_profile, open_profile
+    from .browser.tabs import tab_alive
+    from .storage.archive import RawArchive
+
+    out_dir = (Path(opts["data_root"]) / "comment" / "page" / opts["page_name"]).resolve()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    debug_port = open_profile(profile_id, headless=opts["headless"], cdp_evasion=True)
+    driver = None
+    try:
+        driver = create_chrome_attach(debug_port)
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setCacheDisabled", {"cacheDisabled": True})
+        install_early_hook(driver, allow=comment_allow(opts["gql_allow"]))
+    except Exception:
+        if driver is not None:
+            driver.quit()
+        close_profile(profile_id)
+        raise
+    archive = RawArchive(out_dir / "raw_dump_comments") if opts["archive"] else None
+
+    def run(url: str) -> None:
+        out_path = out_dir / (safe_filename_from_url(url) + ".ndjson")
+        rows = crawl_comments_for_post(driver=driver, page_url=url, max_rounds=opts["max_rounds"],
+                                       sleep_between_rounds=1.5, out_path=str(out_path), archive=archive)
+        logger.info("[SCHED] %d comments -> %s", len(rows or []), out_path.name)
+
+    def alive() -> bool:
+        return tab_alive(driver)
+
+    def close() -> None:
+        if archive is not None:
+            archive.close()
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        close_profile(profile_id)
+
+    return run, alive, close
+
+
+def _worker_main(wid: int, profile_id: str, target: str, opts: Dict[str, Any], passthrough: List[str],
+                 inbox, outbox) -> None:
+    if target == "comments":
+        signal.signal(signal.SIGINT, signal.SIG_IGN)  # process chính quyết định khi nào dừng
+    try:
+        if target == "posts":
+            run, alive, close = _posts_runner(profile_id, passthrough)
+        else:
+            run, alive, close = _comments_runner(profile_id, opts)
+    except Exception as e:
+        logger.error("[SCHED] Worker %d (profile %s) không khởi động được: %s", wid, profile_id, e)
+        sys.exit(2)
+
+    try:
+        while True:
+            outbox.put(("ready", wid, None))
+            job = inbox.get()
+            if job is None:
+                return
+            t0 = time.monotonic()
+            try:
+                run(job["url"])
+                error = None
+            except Exception as e:
+                logger.exception("[SCHED] Worker %d lỗi tại %s: %s", wid, job["url"], e)
+                error = str(e)
+            # process_url / crawl_comments_for_post tự nuốt exception: tab chết giữa chừng vẫn
+            # return bình thường -> kiểm driver trước khi báo done, chết thì báo failed để job chạy lại
+            ok = alive()
+            if error is None and not ok:
+                error = "driver chết trong lúc chạy job"
+            if error is None:
+                outbox.put(("done", wid, time.monotonic() - t0))
+            else:
+                outbox.put(("failed", wid, error))
+            if not ok:
+                logger.warning("[SCHED] Worker %d: driver không còn dùng được, thoát để mở lại profile.", wid)
+                sys.exit(3)
+    finally:
+        close()
+
+
+# ---------------- scheduler (process chính) ----------------
+
+class _Worker:
+    def __init__(self, wid: int, profile_id: str):
+        self.wid = wid
+        self.profile_id = profile_id
+        self.proc: Optional[multiprocessing.Process] = None
+        self.inbox = None
+        self.job: Optional[Dict[str, Any]] = None
+        self.idle = False
+        self.restarts = 0
+        self.done = 0
+        self.failed = 0
+        self.busy_s = 0.0
+
+
+class Scheduler:
+    def __init__(self, target: str, profiles: List[str], urls: List[str], opts: Dict[str, Any],
+                 passthrough: List[str], max_attempts: int = 3, max_restarts: int = 3):
+        self.target = target
+        self.opts = opts
+        self.passthrough = passthrough
+        self.max_attempts = max(1, max_attempts)
+        self.max_restarts = max(0, max_restarts)
+        self.ctx = multiprocessing.get_context("spawn")
+        self.outbox = self.ctx.Queue()
+        self.pending = deque({"url": u, "attempts": 0} for u in urls)
+        self.total = len(self.pending)
+        self.workers = [_Worker(i, p) for i, p in enumerate(profiles)]
+        self.completed: List[str] = []
+        self.gave_up: List[str] = []
+        self.requeued = 0
+        self.stopping = False
+
+    def _spawn(self, w: _Worker) -> None:
+        w.inbox = self.ctx.Queue()
+        w.idle = False
+        w.proc = self.ctx.Process(
+            target=_worker_main, name=f"sched-{w.profile_id}",
+            args=(w.wid, w.profile_id, self.target, self.opts, self.passthrough, w.inbox, self.outbox),
+        )
+        w.proc.start()
+        logger.info("[SCHED] Worker %d: profile %s (pid %s)", w.wid, w.profile_id, w.proc.pid)
+
+    def _requeue(self, job: Dict[str, Any], why: str) -> None:
+        job["attempts"] += 1
+        if job["attempts"] >= self.max_attempts:
+            logger.error("[SCHED] Bỏ %s sau %d lần (%s)", job["url"], job["attempts"], why)
+            self.gave_up.append(job["url"])
+            return
+        logger.warning("[SCHED] Đưa lại hàng đợi %s (lần %d, %s)", job["url"], job["attempts"], why)
+        self.requeued += 1
+        self.pending.appendleft(job)
+
+    def _on_message(self, kind: str, wid: int, payload) -> None:
+        w = self.workers[wid]
+        if kind == "ready":
+            w.idle = True
+            return
+        job, w.job = w.job, None
+        if job is None:
+            return
+        if kind == "done":
+            w.done += 1
+            w.busy_s += payload or 0.0
+            self.completed.append(job["url"])
+            logger.info("[SCHED] %d/%d xong (worker %d, %.0fs): %s",
+                        len(self.completed), self.total, wid, payload or 0.0, job["url"])
+        else:
+            w.failed += 1
+            self._requeue(job, f"lỗi: {payload}")
+
+    def _drain(self) -> None:
+        while True:
+            try:
+                self._on_message(*self.outbox.get_nowait())
+            except queue.Empty:
+                return
+
+    def _reap(self) -> None:
+        """Worker chết: đưa job đang chạy lại hàng đợi, mở lại profile nếu còn lượt."""
+        if any(w.proc is not None and not w.proc.is_alive() for w in self.workers):
+            self._drain()  # worker có thể đã báo done ngay trước khi thoát
+        for w in self.workers:
+            if w.proc is None or w.proc.is_alive():
+                continue
+            code = w.proc.exitcode
+            w.proc = None
+            w.idle = False
+            if w.job is not None:
+                job, w.job = w.job, None
+                self._requeue(job, f"worker {w.wid} chết (exit {code})")
+            if self.stopping or not (self.pending or self._in_flight()):
+                continue
+            if code == 0:
+                continue
+            if w.restarts >= self.max_restarts:
+                logger.error("[SCHED] Profile %s chết %d lần, bỏ profile này.", w.profile_id, w.restarts + 1)
+                continue
+            w.restarts += 1
+            self._spawn(w)
+
+    def _in_flight(self) -> int:
+        return sum(1 for w in self.workers if w.job is not None)
+
+    def _dispatch(self) -> None:
+        for w in self.workers:
+            if not self.pending or self.stopping:
+                return
+            if w.proc is not None and w.idle and w.job is None:
+                w.job = self.pending.popleft()
+                w.idle = False
+                w.inbox.put(w.job)
+
+    def _stop_idle(self) -> None:
+        for w in self.workers:
+            if w.proc is not None and w.idle and w.job is None:
+                w.idle = False
+                w.inbox.put(None)
+
+    def run(self) -> int:
+        t0 = time.monotonic()
+        for w in self.workers:
+            self._spawn(w)
+        try:
+            while True:
+                try:
+                    kind, wid, payload = self.outbox.get(timeout=1.0)
+                    self._on_message(kind, wid, payload)
+                except queue.Empty:
+                    pass
+                self._reap()
+                if self.stopping or not self.pending:
+                    self._stop_idle()
+                else:
+                    self._dispatch()
+                if not any(w.proc is not None for w in self.workers):
+                    break
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for w in self.workers:
+                if w.proc is not None:
+                    w.proc.join()
+        return self._report(time.monotonic() - t0)
+
+    def _report(self, dt: float) -> int:
+        left = [j["url"] for j in self.pending]
+        logger.info("[SCHED] Xong %d/%d job trong %.1f phút (%.2f job/phút), requeue=%d, bỏ=%d, còn lại=%d",
+                    len(self.completed), self.total, dt / 60, len(self.completed) / (dt / 60) if dt else 0.0,
+                    self.requeued, len(self.gave_up), len(left))
+        for w in self.workers:
+            logger.info("[SCHED]   profile %s: done=%d failed=%d restarts=%d busy=%.0fs",
+                        w.profile_id, w.done, w.failed, w.restarts, w.busy_s)
+        for url in self.gave_up + left:
+            logger.warning("[SCHED] Chưa crawl được: %s", url)
+        return 0 if not (self.gave_up or left) else 1
+
+    def request_stop(self, *_):
+        if not self.stopping:
+            logger.warning("[SCHED] Dừng: không giao job mới, chờ worker đóng profile...")
+        self.stopping = True
+
+
+def read_urls(urls: List[str], inputs: List[str]) -> List[str]:
+    out = list(urls or [])
+    for path in inputs or []:
+        p = Path(path)
+        if p.suffix.lower() in (".xlsx", ".xls"):
+            import pandas as pd
+            df = pd.read_excel(p)
+            if "link" not in df.columns:
+                raise SystemExit(f"{p}: thiếu cột 'link'")
+            out += df["link"].dropna().astype(str).tolist()
+        else:
+            out += [line.strip() for line in p.read_text(encoding="utf-8").splitlines()]
+    return list(dict.fromkeys(u for u in out if u and not u.startswith("#")))
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m post.v3.scheduler",
+                                 description="Chia hàng đợi URL cho nhiều profile MoreLogin (1 worker / profile).")
+    ap.add_argument("target", choices=TARGETS)
+    ap.add_argument("--profiles", type=str, nargs="+", default=env("MORELOGIN_PROFILES", "").split(),
+                    help="Danh sách profile ID MoreLogin (mỗi profile 1 worker)")
+    ap.add_argument("--urls", type=str, nargs="*", default=[], help="URL cần crawl")
+    ap.add_argument("--input", type=str, nargs="*", default=[],
+                    help="File URL: .txt mỗi dòng 1 URL hoặc .xlsx có cột 'link'")
+    ap.add_argument("--max-attempts", type=int, default=env("SCHED_MAX_ATTEMPTS", 3, int),
+                    help="Số lần chạy tối đa 1 URL (lỗi / worker chết) trước khi bỏ")
+    ap.add_argument("--max-restarts", type=int, default=env("SCHED_MAX_RESTARTS", 3, int),
+                    help="Số lần mở lại worker của 1 profile sau khi chết")
+    # comments (posts dùng option của post.v3.cli, truyền thẳng qua)
+    ap.add_argument("--page-name", type=str, default=env("PAGE_NAME", "thoibaode"))
+    ap.add_argument("--data-root", type=str, default=env("DATA_ROOT", str(PROJECT_ROOT / "database")))
+    ap.add_argument("--headless", action="store_true")
+    ap.add_argument("--archive", action="store_true", default=env("GQL_ARCHIVE", False, bool))
+    ap.add_argument("--max-rounds", type=int, default=env("COMMENT_MAX_ROUNDS", 200, int))
+    ap.add_argument("--comment-gql-allow", type=str, choices=["comments", "off"],
+                    default=env("COMMENT_GQL_ALLOW", "comments"),
+                    help="Allow-list hook của comment crawler (posts dùng --gql-allow của cli)")
+    args, passthrough = ap.parse_known_args(argv)
+
+    profiles = list(dict.fromkeys(args.profiles))
+    if not profiles:
+        logger.error("[SCHED] Chưa có --profiles")
+        return 1
+    urls = read_urls(args.urls, args.input)
+    if not urls:
+        logger.error("[SCHED] Không có URL nào")
+        return 1
+    if args.target == "posts":
+        passthrough += ["--page-name", args.page_name, "--data-root", args.data_root]
+        passthrough += ["--headless"] if args.headless else []
+        passthrough += ["--archive"] if args.archive else []
+    elif passthrough:
+        logger.warning("[SCHED] Bỏ qua option không dùng cho comments: %s", " ".join(passthrough))
+
+    opts = {"page_name": args.page_name, "data_root": args.data_root, "headless": args.headless,
+            "archive": args.archive, "max_rounds": args.max_rounds, "gql_allow": args.comment_gql_allow}
+    sched = Scheduler(args.target, profiles, urls, opts, passthrough,
+                      max_attempts=args.max_attempts, max_restarts=args.max_restarts)
+    signal.signal(signal.SIGINT, sched.request_stop)
+    signal.signal(signal.SIGTERM, sched.request_stop)
+    logger.info("[SCHED] %s: %d URL trên %d profile", args.target, len(urls), len(profiles))
+    return sched.run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+# post/v3/storage/archive.py
+"""
+Archive raw GraphQL đã capture vào raw_dump_posts/, để khi sửa extractor thì replay lại
+thay vì crawl lại.
+
+    seg-<YYYYmmdd-HHMMSS>-<pid>-<n>.zst : mỗi record là 1 frame zstd độc lập (JSON 1 dòng),
+                                          nối liền nhau -> `zstd -dc seg.zst` ra NDJSON
+    seg-<YYYYmmdd-HHMMSS>-<pid>-<n>.idx : NDJSON, mỗi dòng {"off", "len", "ts", "name"} để
+                                          đọc thẳng 1 record (seek off, giải nén len byte)
+
+Record: {"ts": ms lúc capture, "url", "name": friendly name, "doc_id", "variables", "responseText"}
+(+ "source": URL trang đang crawl nếu add() có truyền, vd. link bài của comment crawler).
+Nén + ghi file chạy ở thread riêng; add() không bao giờ block vòng scroll: hàng đợi đầy thì
+bỏ record và đếm (dropped). Segment vượt segment_mb (sau nén) thì mở segment mới.
+Nhiều archive ghi chung 1 thư mục được (worker của scheduler): mỗi archive chỉ tạo segment
+mới (tên có pid, mở exclusive), không bao giờ ghi nối vào segment của archive khác.
+"""
+import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+from urllib.parse import parse_qs
+
+import zstandard
+
+from logs.loging_config import logger
+
+_STOP = object()
+
+
+def archive_record(rec: Dict[str, Any], source: Optional[str] = None) -> Dict[str, Any]:
+    body = rec.get("body") or ""
+    qs = {}
+    if isinstance(body, str) and body:
+        try:
+            qs = parse_qs(body)
+        except Exception:
+            qs = {}
+    row = {
+        "ts": rec.get("ts") or int(time.time() * 1000),
+        "url": rec.get("url"),
+        "name": (qs.get("fb_api_req_friendly_name") or [None])[0],
+        "doc_id": (qs.get("doc_id") or [None])[0],
+        "variables": (qs.get("variables") or [None])[0],
+        "responseText": rec.get("responseText"),
+    }
+    if source:
+        row["source"] = source
+    return row
+
+
+class RawArchive:
+    def __init__(self, out_dir: Path, segment_mb: float = 64, level: int = 3, max_pending: int = 256):
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = max(1, int(segment_mb * 1024 * 1024))
+        self.level = level
+        self.records = 0
+        self.raw_bytes = 0
+        self.bytes = 0
+        self.segments = 0
+        self.dropped = 0
+        self.failed = 0
+        self._prefix = f"seg-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        self._seg = None
+        self._idx = None
+        self._seg_off = 0
+        self._segno = 0
+        self._closed = False
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, int(max_pending)))
+        self._thread = threading.Thread(target=self._write_loop, name="gql-archive", daemon=True)
+        self._thread.start()
+        logger.info("[ARCHIVE] Raw GraphQL -> %s (segment %g MB, zstd level %d)", self.out_dir, segment_mb, level)
+
+    def add(self, rec: Dict[str, Any], source: Optional[str] = None) -> None:
+        if self._closed or not rec or not rec.get("responseText"):
+            return
+        try:
+            self._queue.put_nowait((rec, source))
+        except queue.Full:
+            if not self.dropped:
+                logger.warning("[ARCHIVE] Hàng đợi archive đầy, bỏ record (đĩa chậm?)")
+            self.dropped += 1
+
+    def close(self) -> None:
+        """Ghi nốt hàng đợi rồi đóng segment. Gọi nhiều lần không sao."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._close_segment()
+        logger.info("[ARCHIVE] Closed: %s", self.summary())
+
+    def summary(self) -> str:
+        ratio = (self.raw_bytes / self.bytes) if self.bytes else 0.0
+        return (f"records={self.records} segments={self.segments} "
+                f"raw={self.raw_bytes / (1024 * 1024):.1f} MB zst={self.bytes / (1024 * 1024):.1f} MB "
+                f"(x{ratio:.1f}) dropped={self.dropped} failed={self.failed}")
+
+    def _open_segment(self) -> None:
+        # "x": tên đã có (archive khác cùng process mở trong cùng giây) thì lấy số kế tiếp
+        n = self._segno
+        while True:
+            n += 1
+            stem = self.out_dir / f"{self._prefix}-{n:04d}"
+            try:
+                self._seg = open(stem.with_suffix(".zst"), "xb")
+            except FileExistsError:
+                continue
+            break
+        self.segments += 1
+        self._segno = n
+        self._idx = open(stem.with_suffix(".idx"), "w", encoding="utf-8")
+        self._seg_off = 0
+
+    def _close_segment(self) -> None:
+        for f in (self._seg, self._idx):
+            if f is not None:
+                try:
+                    f.close()
+                except Exception:
+                    pass
+        self._seg = self._idx = None
+
+    def _write_loop(self) -> None:
+        cctx = zstandard.ZstdCompressor(level=self.level)
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            try:
+                row = archive_record(*item)
+                raw = (json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8", "surrogatepass")
+                frame = cctx.compress(raw)
+                if self._seg is None or self._seg_off >= self.segment_bytes:
+                    self._close_segment()
+                    self._open_segment()
+                self._seg.write(frame)
+                self._seg.flush()
+                self._idx.write(json.dumps(
+                    {"off": self._seg_off, "len": len(frame), "ts": row["ts"], "name": row["name"]}) + "\n")
+                self._idx.flush()
+                self._seg_off += len(frame)
+                self.records += 1
+                self.raw_bytes += len(raw)
+                self.bytes += len(frame)
+            except Exception as e:
+                self.failed += 1
+                logger.warning("[ARCHIVE] write failed: %s", e)
+
+
+def iter_segment(seg_path: Path) -> Iterator[Dict[str, Any]]:
+    """Đọc lần lượt record của 1 segment .zst (không cần .idx; frame cuối ghi dở thì bỏ)."""
+    dctx = zstandard.ZstdDecompressor()
+    with open(seg_path, "rb") as f:
+        reader = dctx.stream_reader(f, read_across_frames=True)
+        buf = b""
+        try:
+            while True:
+                chunk = reader.read(1 << 20)
+                if not chunk:
+                    break
+                lines = (buf + chunk).split(b"\n")
+                buf = lines.pop()
+                for line in lines:
+                    if line:
+                        yield json.loads(line)
+        except zstandard.ZstdError as e:
+            logger.warning("[ARCHIVE] %s bị cắt ngang (%s), bỏ phần cuối", seg_path.name, e)
+        if buf.strip():
+            try:
+                yield json.loads(buf)
+            except ValueError:
+                pass
+
+
+def read_record(seg_path: Path, off: int, length: int) -> Dict[str, Any]:
+    """Đọc 1 record theo dòng trong .idx."""
+    with open(seg_path, "rb") as f:
+        f.seek(off)
+        return json.loads(zstandard.ZstdDecompressor().decompress(f.read(length)))
+
+
+def iter_archive(path: Path, since_ms: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Mọi record trong 1 segment hoặc cả thư mục archive (theo thứ tự tên segment)."""
+    path = Path(path)
+    segs = [path] if path.is_file() else sorted(path.glob("seg-*.zst"))
+    for seg in segs:
+        for row in iter_segment(seg):
+            if since_ms is None or (row.get("ts") or 0) >= since_ms:
+                yield row
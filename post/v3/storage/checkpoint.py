@@ -23,3 +23,12 @@ def save_checkpoint(checkpoint_path: Path, latest_ts: int):
         ck["last_created_time"],
         ck["last_created_date"],
     )
+
+
+def load_checkpoint(checkpoint_path: Path):
+    """last_created_time của lần crawl trước (None nếu chưa có / file hỏng)."""
+    try:
+        with checkpoint_path.open("r", encoding="utf-8") as f:
+            return int(json.load(f)["last_created_time"])
+    except Exception:
+        return None
@@ -0,0 +1,55 @@
+import json
+
+from post.v3.storage import archive
+from post.v3.storage.archive import RawArchive, iter_archive, read_record
+
+
+def _rec(worker, i):
+    body = f"fb_api_req_friendly_name=Q&doc_id=1&variables=%7B%22w%22%3A{worker}%7D"
+    return {"url": "/api/graphql/", "body": body, "ts": 1000 + i,
+            "responseText": json.dumps({"data": {"worker": worker, "i": i, "pad": "x" * 500}})}
+
+
+def test_two_archives_same_dir_same_second(tmp_path, monkeypatch):
+    # 2 worker mở archive cùng thư mục trong cùng 1 giây (cùng prefix là trường hợp xấu nhất)
+    monkeypatch.setattr(archive.time, "strftime", lambda fmt, *a: "20260101-000000")
+    monkeypatch.setattr(archive.os, "getpid", lambda: 4242)
+    a, b = RawArchive(tmp_path), RawArchive(tmp_path)
+    for i in range(50):
+        a.add(_rec(1, i), source="a")
+        b.add(_rec(2, i), source="b")
+    a.close()
+    b.close()
+
+    segs = sorted(tmp_path.glob("seg-*.zst"))
+    assert len(segs) == 2
+    for seg in segs:
+        sources = set()
+        with open(seg.with_suffix(".idx"), encoding="utf-8") as f:
+            for line in f:
+                meta = json.loads(line)
+                row = read_record(seg, meta["off"], meta["len"])
+                assert row["ts"] == meta["ts"]
+                sources.add(row["source"])
+        assert len(sources) == 1
+
+    rows = list(iter_archive(tmp_path))
+    assert sorted((r["source"], r["ts"]) for r in rows) == sorted(
+        (s, 1000 + i) for s in ("a", "b") for i in range(50))
+
+
+def test_segment_rollover_keeps_own_offsets(tmp_path):
+    arc = RawArchive(tmp_path, segment_mb=0.0001)
+    for i in range(20):
+        arc.add(_rec(1, i))
+    arc.close()
+    segs = sorted(tmp_path.glob("seg-*.zst"))
+    assert len(segs) == arc.segments > 1
+    n = 0
+    for seg in segs:
+        with open(seg.with_suffix(".idx"), encoding="utf-8") as f:
+            for line in f:
+                meta = json.loads(line)
+                assert read_record(seg, meta["off"], meta["len"])["ts"] == meta["ts"]
+                n += 1
+    assert n == 20
@@ -0,0 +1,40 @@
+import json
+
+from util.graphql_json import choose_best_graphql_obj, iter_json_spans
+
+
+def _choose_by_dumps(objs):
+    objs = list(objs)
+    with_data = [o for o in objs if isinstance(o, dict) and "data" in o]
+    main = [o for o in with_data if "path" not in o and "label" not in o]
+    pick = main or with_data or objs
+    return max(pick, key=lambda o: len(json.dumps(o, ensure_ascii=False)))
+
+
+def _check(text):
+    spans = list(iter_json_spans(text))
+    assert choose_best_graphql_obj(spans) is _choose_by_dumps(o for o, _, _ in spans)
+    return choose_best_graphql_obj(spans)
+
+
+def test_escaped_unicode_is_measured_decoded():
+    # A: text dài hơn vì escape \uXXXX nhưng decode ra ngắn hơn B
+    a = json.dumps({"data": {"message": "Xin chào các bạn, hôm nay trời đẹp"}})
+    b = json.dumps({"data": {"message": "Xin chao cac ban, hom nay troi dep va mat!!"}}, ensure_ascii=False)
+    assert len(a) > len(b)
+    assert _check(a + "\n" + b)["data"]["message"].startswith("Xin chao")
+    assert _check(b + "\n" + a)["data"]["message"].startswith("Xin chao")
+
+
+def test_whitespace_is_not_counted():
+    a = json.dumps({"data": {"x": [1, 2, 3]}}, indent=4).replace("\n", " ")
+    b = json.dumps({"data": {"x": [1, 2, 3, 4, 5]}}, separators=(",", ":"))
+    assert len(a) > len(b)
+    assert _check("for (;;);" + a + "\n" + b)["data"]["x"] == [1, 2, 3, 4, 5]
+
+
+def test_prefers_data_and_single_candidate():
+    text = 'for (;;);{"errors":[{"message":"' + "x" * 200 + '"}]}\n{"data":{"a":1}}'
+    assert _check(text) == {"data": {"a": 1}}
+    assert _check('{"extensions":{}}') == {"extensions": {}}
+    assert choose_best_graphql_obj([]) is None
@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+from post.v3.parse_stage import ParseStage
+
+GROUP = "https://www.facebook.com/groups/1"
+BODY = "fb_api_req_friendly_name=GroupsCometFeedRegularStoriesPaginationQuery&doc_id=1"
+
+
+def _rec(*stories, cursor="c"):
+    edges = [{"node": s, "cursor": cursor} for s in stories]
+    text = json.dumps({"data": {"node": {"__typename": "Group", "group_feed": {"edges": edges}}}})
+    return {"body": BODY, "responseText": text}
+
+
+def _story(**kw):
+    s = {"__typename": "Story", "creation_time": 1700000000, "comet_sections": {"message": {"text": "hi"}}}
+    s.update(kw)
+    return s
+
+
+@pytest.mark.parametrize("workers", [0, 1])
+def test_new_key_on_known_node_is_indexed(tmp_path, workers):
+    out = tmp_path / "posts.ndjson"
+    stage = ParseStage(GROUP, set(), out, workers=workers)
+    try:
+        stage.submit(_rec(_story(id="UzpfA", post_id="111")))
+        stage.join()
+        # cùng post, thêm permalink chưa thấy -> không ghi lại nhưng permalink phải vào index
+        stage.submit(_rec(_story(id="UzpfA", post_id="111", url="https://www.facebook.com/groups/1/permalink/999/")))
+        stage.join()
+        # fragment chỉ có id khác + permalink đó -> vẫn là post đã ghi
+        stage.submit(_rec(_story(id="UzpfB", url="https://www.facebook.com/groups/1/permalink/999/")))
+        stage.join()
+        # lặp lại đúng node đã biết hết key (response khác) -> bỏ qua trước extract
+        stage.submit(_rec(_story(id="UzpfA", post_id="111"), cursor="c2"))
+        stage.join()
+    finally:
+        stage.close()
+    rows = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+    assert [r["rid"] for r in rows] == ["111"]
+    assert stage.nodes_skipped >= 1
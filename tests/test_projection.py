@@ -0,0 +1,78 @@
+import json
+import shutil
+import subprocess
+
+import pytest
+
+from post.v3.browser.hooks import PROJECT_JS
+from post.v3.graphql.parser import parse_fb_graphql_payload
+from post.v3.pipeline import extract_page
+
+FEED_BODY = "fb_api_req_friendly_name=GroupsCometFeedRegularStoriesPaginationQuery&doc_id=1"
+
+
+def _story(i, message):
+    return {
+        "__typename": "Story",
+        "id": f"UzpfSTEw{i}",
+        "post_id": str(10**12 + i),
+        "url": f"https://www.facebook.com/groups/1/posts/{10**12 + i}/",
+        "creation_time": 1700000000 + i,
+        "comet_sections": {"message": {"text": message}},
+    }
+
+
+def _raw_body():
+    # document chính: 1 story ngắn giữa rất nhiều field render/tracking bị cắt trong page
+    tracking = [{"module": f"m{i}", "props": {"w": i, "h": i, "style": {"k": "v" * 40}}} for i in range(300)]
+    main = {
+        "data": {"node": {"__typename": "Group", "id": "1", "renderer": {"layout": tracking},
+                          "group_feed": {"edges": [{"node": _story(1, "ngắn"), "cursor": "c1",
+                                                    "tracking": tracking}]}}},
+        "extensions": {"is_final": False},
+    }
+    # chunk $stream: story dài, nhỏ hơn document gốc nhưng lớn hơn document chính sau khi cắt
+    stream = {"label": "GroupsCometFeedRegularStories_paginationQuery$stream$group_feed",
+              "path": ["node", "group_feed", "edges", 1],
+              "data": {"node": _story(2, "Bài dài " * 800), "cursor": "c2"}}
+    defer = {"label": "GroupsCometFeedRegularStories_paginationQuery$defer$page_info",
+             "path": ["node", "group_feed"],
+             "data": {"page_info": {"has_next_page": True, "end_cursor": "CUR"}}}
+    return "for (;;);" + "\n".join(json.dumps(d, ensure_ascii=False) for d in (main, stream, defer))
+
+
+def _project(text):
+    node = shutil.which("node")
+    if not node:
+        pytest.skip("cần node để chạy PROJECT_JS")
+    src = PROJECT_JS + "\nprocess.stdout.write(__gqlProject(require('fs').readFileSync(0, 'utf8')) || 'null');"
+    res = subprocess.run([node, "-e", src], input=text, capture_output=True, text=True, check=True)
+    assert res.stdout != "null"
+    return res.stdout
+
+
+def test_pruned_main_doc_wins_over_larger_chunk():
+    raw = _raw_body()
+    projected = _project(raw)
+    assert len(projected) < len(raw)
+    main, stream = projected.split("\n")[:2]
+    assert "path" in json.loads(stream) and len(stream) > len(main)
+
+    payload = parse_fb_graphql_payload(projected)
+    assert "path" not in payload and "group_feed" in payload["data"]["node"]
+
+    rec = {"body": FEED_BODY, "responseText": projected}
+    posts, page_info = extract_page(rec, "https://www.facebook.com/groups/1")
+    posts_raw, page_info_raw = extract_page({"body": FEED_BODY, "responseText": raw},
+                                            "https://www.facebook.com/groups/1")
+    assert [p["rid"] for p in posts] == [p["rid"] for p in posts_raw] == [str(10**12 + 1)]
+    assert page_info == page_info_raw == (True, "CUR")
+
+
+def test_chunk_never_beats_main_doc_in_parser():
+    text = "\n".join([
+        json.dumps({"data": {"node": {"group_feed": {"edges": []}}}}),
+        json.dumps({"label": "x$stream$y", "path": ["node", "group_feed", "edges", 0],
+                    "data": {"node": {"message": "m" * 5000}}}),
+    ])
+    assert "group_feed" in parse_fb_graphql_payload(text)["data"]["node"]
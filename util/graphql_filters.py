@@ -0,0 +1,117 @@
+# util/graphql_filters.py
+"""
+Allow-list fb_api_req_friendly_name / doc_id cho hook capture /api/graphql/.
+
+Mỗi pipeline chỉ cần vài loại query; phần còn lại (presence, notifications, typeahead, ads
+logging...) không ra record nào mà vẫn phải clone body, qua bridge WebDriver rồi parse.
+Hook dùng allow-list để bỏ từ trong page và đếm số request bị bỏ theo friendly name.
+
+Request không có friendly name lẫn doc_id thì luôn giữ (không đủ thông tin để lọc).
+Pattern là regex "search" (không neo), viết sao cho chạy giống nhau ở Python và JS.
+"""
+import json
+import re
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import parse_qs
+
+GQL_ALLOW_LISTS: Dict[str, Dict[str, List[str]]] = {
+    "post_feed": {
+        "names": [r"Feed", r"Timeline", r"Stories", r"Discussion"],
+        "doc_ids": [],
+    },
+    "profile": {
+        "names": [r"^ProfileComet", r"Timeline", r"Feed"],
+        "doc_ids": [],
+    },
+    "comments": {
+        "names": [r"Comment", r"UFI"],
+        "doc_ids": [],
+    },
+    "replies": {
+        "names": [r"Comment", r"Repl", r"UFI"],
+        "doc_ids": [],
+    },
+}
+
+
+def resolve_allow(pipeline: Optional[str], extra: Optional[Iterable[str]] = None) -> Optional[dict]:
+    """
+    Allow-list của pipeline (+ pattern bổ sung). pipeline rỗng / "off" -> None (không lọc).
+    Pattern bổ sung toàn chữ số được coi là doc_id.
+    """
+    if not pipeline or pipeline == "off":
+        return None
+    if pipeline not in GQL_ALLOW_LISTS:
+        raise ValueError(f"Không có allow-list cho pipeline {pipeline!r} (chọn {', '.join(GQL_ALLOW_LISTS)})")
+    allow = {k: list(v) for k, v in GQL_ALLOW_LISTS[pipeline].items()}
+    for p in extra or ():
+        p = p.strip()
+        if p:
+            allow["doc_ids" if p.isdigit() else "names"].append(p)
+    return allow
+
+
+def query_key(body: str):
+    """(friendly_name, doc_id) từ body dạng form; thiếu thì None."""
+    if not isinstance(body, str) or ("doc_id=" not in body and "fb_api_req_friendly_name=" not in body):
+        return None, None
+    try:
+        qs = parse_qs(body)
+    except Exception:
+        return None, None
+    return (qs.get("fb_api_req_friendly_name") or [None])[0], (qs.get("doc_id") or [None])[0]
+
+
+def drop_key(friendly: Optional[str], doc_id: Optional[str]) -> str:
+    return friendly or f"doc:{doc_id}"
+
+
+class GraphqlFilter:
+    """Bản Python của bộ lọc trong hook JS (dùng cho capture CDP)."""
+
+    def __init__(self, allow: Optional[dict]):
+        self.allow = allow
+        self._names = [re.compile(p) for p in (allow or {}).get("names", [])]
+        self._doc_ids = set((allow or {}).get("doc_ids", []))
+
+    def keep(self, body: str) -> bool:
+        if self.allow is None:
+            return True
+        friendly, doc_id = query_key(body)
+        if not friendly and not doc_id:
+            return True
+        if friendly and any(rx.search(friendly) for rx in self._names):
+            return True
+        return bool(doc_id and doc_id in self._doc_ids)
+
+
+def hook_filter_js(allow: Optional[dict]) -> str:
+    """
+    Đoạn JS định nghĩa __gqlKeep(body) cho hook: true = giữ record, false = bỏ và cộng vào
+    window.__gqlDropped[friendly name | "doc:<id>"]. allow=None thì luôn giữ.
+    """
+    return r"""
+      window.__gqlDropped = window.__gqlDropped || {};
+      const __ALLOW = __ALLOW_JSON__;
+      const __allowNames = __ALLOW ? (__ALLOW.names||[]).map(s => new RegExp(s)) : null;
+      const __allowDocs = __ALLOW ? new Set(__ALLOW.doc_ids||[]) : null;
+      function __gqlKeep(body){
+        if (!__allowNames) return true;
+        try{
+          const p = new URLSearchParams(String(body||''));
+          const name = p.get('fb_api_req_friendly_name') || '';
+          const doc = p.get('doc_id') || '';
+          if (!name && !doc) return true;
+          if (name && __allowNames.some(r => r.test(name))) return true;
+          if (doc && __allowDocs.has(doc)) return true;
+          const k = name || ('doc:' + doc);
+          window.__gqlDropped[k] = (window.__gqlDropped[k] || 0) + 1;
+          return false;
+        }catch(e){ return true; }
+      }
+    """.replace("__ALLOW_JSON__", json.dumps(allow) if allow else "null")
+
+
+def format_counts(counts: Dict[str, int], top: int = 10) -> str:
+    items = sorted(counts.items(), key=lambda kv: -kv[1])[:top]
+    return ", ".join(f"{k}={v}" for k, v in items) or "-"
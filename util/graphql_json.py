@@ -0,0 +1,129 @@
+# util/graphql_json.py
+"""
+Decode responseText của /api/graphql/ (nhiều JSON nối nhau, có thể có prefix XSSI).
+Dùng chung cho post/v3, fbprofile và post/v2 (utils.iter_json_values).
+"""
+import json
+import re
+
+from util import json_backend
+
+_XSSI_PREFIX_RE = re.compile(r"(?:(?:for\s*\(\s*;\s*;\s*\)\s*;|\)\]\}')\s*)*")
+_NON_WS_RE = re.compile(r"\S")
+_DECODER = json.JSONDecoder()
+
+
+def strip_xssi_prefix(s: str) -> str:
+    if not s:
+        return s
+    s2 = s.lstrip()
+    s2 = re.sub(r'^\s*for\s*\(\s*;\s*;\s*\)\s*;\s*', '', s2)
+    s2 = re.sub(r"^\s*\)\]\}'\s*", '', s2)
+    return s2
+
+
+def iter_json_values(s: str):
+    """Yield lần lượt từng JSON value trong s (xem iter_json_spans)."""
+    for obj, _start, _end in iter_json_spans(s):
+        yield obj
+
+
+def iter_json_spans(s: str):
+    """
+    Yield (obj, start, end) cho từng JSON value trong s; s[start:end] là đoạn text của value.
+
+    Đi qua buffer đúng 1 lần. Với backend C (orjson) thì decode từng dòng – response batch
+    của FB là các document nối bằng newline; dòng nào không decode được thì chuyển sang
+    stdlib raw_decode từ chính dòng đó. Prefix XSSI (`for (;;);`, `)]}'`) chỉ được thử khi
+    decode tại vị trí hiện tại thất bại, và chỉ match tại offset đó. Gặp rác thì dừng.
+    """
+    if not s:
+        return
+    i = 0
+    fast = json_backend.fast_loads()
+    if fast is not None:
+        i = yield from _iter_line_spans(s, fast)
+    yield from _iter_raw_spans(s, i)
+
+
+def _value_end(s: str, start: int, end: int) -> int:
+    while end > start and s[end - 1] in " \t\r\n":
+        end -= 1
+    return end
+
+
+def _iter_line_spans(s: str, loads):
+    """Decode từng dòng bằng backend C. Trả về offset mà stdlib cần decode tiếp (len(s) nếu xong)."""
+    n = len(s)
+    m = _NON_WS_RE.search(s, 0)
+    if not m:
+        return n
+    pos = _XSSI_PREFIX_RE.match(s, m.start()).end()
+    while pos < n:
+        m = _NON_WS_RE.search(s, pos)
+        if not m:
+            return n
+        j = m.start()
+        nl = s.find("\n", j)
+        if nl < 0:
+            nl = n
+        end = _value_end(s, j, nl)
+        try:
+            obj = loads(s[j:end])
+        except (ValueError, TypeError):
+            return j
+        yield obj, j, end
+        pos = nl + 1
+    return n
+
+
+def _iter_raw_spans(s: str, i: int = 0):
+    decode = _DECODER.raw_decode
+    n = len(s)
+    while i < n:
+        m = _NON_WS_RE.search(s, i)
+        if not m:
+            break
+        j = m.start()
+        try:
+            obj, i = decode(s, j)
+        except json.JSONDecodeError:
+            k = _XSSI_PREFIX_RE.match(s, j).end()
+            if k == j:
+                break
+            j = k
+            try:
+                obj, i = decode(s, j)
+            except json.JSONDecodeError:
+                break
+        yield obj, j, i
+
+
+def _dumped_len(obj) -> int:
+    return len(json.dumps(obj, ensure_ascii=False))
+
+
+def _is_stream_chunk(obj) -> bool:
+    return "path" in obj or "label" in obj
+
+
+def choose_best_graphql_obj(spans):
+    """
+    Chọn document chính trong response: ưu tiên value có "data" và không phải chunk
+    $defer/$stream (chunk có "path" / "label"), rồi tới value có "data", lấy cái dài nhất.
+    Chunk không bao giờ thắng document chính dù dài hơn (body đã projection trong page:
+    document chính bị cắt còn ngắn hơn chunk edge stream).
+
+    spans: iterable (obj, start, end) từ iter_json_spans. Độ dài vẫn đo như bản cũ
+    (len(json.dumps(obj, ensure_ascii=False))) vì end - start lệch khi text có escape \\uXXXX
+    hay khoảng trắng; chỉ serialise khi có từ 2 ứng viên trở lên, 1 ứng viên thì trả luôn.
+    """
+    spans = list(spans)
+    if not spans:
+        return None
+    with_data = [sp for sp in spans if isinstance(sp[0], dict) and "data" in sp[0]]
+    main = [sp for sp in with_data if not _is_stream_chunk(sp[0])]
+    pick = main or with_data or spans
+    if len(pick) == 1:
+        return pick[0][0]
+    return max((sp[0] for sp in pick), key=_dumped_len)
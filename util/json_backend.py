@@ -0,0 +1,53 @@
+# util/json_backend.py
+"""
+JSON backend dùng chung cho mọi parser GraphQL (post/v3, fbprofile, post/v2, comment/v3, comment/v2).
+
+Dùng orjson nếu có cài, không thì stdlib json. Chọn bằng biến môi trường:
+    FB_JSON_BACKEND = auto (mặc định) | orjson | json
+
+Nếu orjson từ chối một input (surrogate lẻ, nhiều document nối nhau...) thì loads() thử lại
+bằng stdlib, nên lỗi/kết quả giống json.loads. Khác biệt duy nhất: số nguyên vượt 64 bit bị
+orjson đọc thành float (id của FB luôn là string nên không ảnh hưởng extractor).
+"""
+import json
+import os
+
+try:
+    import orjson
+except ImportError:  # orjson là tuỳ chọn
+    orjson = None
+
+BACKENDS = ("auto", "orjson", "json")
+
+BACKEND = "json"
+_fast_loads = None
+
+
+def use_backend(name: str = "auto") -> str:
+    """Đổi backend lúc chạy (bench / debug). Trả về tên backend thực sự được dùng."""
+    global BACKEND, _fast_loads
+    name = (name or "auto").strip().lower()
+    if name not in BACKENDS:
+        raise ValueError(f"FB_JSON_BACKEND không hợp lệ: {name!r} (chọn {', '.join(BACKENDS)})")
+    if name in ("auto", "orjson") and orjson is not None:
+        BACKEND, _fast_loads = "orjson", orjson.loads
+    else:
+        BACKEND, _fast_loads = "json", None
+    return BACKEND
+
+
+def fast_loads():
+    """Hàm decode C của backend hiện tại, hoặc None nếu đang dùng stdlib."""
+    return _fast_loads
+
+
+def loads(s):
+    if _fast_loads is not None:
+        try:
+            return _fast_loads(s)
+        except (ValueError, TypeError):
+            pass
+    return json.loads(s)
+
+
+use_backend(os.environ.get("FB_JSON_BACKEND", "auto"))